@@ -1,28 +1,38 @@
+import argparse
 import asyncio
+import contextlib
+import itertools
 import logging
 import time
-import subprocess
-import hashlib
 import random
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import sys
-from aiohttp import ClientSession
 from scripts.utils import load_config
-from scripts.data_loader import load_stakes_data
-from scripts.prompt_generator import generate_system_prompts
+from scripts.api_client import load_targets
+from scripts.dispatcher import AdaptiveDispatcher
+from scripts.data_loader import load_stakes_data, load_participants_table, load_wide_results
+from scripts.data_saver import save_questions_table, save_run_config
+from scripts.collect_data import RunCatalog
+from scripts.journal import AnswerJournal
+from scripts.participant import Participant
+from scripts.profiler import LoopProfiler
+from scripts.run_monitor import RunStatistics
+from scripts.sequential_sampling import SequentialSampler
+from scripts.prompt_generator import (
+    SYSTEM_PROMPT_TEMPLATE, AGE_RANGE, DESIGN_CHUNK_SIZE,
+    design_cell_counts, generate_design, iter_participants,
+    group_cell_counts, iter_participant_groups
+)
 from scripts.participant_processor import (
     process_participant,
+    process_participant_group,
     country_locks,
-    processed_counts_per_country
-)
-from scripts.question_generator import (
-    generate_risk_questions_for_country,
-    generate_time_questions_for_country,
-    generate_recip_questions_for_country,
-    generate_donation_questions_for_country
+    processed_counts_per_country,
+    question_ids
 )
+from scripts.question_generator import build_questions_table
 
 # Configure logging
 logging.basicConfig(
@@ -33,160 +43,410 @@ logging.basicConfig(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Generate unique participant hash based on system prompt
-def generate_unique_hash(system_prompt):
-    return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+def resume_design(cell_counts, participants_df, journal, models):
+    """
+    Split a resumed run into the in-flight participants from the journal and the
+    participants still missing per model and design cell (country x gender).
+
+    Parameters:
+    - cell_counts: {(country, gender): n} of the full design (per model).
+    - participants_df: Participants table of the run (completed participants).
+    - journal: AnswerJournal of the run with the in-flight participants.
+    - models: Names of the run's API targets; participants without one (runs written
+      before multi-model runs) belong to the first.
+
+    Returns:
+    - tuple: In-flight Participant records and the remaining cell counts per model.
+    """
+    completed_ids = set(participants_df['Participant ID'].astype(str))
+    in_flight = []
+    for participant_id, entry in list(journal.pending.items()):
+        if participant_id in completed_ids:
+            # Saved just before the crash, but not yet marked complete
+            journal.complete_participant(participant_id)
+        else:
+            participant = Participant.from_fields(entry['participant'])
+            participant.model = entry.get('model') if entry.get('model') in models else models[0]
+            participant.participant_id = participant_id
+            participant.participant_hash = entry['hash']
+            in_flight.append(participant)
+
+    remaining = {model: dict(cell_counts) for model in models}
+    participant_models = participants_df['Model'] if 'Model' in participants_df.columns else [models[0]] * len(participants_df)
+    filled_cells = list(zip(participant_models, participants_df['Country'], participants_df['Gender']))
+    filled_cells += [(participant.model, participant.country, participant.gender) for participant in in_flight]
+    for model, country, gender in filled_cells:
+        counts = remaining.get(model, {})
+        if counts.get((country, gender), 0) > 0:
+            counts[(country, gender)] -= 1
+
+    new_participants = sum(sum(counts.values()) for counts in remaining.values())
+    logger.info(f"Resuming {len(in_flight)} in-flight and {new_participants} new participants.")
+    return in_flight, remaining
 
-async def main():
+async def main(resume=None, profile=False):
     config = load_config()
     countries = config['countries']
     num_samples = config['settings']['num_samples_per_country_gender']  # Renamed in config.yaml
-    semaphore_limit = config['settings']['semaphore_limit']
+    # Every participant of the design is asked to each target, all targets concurrently
+    targets = load_targets(config)
+    models = [target.name for target in targets]
     country_currency_dict = config['country_currency_dict']
     gps_base_folder = Path(config['paths']['gps_folder'])
+    design = config.get('design', {})
 
-    # Create a unique run folder with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    run_folder = gps_base_folder.parent / f"gps_run_{timestamp}"
-    run_folder.mkdir(parents=True, exist_ok=True)
+    if resume:
+        # Continue an interrupted run in its own folder ('latest' picks the most recent run)
+        if resume == 'latest':
+            catalog = RunCatalog(gps_base_folder.parent)
+            catalog.update()
+            run_folder = catalog.most_recent_run()
+            catalog.close()
+        else:
+            run_folder = Path(resume)
+        if run_folder is None or not run_folder.is_dir():
+            logger.error(f"Run folder to resume not found: {resume}")
+            return
+        try:
+            started_at = datetime.strptime(run_folder.name[len("gps_run_"):], "%Y%m%d_%H%M%S")
+        except ValueError:
+            # Not named gps_run_<timestamp> (e.g. renamed or copied): use the folder's modification time
+            started_at = datetime.fromtimestamp(run_folder.stat().st_mtime).replace(microsecond=0)
+            logger.warning(f"Run folder {run_folder.name} is not named gps_run_YYYYmmdd_HHMMSS; taking {started_at} as its start.")
+        logger.info(f"Resuming run: {run_folder}")
+    else:
+        # Create a unique run folder with timestamp
+        started_at = datetime.now()
+        timestamp = started_at.strftime("%Y%m%d_%H%M%S")
+        run_folder = gps_base_folder.parent / f"gps_run_{timestamp}"
+        run_folder.mkdir(parents=True, exist_ok=True)
     gps_folder_path = run_folder / "gps"
     gps_folder_path.mkdir(parents=True, exist_ok=True)
+    gps_proc_folder_path = run_folder / "gps_proc"
+    gps_proc_folder_path.mkdir(parents=True, exist_ok=True)
+    if not resume:
+        save_run_config(config, run_folder, started_at)
 
-    # Load stakes data
-    stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df = load_stakes_data()
-
-    # Generate system prompts
-    system_prompts = generate_system_prompts(countries, num_samples)
-
-    # Prepare existing hashes per country
-    existing_hashes_per_country = {}
-    total_participants_per_country = {}
-
-    # Initialize processed counts
-    for country in countries:
-        processed_counts_per_country[country] = 0
-
-    # Load existing participant hashes per country from the new run folder (likely empty)
-    for country in countries:
-        output_file = gps_folder_path / f"results_{country}.csv"
-        if output_file.exists():
-            try:
-                df_existing = pd.read_csv(output_file)
-                if 'Participant Hash' in df_existing.columns:
-                    hashes = set(df_existing['Participant Hash'])
-                    existing_hashes_per_country[country] = hashes
-                    participant_count = len(set(df_existing['Participant ID']))
-                else:
-                    existing_hashes_per_country[country] = set()
-                    participant_count = 0
-            except pd.errors.ParserError as e:
-                logger.error(f"Error reading {output_file}: {e}")
-                existing_hashes_per_country[country] = set()
-                participant_count = 0
+    if profile:
+        profiler = LoopProfiler(run_folder / "profile")
+        profiler.start()
+
+    journal = None
+    statistics = None
+    # Participants per task (a sampling group is one task) of the participants in flight
+    task_sizes = {}
+    try:
+        # Every answer is journaled so an interrupted run can be resumed
+        journal = AnswerJournal(
+            run_folder,
+            fsync_batch=config['settings'].get('journal_fsync_batch', 100),
+            fsync_interval=config['settings'].get('journal_fsync_interval', 1.0)
+        )
+
+        # Load stakes data
+        stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df = load_stakes_data()
+
+        # Participants per design cell; the participants themselves are generated lazily below
+        cell_counts = design_cell_counts(countries, num_samples, design.get('quotas'))
+        prompt_template = design.get('prompt_template', SYSTEM_PROMPT_TEMPLATE)
+
+        # Prepare existing hashes per country
+        existing_hashes_per_country = {}
+        total_participants_per_country = {}
+
+        # Initialize processed counts
+        for country in countries:
+            processed_counts_per_country[country] = 0
+
+        # Load existing participant hashes per country from the run folder (empty for a new run)
+        try:
+            participants_df = load_participants_table(gps_folder_path)
+        except pd.errors.ParserError as e:
+            logger.error(f"Error reading participants table in {gps_folder_path}: {e}")
+            participants_df = pd.DataFrame(columns=['Participant ID', 'Participant Hash', 'Country'])
+        for country in countries:
+            country_participants = participants_df[participants_df['Country'] == country]
+            existing_hashes_per_country[country] = set(country_participants['Participant Hash'])
+            total_participants_per_country[country] = country_participants['Participant ID'].nunique()
+
+        # Live per-country statistics, snapshotted to the run folder while the run goes
+        statistics = RunStatistics(run_folder, config['settings'].get('stats_snapshot_interval', 30.0), targets)
+        if len(participants_df):
+            statistics.add_results(load_wide_results(gps_folder_path))
+
+        in_flight = []
+        remaining_counts = {model: cell_counts for model in models}
+        if resume:
+            in_flight, remaining_counts = resume_design(cell_counts, participants_df, journal, models)
+
+        # Sampling mode: each prompt is asked once with k completions, one per logical participant
+        completions_per_prompt = design.get('completions_per_prompt', 1)
+        # Targets share one seed, so all models are asked the same participants
+        seed = design.get('seed')
+        if seed is None:
+            seed = random.randrange(2**32)
+
+        def target_participants(model):
+            counts = remaining_counts[model]
+            design_chunks = generate_design(
+                group_cell_counts(counts, completions_per_prompt) if completions_per_prompt > 1 else counts,
+                age_range=tuple(design.get('age_range', AGE_RANGE)),
+                covariates=design.get('covariates'),
+                chunk_size=design.get('chunk_size', DESIGN_CHUNK_SIZE),
+                seed=seed
+            )
+            if completions_per_prompt > 1:
+                new_participants = iter_participant_groups(design_chunks, counts, completions_per_prompt, model)
+            else:
+                new_participants = iter_participants(design_chunks, model)
+            return itertools.chain([participant for participant in in_flight if participant.model == model], new_participants)
+
+        # Sequential sampling: each cell is sampled in waves until its preference measures are
+        # estimated precisely enough (or up to the cap), instead of a fixed number of participants
+        sequential = config.get('sequential') or {}
+        sampler = None
+        if sequential.get('enabled'):
+            sampler = SequentialSampler(
+                sequential.get('ci_widths') or {},
+                wave_size=sequential.get('wave_size', 10),
+                min_participants=sequential.get('min_participants', 20),
+                max_participants=sequential.get('max_participants', num_samples),
+                confidence=sequential.get('confidence', 0.95)
+            )
+            sequential_cells = [cell for cell, count in cell_counts.items() if count > 0]
+            design_rng = np.random.default_rng(seed)
+            if len(participants_df):
+                # Completed participants of a resumed run count towards their cells
+                completed = load_wide_results(gps_folder_path)
+                if 'Model' not in completed.columns:
+                    completed['Model'] = models[0]
+                for cell, cell_df in completed.groupby(['Model', 'Country', 'Gender'], observed=True):
+                    sampler.add_results(cell, cell_df)
+
+        # Print initial overview
+        logger.info("Initial participants processed per country:")
+        for country in countries:
+            logger.info(f"{country}: {total_participants_per_country.get(country, 0)} participants")
+
+        # Define additional questions and short titles
+        questions1 = [
+            "How willing or unwilling are you to take risks? Using a scale from 0 to 10, please answer with a single number.",
+            "How willing are you to give up something that is beneficial for you today in order to benefit more from that in the future? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
+            "How willing are you to punish someone who treats you unfairly, even if there may be costs for you? Please indicate your answer on a scale from 0 to 10, please answer with a single number, don't add other words.",
+            "How willing are you to punish someone who treats others unfairly, even if there may be costs for you? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
+            "How willing are you to give to good causes without expecting anything in return? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
+            "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: When someone does me a favor, I am willing to return it.",
+            "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: If I am treated very unjustly, I will take revenge at the first occasion, even if there is a cost to do so.",
+            "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I assume that people have only the best intentions.",
+            "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I am good at math.",
+            "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I tend to postpone tasks even if I know it would be better to do them right away.",
+            "You are in an area you are not familiar with, and you realize that you lost your way. You ask a stranger for directions. The stranger offers to take you to your destination. Helping you costs the stranger about 40 U.S. dollars in total. However, the stranger says they do not want any money from you. You have six presents with you with values 10, 20, 30, 50, and 60$ respectively. What is the value of the present you would give? Only answer with a single number, answer with 0 if you don't want to give one.",
+            "Imagine the following situation: Today you unexpectedly received 1,600 U.S. dollars. How much of this amount would you donate to a good cause? Please answer with a single number."
+        ]
+
+        short_titles1 = [
+            "Willingness to take risk",
+            "Willingness to delay consumption",
+            "Personal retribution",
+            "Retribution on others' behalf",
+            "Willingness to donate",
+            "Will return favor",
+            "Will do revenge",
+            "People have best intentions",
+            "Good at math",
+            "Procrastinate",
+            "Present giving",
+            "Donate"
+        ]
+
+        # Write the run's question dictionary once; answers only reference question IDs
+        questions_df = build_questions_table(
+            countries, stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df,
+            questions1, short_titles1
+        )
+        save_questions_table(questions_df, gps_folder_path)
+        question_ids.update(zip(questions_df['Question'], questions_df['Question ID']))
+
+        start_time = time.time()
+        if sampler is not None:
+            # Upper bound: every cell sampled up to the cap
+            total_tasks = len(in_flight) + sum(
+                max(0, sampler.max_participants - sampler.participants.get((model,) + cell, 0))
+                for model in models for cell in sequential_cells
+            )
         else:
-            existing_hashes_per_country[country] = set()
-            participant_count = 0
-        total_participants_per_country[country] = participant_count
-
-    # Print initial overview
-    logger.info("Initial participants processed per country:")
-    for country in countries:
-        logger.info(f"{country}: {total_participants_per_country.get(country, 0)} participants")
-
-    # Define additional questions and short titles
-    questions1 = [
-        "How willing or unwilling are you to take risks? Using a scale from 0 to 10, please answer with a single number.",
-        "How willing are you to give up something that is beneficial for you today in order to benefit more from that in the future? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
-        "How willing are you to punish someone who treats you unfairly, even if there may be costs for you? Please indicate your answer on a scale from 0 to 10, please answer with a single number, don't add other words.",
-        "How willing are you to punish someone who treats others unfairly, even if there may be costs for you? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
-        "How willing are you to give to good causes without expecting anything in return? Please indicate your answer on a scale from 0 to 10, answer with a single number, don't add other words.",
-        "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: When someone does me a favor, I am willing to return it.",
-        "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: If I am treated very unjustly, I will take revenge at the first occasion, even if there is a cost to do so.",
-        "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I assume that people have only the best intentions.",
-        "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I am good at math.",
-        "How well does the following statement describe you? Please indicate your answer on a scale from 0 to 10. Please answer with a single number: I tend to postpone tasks even if I know it would be better to do them right away.",
-        "You are in an area you are not familiar with, and you realize that you lost your way. You ask a stranger for directions. The stranger offers to take you to your destination. Helping you costs the stranger about 40 U.S. dollars in total. However, the stranger says they do not want any money from you. You have six presents with you with values 10, 20, 30, 50, and 60$ respectively. What is the value of the present you would give? Only answer with a single number, answer with 0 if you don't want to give one.",
-        "Imagine the following situation: Today you unexpectedly received 1,600 U.S. dollars. How much of this amount would you donate to a good cause? Please answer with a single number."
-    ]
-
-    short_titles1 = [
-        "Willingness to take risk",
-        "Willingness to delay consumption",
-        "Personal retribution",
-        "Retribution on others' behalf",
-        "Willingness to donate",
-        "Will return favor",
-        "Will do revenge",
-        "People have best intentions",
-        "Good at math",
-        "Procrastinate",
-        "Present giving",
-        "Donate"
-    ]
-
-    start_time = time.time()
-    total_tasks = len(system_prompts)
-    current_count = 0
-    update_interval = max(1, total_tasks // 100)  # Update every 1% of progress
-
-    semaphore = asyncio.Semaphore(semaphore_limit)
-
-    async with ClientSession() as session:
-        tasks = []
-        for system_prompt in system_prompts:
-            participant_hash = generate_unique_hash(system_prompt)
-
-            # Check if the participant has already been processed
-            country = system_prompt.split("from")[1].split()[0].strip()  # Assuming "from Country" format in prompt
-            if participant_hash in existing_hashes_per_country.get(country, set()):
-                logger.info(f"Participant already processed for {country}, skipping.")
-                continue
+            total_tasks = len(in_flight) + sum(sum(counts.values()) for counts in remaining_counts.values())
+        current_count = 0
+        update_interval = max(1, total_tasks // 100)  # Update every 1% of progress
+
+        # At most one design chunk of participants per target is in flight; the rest is generated as tasks finish
+        max_in_flight = design.get('chunk_size', DESIGN_CHUNK_SIZE)
+
+        def report_progress(done):
+            nonlocal current_count
+            for task in done:
+                task.result()
+                previous_count = current_count
+                current_count += task_sizes.pop(task)
+
+                if current_count // update_interval > previous_count // update_interval or current_count == total_tasks:
+                    elapsed_time = time.time() - start_time
+                    estimated_total_time = (elapsed_time / current_count) * total_tasks
+                    estimated_remaining_time = estimated_total_time - elapsed_time
+                    logger.info(
+                        f"Processed {current_count}/{total_tasks} participants. "
+                        f"Estimated time remaining: {estimated_remaining_time / 60:.2f} minutes"
+                    )
+
+                    # Update total participants per country
+                    for country in processed_counts_per_country:
+                        total_participants_per_country[country] = total_participants_per_country.get(country, 0) + processed_counts_per_country[country]
+                        processed_counts_per_country[country] = 0  # Reset the count after updating
 
+                    # Print periodic overview
+                    print("\nParticipants processed per country so far:")
+                    for country in countries:
+                        count = total_participants_per_country.get(country, 0)
+                        print(f"{country}: {count} participants")
+                    print("\n")
+
+        def start_task(target, participant):
+            # A participant, or a sampling group of participants sharing one prompt
+            if isinstance(participant, list):
+                process, task_size = process_participant_group, len(participant)
+            else:
+                process, task_size = process_participant, 1
             task = asyncio.create_task(
-                process_participant(
-                    session, system_prompt, semaphore,
+                process(
+                    target.session, participant, target.dispatcher,
                     existing_hashes_per_country, stakes_df, time_stakes_df,
                     recip_stakes_df, donation_stakes_df,
                     questions1, short_titles1,
-                    gps_folder_path  # pass run folder path
+                    gps_folder_path,  # pass run folder path
+                    gps_proc_folder_path,  # processed rows are written as each participant is saved
+                    journal,
+                    prompt_template,
+                    target,
+                    statistics
                 )
             )
-            tasks.append(task)
-
-        for future in asyncio.as_completed(tasks):
-            await future
-            current_count += 1
-
-            if current_count % update_interval == 0 or current_count == total_tasks:
-                elapsed_time = time.time() - start_time
-                estimated_total_time = (elapsed_time / current_count) * total_tasks
-                estimated_remaining_time = estimated_total_time - elapsed_time
-                logger.info(
-                    f"Processed {current_count}/{total_tasks} participants. "
-                    f"Estimated time remaining: {estimated_remaining_time / 60:.2f} minutes"
-                )
+            task_sizes[task] = task_size
+            return task
 
-                # Update total participants per country
-                for country in processed_counts_per_country:
-                    total_participants_per_country[country] = total_participants_per_country.get(country, 0) + processed_counts_per_country[country]
-                    processed_counts_per_country[country] = 0  # Reset the count after updating
+        async def run_target(target):
+            # Each target keeps its own participants in flight, so a slow model never holds back a fast one
+            pending = set()
+            for participant in target_participants(target.name):
+                if len(pending) >= max_in_flight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    report_progress(done)
+                pending.add(start_task(target, participant))
 
-                # Print periodic overview
-                print("\nParticipants processed per country so far:")
-                for country in countries:
-                    count = total_participants_per_country.get(country, 0)
-                    print(f"{country}: {count} participants")
-                print("\n")
-    script_dir = Path(__file__).resolve().parent  # This gets the directory of the current script
-    data_processor_script = script_dir / 'scripts' / 'data_processor.py'  # Append the correct subdirectory and script name
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                report_progress(done)
+            logger.info(f"All participants of {target.name} processed.")
+
+        async def run_wave(target, cell, participants):
+            tasks = [start_task(target, participant) for participant in participants]
+            if not tasks:
+                return
+            done, _ = await asyncio.wait(tasks)
+            report_progress(done)
+
+            wave_participants, wave_answers = [], []
+            for participant, task in zip(participants, tasks):
+                if isinstance(participant, list):
+                    wave_participants += participant
+                    wave_answers += task.result()
+                else:
+                    wave_participants.append(participant)
+                    wave_answers.append(task.result())
+            sampler.add_wave((target.name,) + cell, wave_participants, wave_answers)
+
+        def draw_wave(model, cell, size):
+            design_chunks = generate_design(
+                {cell: -(-size // completions_per_prompt)},
+                age_range=tuple(design.get('age_range', AGE_RANGE)),
+                covariates=design.get('covariates'),
+                chunk_size=design.get('chunk_size', DESIGN_CHUNK_SIZE),
+                seed=design_rng
+            )
+            if completions_per_prompt > 1:
+                return list(iter_participant_groups(design_chunks, {cell: size}, completions_per_prompt, model))
+            return list(iter_participants(design_chunks, model))
+
+        async def run_target_sequential(target):
+            # In-flight participants of a resumed run finish first, then every cell runs its own waves
+            resumed_cells = {}
+            for participant in in_flight:
+                if participant.model == target.name:
+                    resumed_cells.setdefault((participant.country, participant.gender), []).append(participant)
+            await asyncio.gather(*(run_wave(target, cell, participants) for cell, participants in resumed_cells.items()))
+
+            async def run_cell(cell):
+                while True:
+                    wave_size = sampler.next_wave_size((target.name,) + cell)
+                    if not wave_size:
+                        break
+                    await run_wave(target, cell, draw_wave(target.name, cell, wave_size))
+
+            await asyncio.gather(*(run_cell(cell) for cell in sequential_cells))
+            logger.info(f"All cells of {target.name} stopped sampling.")
+
+        async with contextlib.AsyncExitStack() as stack:
+            for target in targets:
+                await stack.enter_async_context(target)
+            await asyncio.gather(*(
+                run_target_sequential(target) if sampler is not None else run_target(target) for target in targets
+            ))
+    finally:
+        # Participants still in flight (when the run fails or is interrupted) stop writing to the
+        # journal before it is closed; their journaled answers are resumed with the run
+        outstanding = [task for task in task_sizes if not task.done()]
+        for task in outstanding:
+            task.cancel()
+        await asyncio.gather(*outstanding, return_exceptions=True)
+
+        # Flush the journal and save the live statistics and profile even if the run fails or is interrupted
+        if journal is not None:
+            journal.close()
+        if statistics is not None:
+            statistics.snapshot()
+        if profile:
+            await profiler.stop()
+
+    for target in targets:
+        if isinstance(target.dispatcher, AdaptiveDispatcher):
+            telemetry = target.dispatcher.telemetry()
+            logger.info(
+                f"Concurrency limit of {target.name} at the end of the run: {telemetry['concurrency_limit']} "
+                f"({telemetry['limit_increases']} increases, decreases: {telemetry['limit_decreases']})."
+            )
+        if target.hedging:
+            report = target.hedging.report()
+            logger.info(
+                f"Hedged requests of {target.name}: {report['hedges']} of {report['requests']} "
+                f"({report['hedge_rate']:.1%}), {report['hedge_wins']} answered by the hedge, "
+                f"estimated {report['estimated_saved_seconds']:.0f} s of waiting saved."
+            )
+    if sampler is not None:
+        sampler.save_report(run_folder)
+
+    logger.info(f"Processed results available in: {gps_proc_folder_path}")
+
+    # Record the finished run in the run catalog
+    save_run_config(config, run_folder, started_at, datetime.now())
+    catalog = RunCatalog(run_folder.parent)
+    catalog.update([run_folder])
+    catalog.close()
 
-    try:
-        # Use the absolute path to the script
-        subprocess.run([sys.executable, str(data_processor_script)], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Data processing failed: {e}")
-    except FileNotFoundError:
-        logger.error("Python executable not found. Check the subprocess.run call.")
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Run the GPS survey with simulated participants.")
+    parser.add_argument('--resume', type=str, nargs='?', const='latest', default=None, help="Resume an interrupted run folder (default: the most recent run).")
+    parser.add_argument('--profile', action='store_true', help="Profile the event loop and save the profile to the run folder.")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.resume, args.profile))
 
@@ -0,0 +1,220 @@
+# scripts/analyze_data.py
+
+import argparse
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import linalg, stats
+import os
+import sys
+if not __package__:
+    # Run as a script (python scripts/analyze_data.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.benchmark_loader import load_benchmark, BENCHMARK_COLUMNS
+from scripts.diagnostics import build_interaction_design
+from scripts.preference_data import PREFERENCE_MEASURES, build_run_preferences, build_combined_dataset
+from scripts.utils import load_config
+
+# Relative size of an R diagonal entry below which a design column is treated as redundant
+RANK_TOLERANCE = 1e-10
+
+def factorize_design(X):
+    """
+    Column-pivoted QR factorization of a design matrix, computed once and reused for
+    every outcome regressed on it.
+
+    Parameters:
+    - X: DataFrame with the design matrix (including the constant).
+
+    Returns:
+    - dict with Q, R and the pivot restricted to the design's numerical rank.
+    """
+    values = np.asarray(X, dtype=float)
+    Q, R, pivot = linalg.qr(values, mode='economic', pivoting=True)
+    diagonal = np.abs(np.diag(R))
+    rank = int((diagonal > RANK_TOLERANCE * diagonal[0]).sum()) if len(diagonal) else 0
+    if rank < values.shape[1]:
+        dropped = [X.columns[i] for i in pivot[rank:]]
+        logging.warning(f"Design is rank deficient; coefficients of {len(dropped)} redundant columns are not estimated: {dropped}")
+    return {
+        'columns': list(X.columns),
+        'X': values,
+        'Q': Q[:, :rank],
+        'R': R[:rank, :rank],
+        'pivot': pivot[:rank],
+        'rank': rank,
+        'nobs': values.shape[0]
+    }
+
+def solve_outcomes(factorization, Y):
+    """
+    Solve the least-squares problems of all outcome columns against one factorized design.
+
+    Parameters:
+    - factorization: Result of factorize_design.
+    - Y: DataFrame with one column per outcome (rows aligned with the design).
+
+    Returns:
+    - dict with per-outcome coefficient tables, SSR and degrees of freedom.
+    """
+    values = np.asarray(Y, dtype=float)
+    R = factorization['R']
+    pivot = factorization['pivot']
+    nobs = factorization['nobs']
+    df_resid = nobs - factorization['rank']
+
+    # One triangular solve for all outcomes at once
+    estimated = linalg.solve_triangular(R, factorization['Q'].T @ values)
+    coefficients = np.full((len(factorization['columns']), values.shape[1]), np.nan)
+    coefficients[pivot] = estimated
+
+    residuals = values - factorization['X'][:, pivot] @ estimated
+    ssr = (residuals ** 2).sum(axis=0)
+    centered = values - values.mean(axis=0)
+    r_squared = 1 - ssr / (centered ** 2).sum(axis=0)
+
+    # diag((X'X)^-1) from the inverse of R, shared by all outcomes
+    R_inverse = linalg.solve_triangular(R, np.eye(len(pivot)))
+    unscaled_variance = np.full(len(factorization['columns']), np.nan)
+    unscaled_variance[pivot] = (R_inverse ** 2).sum(axis=1)
+
+    tables = {}
+    for j, outcome in enumerate(Y.columns):
+        scale = ssr[j] / df_resid
+        bse = np.sqrt(unscaled_variance * scale)
+        tvalues = coefficients[:, j] / bse
+        tables[outcome] = pd.DataFrame({
+            'coef': coefficients[:, j],
+            'std err': bse,
+            't': tvalues,
+            'P>|t|': 2 * stats.t.sf(np.abs(tvalues), df_resid)
+        }, index=factorization['columns'])
+
+    return {
+        'tables': tables,
+        'ssr': pd.Series(ssr, index=Y.columns),
+        'r_squared': pd.Series(r_squared, index=Y.columns),
+        'df_resid': df_resid,
+        'nobs': nobs
+    }
+
+def compare_f_tests(full, restricted):
+    """
+    F-tests of the full against the nested restricted model for every outcome
+    (the equivalent of statsmodels' compare_f_test).
+    """
+    df_diff = restricted['df_resid'] - full['df_resid']
+    f_value = ((restricted['ssr'] - full['ssr']) / df_diff) / (full['ssr'] / full['df_resid'])
+    p_value = stats.f.sf(f_value, df_diff, full['df_resid'])
+    return pd.DataFrame({
+        'F': f_value,
+        'p-value': p_value,
+        'df_diff': df_diff,
+        'nobs': full['nobs']
+    })
+
+class GPSPreferenceAnalyzer:
+    def __init__(self, combined_df: pd.DataFrame, country_dummies: list, results_folder: Path):
+        self.combined_df = combined_df
+        self.country_dummies = country_dummies
+        self.results_folder = results_folder
+
+    def design_matrices(self, df: pd.DataFrame):
+        """
+        Build the full design (main effects interacted with category_binary) and the
+        restricted design (main effects plus category_binary), both with a constant.
+        """
+        predictors = ['age', 'gender'] + self.country_dummies
+        full = build_interaction_design(df, predictors, 'category_binary')
+        restricted = full[predictors + ['category_binary']].copy()
+        full.insert(0, 'Intercept', 1.0)
+        restricted.insert(0, 'Intercept', 1.0)
+        return full, restricted
+
+    def run(self, outcomes: list):
+        """
+        Regress every outcome on the full and restricted designs, factorizing each design
+        once per set of outcomes with the same missing rows, and save the results.
+        """
+        missing_outcomes = [col for col in outcomes if col not in self.combined_df.columns]
+        if missing_outcomes:
+            logging.error(f"Outcomes not found in the combined data: {missing_outcomes}")
+            outcomes = [col for col in outcomes if col not in missing_outcomes]
+        if not outcomes:
+            logging.error("No outcomes to analyze. Exiting.")
+            return
+
+        df = self.combined_df.dropna(subset=['age', 'gender', 'category_binary'])
+
+        # Outcomes observed on the same rows share the factorizations
+        patterns = {}
+        for outcome in outcomes:
+            key = df[outcome].notna().to_numpy().tobytes()
+            patterns.setdefault(key, []).append(outcome)
+
+        f_tests = []
+        for pattern_outcomes in patterns.values():
+            rows = df[pattern_outcomes[0]].notna()
+            sample = df[rows]
+            if sample.empty:
+                logging.error(f"No complete rows for outcomes: {pattern_outcomes}")
+                continue
+            logging.info(f"Fitting {pattern_outcomes} on {len(sample)} rows.")
+
+            full_X, restricted_X = self.design_matrices(sample)
+            Y = sample[pattern_outcomes]
+            full = solve_outcomes(factorize_design(full_X), Y)
+            restricted = solve_outcomes(factorize_design(restricted_X), Y)
+
+            for outcome in pattern_outcomes:
+                self.save_table(full['tables'][outcome], f"{outcome}_full_model.csv")
+                self.save_table(restricted['tables'][outcome], f"{outcome}_restricted_model.csv")
+            f_test = compare_f_tests(full, restricted)
+            f_test['R-squared full'] = full['r_squared']
+            f_test['R-squared restricted'] = restricted['r_squared']
+            f_tests.append(f_test)
+
+        if f_tests:
+            f_test_df = pd.concat(f_tests)
+            self.save_table(f_test_df, "f_tests.csv")
+            print("\n--- F-Tests: interactions with category_binary ---\n")
+            print(f_test_df.to_string())
+
+    def save_table(self, table: pd.DataFrame, file_name: str):
+        output_file = self.results_folder / file_name
+        table.to_csv(output_file, index_label='term')
+        logging.info(f"Saved: {output_file}")
+
+if __name__ == "__main__":
+    config = load_config()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Regress all GPS preference measures of a run and the benchmark on shared designs.")
+    parser.add_argument('--benchmark_file', type=str, default=config['paths']['benchmark_file'], help='Path to the GPS individual Stata file.')
+    parser.add_argument('--run_csv', type=str, default=config['paths']['cleaned_data_file'], help='Path to the concatenated and cleaned run CSV file.')
+    parser.add_argument('--cache_folder', type=str, default=config['paths'].get('benchmark_cache_folder'), help='Folder for the benchmark data cache.')
+    parser.add_argument('--results_folder', type=str, required=True, help='Path to the folder to save the results.')
+    parser.add_argument('--outcomes', type=str, nargs='*', default=PREFERENCE_MEASURES, help='Preference measures to analyze.')
+    parser.add_argument('--log_level', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).')
+    args = parser.parse_args()
+
+    # Configure logging with timestamp and dynamic level
+    numeric_level = getattr(logging, args.log_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError(f'Invalid log level: {args.log_level}')
+    logging.basicConfig(
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=numeric_level,
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    results_folder = Path(args.results_folder)
+    results_folder.mkdir(parents=True, exist_ok=True)
+
+    benchmark = load_benchmark(args.benchmark_file, columns=BENCHMARK_COLUMNS, cache_dir=args.cache_folder)
+    run_preferences = build_run_preferences(pd.read_csv(args.run_csv))
+    combined_df, country_dummies = build_combined_dataset(run_preferences, benchmark)
+
+    analyzer = GPSPreferenceAnalyzer(combined_df, country_dummies, results_folder)
+    analyzer.run(args.outcomes)
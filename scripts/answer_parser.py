@@ -0,0 +1,85 @@
+# scripts/answer_parser.py
+
+import json
+import math
+import re
+
+# Answer kinds; each has a request profile in api_client
+CHOICE_ANSWER = "choice"
+NUMBER_ANSWER = "number"
+
+# Staircase batteries answered with "Option 1" / "Option 2"; all other questions take a number
+CHOICE_BATTERIES = {'risk', 'time'}
+
+# Parse status of an answer:
+# ok - the constrained response parsed as expected
+# extracted - the value was found in free text (unconstrained or non-conforming response)
+# invalid - no value could be found in the response
+# ambiguous - the free text names both options, so neither is taken
+# error - the API call failed and the answer is the error message
+PARSE_OK = "ok"
+PARSE_EXTRACTED = "extracted"
+PARSE_INVALID = "invalid"
+PARSE_AMBIGUOUS = "ambiguous"
+PARSE_ERROR = "error"
+
+# Messages ask_economic_question returns instead of an answer when a request fails
+API_ERROR_PREFIXES = (
+    "API request failed",
+    "Client error in making API request",
+    "Unexpected error in making API request",
+    "Failed after maximum retries"
+)
+
+CHOICE_PATTERN = re.compile(r'Option\s*([12])')
+# Commas are thousands separators only before groups of three digits ("1,600"), so "10,20"
+# is read as 10
+NUMBER_PATTERN = re.compile(r'-?(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?')
+
+def answer_kind(battery):
+    """
+    Kind of answer expected for a question of the given battery.
+    """
+    return CHOICE_ANSWER if battery in CHOICE_BATTERIES else NUMBER_ANSWER
+
+def parse_answer(answer, kind):
+    """
+    Parse a model response into a typed value.
+
+    Choices are coded by option number (1.0 for "Option 1", 2.0 for "Option 2"); numbers
+    are returned as floats. Constrained responses are JSON objects {"answer": ...}; other
+    responses fall back to the option or the first number found in the text; a text naming
+    both options is ambiguous.
+
+    Returns:
+    - tuple: (value or None, parse status)
+    """
+    if answer is None:
+        return None, PARSE_INVALID
+    if answer.startswith(API_ERROR_PREFIXES):
+        return None, PARSE_ERROR
+
+    try:
+        payload = json.loads(answer)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and 'answer' in payload:
+        value = payload['answer']
+        if kind == CHOICE_ANSWER and value in ("Option 1", "Option 2"):
+            return float(value[-1]), PARSE_OK
+        if kind == NUMBER_ANSWER and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and math.isfinite(value):
+            return float(value), PARSE_OK
+        answer = str(value)
+
+    if kind == CHOICE_ANSWER:
+        options = set(CHOICE_PATTERN.findall(answer))
+        if len(options) > 1:
+            return None, PARSE_AMBIGUOUS
+        if options:
+            return float(options.pop()), PARSE_EXTRACTED
+    else:
+        match = NUMBER_PATTERN.search(answer)
+        if match:
+            return float(match.group(0).replace(',', '')), PARSE_EXTRACTED
+    return None, PARSE_INVALID
@@ -3,7 +3,12 @@
 import asyncio
 import aiohttp
 import logging
+import os
+from collections import deque
+import numpy as np
 from .utils import load_config
+from .dispatcher import RequestDispatcher, AdaptiveDispatcher
+from .answer_parser import API_ERROR_PREFIXES
 
 config = load_config()
 API_KEY = config['api']['key']
@@ -11,24 +16,343 @@ MODEL = config['api']['model']
 API_URL = config['api']['url']
 MAX_RETRIES = config['settings']['max_retries']
 
-async def ask_economic_question(session, question, system_prompt):
+def json_answer_format(name, answer_schema):
+    """
+    Structured-output response format restricting the reply to {"answer": <answer_schema>}.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"answer": answer_schema},
+                "required": ["answer"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+# Extra request fields per answer kind (see answer_parser) constraining the model to the
+# expected answer with OpenAI structured outputs. The JSON object is complete after a few
+# tokens, so a small max_tokens and a stop at the first line break bound every reply.
+# Endpoints without structured outputs reject these fields, so they are chosen in
+# config.yaml, per target if needed (see resolve_request_profiles).
+STRUCTURED_REQUEST_PROFILES = {
+    "choice": {
+        "response_format": json_answer_format("choice", {"type": "string", "enum": ["Option 1", "Option 2"]}),
+        "max_tokens": 10
+    },
+    "number": {
+        "response_format": json_answer_format("number", {"type": "number"}),
+        "max_tokens": 12,
+        "stop": ["\n"]
+    }
+}
+
+def resolve_request_profiles(request_profiles):
+    """
+    Request profiles from their config value: None for unconstrained requests, 'structured'
+    for STRUCTURED_REQUEST_PROFILES, or {answer kind: extra request fields}, where a kind's
+    fields can again be 'structured'.
+    """
+    if not request_profiles:
+        return {}
+    if request_profiles == 'structured':
+        return dict(STRUCTURED_REQUEST_PROFILES)
+    return {
+        kind: STRUCTURED_REQUEST_PROFILES[kind] if fields == 'structured' else (fields or {})
+        for kind, fields in request_profiles.items()
+    }
+
+REQUEST_PROFILES = resolve_request_profiles(config.get('request_profiles'))
+
+class RateLimiter:
+    """
+    Spaces requests evenly to stay under a requests-per-minute limit.
+    """
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def failed_completions(completions):
+    """
+    Whether every completion of a response is the error message of a failed request.
+    """
+    return all(completion.startswith(API_ERROR_PREFIXES) for completion in completions)
+
+class HedgePolicy:
+    """
+    Hedged requests of one target: a request still unanswered after the `percentile`
+    latency of the target's recent requests is sent a second time, the first successful
+    response is used and the other request is cancelled. The hedge takes its own slot of
+    the target's dispatcher and is only sent if a slot is free, so hedges stay within the
+    concurrency limit. At most `max_hedge_rate` of the completions are hedged (a hedge of
+    n completions costs n), and none before `min_samples` latencies are known.
+
+    Latencies are those the caller waited (a cancelled request counts with the time it
+    had run), over the last `window` requests. The time a won hedge saved is estimated
+    from the recent latencies above the time it finished at; as hedged requests enter the
+    window with the time they were answered at, the estimate is conservative.
+    """
+
+    def __init__(self, percentile=95, max_hedge_rate=0.05, min_samples=50, window=500):
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.delay = None
+        self.requests = 0
+        self.completions = 0
+        self.hedges = 0
+        self.hedged_completions = 0
+        self.hedge_wins = 0
+        self.saved_seconds = 0.0
+
+    def record(self, latency):
+        self.latencies.append(latency)
+        # The percentile moves slowly; recomputing it every few requests is enough
+        if len(self.latencies) >= self.min_samples and (self.delay is None or self.requests % 10 == 0):
+            self.delay = float(np.percentile(self.latencies, self.percentile))
+
+    def can_hedge(self, n):
+        return self.delay is not None and self.hedged_completions + n <= self.max_hedge_rate * self.completions
+
+    async def run(self, request, dispatcher=None, n=1):
+        """
+        Await request() (a coroutine function returning n completions), hedged if it is
+        slow. If the request that finishes first failed, the other one is awaited.
+        """
+        self.requests += 1
+        self.completions += n
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = [asyncio.ensure_future(request())]
+        hedge_slot = False
+        try:
+            if self.can_hedge(n):
+                done, _ = await asyncio.wait(tasks, timeout=self.delay)
+                if not done and self.can_hedge(n) and (dispatcher is None or dispatcher.try_acquire()):
+                    hedge_slot = dispatcher is not None
+                    self.hedges += 1
+                    self.hedged_completions += n
+                    tasks.append(asyncio.ensure_future(request()))
+            pending = tasks
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The original request wins a tie
+                finished = [task for task in tasks if task in done]
+                succeeded = [task for task in finished if task.exception() is None and not failed_completions(task.result())]
+                if succeeded or not pending:
+                    winner = (succeeded or finished)[0]
+                    break
+            latency = loop.time() - started
+            if winner is not tasks[0]:
+                self.hedge_wins += 1
+                slower = [previous for previous in self.latencies if previous > latency]
+                if slower:
+                    self.saved_seconds += sum(slower) / len(slower) - latency
+            self.record(latency)
+            return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if hedge_slot:
+                dispatcher.release()
+
+    def report(self):
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_rate': self.hedges / self.requests if self.requests else 0.0,
+            'hedged_completions': self.hedged_completions,
+            'hedge_wins': self.hedge_wins,
+            'hedge_delay': self.delay,
+            'estimated_saved_seconds': round(self.saved_seconds, 1)
+        }
+
+class ApiTarget:
+    """
+    A model endpoint the design is asked to, with its own connection pool, concurrency
+    limit and optional rate limit, so targets never wait on each other. Use as an async
+    context manager to open and close its connection pool.
+
+    Attributes:
+    - name: Name of the target in the results ('Model' column).
+    - model, url, key: Model and endpoint of the requests.
+    - concurrency: Maximum number of concurrent requests (dispatcher limit and pool size),
+      or the initial limit with adaptive concurrency.
+    - requests_per_minute: Optional rate limit.
+    - hedging: Optional HedgePolicy of the target's requests.
+    - starvation_timeout: Seconds after which a waiting request is dispatched first (see
+      RequestDispatcher).
+    - adaptive_concurrency: Optional settings of an AdaptiveDispatcher (min_limit, max_limit,
+      decrease_factor, latency_tolerance) adapting the limit to the endpoint.
+    - request_profiles: Extra request fields per answer kind (see resolve_request_profiles).
+    """
+
+    def __init__(self, name, model, url, key, concurrency, requests_per_minute=None, hedging=None, starvation_timeout=30.0,
+                 adaptive_concurrency=None, request_profiles=None):
+        self.name = name
+        self.model = model
+        self.url = url
+        self.key = key
+        self.concurrency = concurrency
+        self.request_profiles = request_profiles or {}
+        if adaptive_concurrency:
+            self.dispatcher = AdaptiveDispatcher(concurrency, starvation_timeout, name=name, **adaptive_concurrency)
+        else:
+            self.dispatcher = RequestDispatcher(concurrency, starvation_timeout)
+        self.rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self.hedging = hedging
+        self.session = None
+
+    async def __aenter__(self):
+        # The pool fits the highest limit, and each request can have one hedge in flight,
+        # which must not wait for a connection
+        pool_size = self.dispatcher.max_limit if isinstance(self.dispatcher, AdaptiveDispatcher) else self.concurrency
+        if self.hedging:
+            pool_size *= 2
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+        return self
+
+    def telemetry(self):
+        """
+        Current state of the target's request handling, for the run's live statistics.
+        """
+        telemetry = self.dispatcher.telemetry()
+        if self.hedging:
+            telemetry['hedging'] = self.hedging.report()
+        return telemetry
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def __repr__(self):
+        return f"ApiTarget({self.name!r}, model={self.model!r}, concurrency={self.concurrency})"
+
+def load_targets(config):
+    """
+    Build the API targets of a run from the 'targets' list in config.yaml, or a single
+    target from the 'api' section and settings.semaphore_limit if no targets are listed.
+    Unset target fields default to the 'api' section; 'key_env' names an environment
+    variable holding the target's API key. With the 'hedging' section enabled, every
+    target hedges its requests with its own latency percentile, and with the
+    'adaptive_concurrency' section enabled, every target adapts its concurrency limit,
+    starting from its concurrency ('hedging' and 'adaptive_concurrency' fields of a target
+    override the sections). A target's 'request_profiles' replace the top-level ones.
+    """
+    api = config['api']
+    default_concurrency = config['settings']['semaphore_limit']
+    default_hedging = config.get('hedging') or {}
+    default_adaptive = config.get('adaptive_concurrency') or {}
+    starvation_timeout = config['settings'].get('starvation_timeout', 30.0)
+    targets_config = config.get('targets') or [{'model': api['model']}]
+    targets = []
+    for target in targets_config:
+        name = target.get('name', target['model'])
+        if target.get('key_env'):
+            if target['key_env'] not in os.environ:
+                raise ValueError(f"Target {name}: environment variable {target['key_env']} (key_env) is not set.")
+            key = os.environ[target['key_env']]
+        else:
+            key = target.get('key', api.get('key'))
+        hedging = {**default_hedging, **(target.get('hedging') or {})}
+        adaptive = {**default_adaptive, **(target.get('adaptive_concurrency') or {})}
+        targets.append(ApiTarget(
+            name=name,
+            model=target['model'],
+            url=target.get('url', api['url']),
+            key=key,
+            concurrency=target.get('concurrency', default_concurrency),
+            requests_per_minute=target.get('requests_per_minute'),
+            hedging=HedgePolicy(
+                percentile=hedging.get('percentile', 95),
+                max_hedge_rate=hedging.get('max_hedge_rate', 0.05),
+                min_samples=hedging.get('min_samples', 50),
+                window=hedging.get('window', 500)
+            ) if hedging.get('enabled') else None,
+            starvation_timeout=starvation_timeout,
+            adaptive_concurrency={
+                'min_limit': adaptive.get('min_limit', 1),
+                'max_limit': adaptive.get('max_limit', 100),
+                'decrease_factor': adaptive.get('decrease_factor', 0.5),
+                'latency_tolerance': adaptive.get('latency_tolerance', 2.0)
+            } if adaptive.get('enabled') else None,
+            request_profiles=resolve_request_profiles(target.get('request_profiles', config.get('request_profiles')))
+        ))
+    names = [target.name for target in targets]
+    if len(set(names)) < len(names):
+        raise ValueError(f"API target names must be unique: {names}")
+    return targets
+
+async def ask_economic_question(session, question, system_prompt, answer_kind=None, target=None):
+    return (await request_completions(session, question, system_prompt, answer_kind, target=target))[0]
+
+async def request_completions(session, question, system_prompt, answer_kind=None, n=1, target=None):
+    """
+    Ask a question once and return n independent completions (the API's n parameter), so
+    n samples of the same prompt cost one request and one prompt. On failure every
+    completion is the error message.
+
+    The request goes to the target's model and endpoint (an ApiTarget, whose rate limit
+    is applied per attempt and whose HedgePolicy hedges slow requests), or to the 'api'
+    section of config.yaml without a target.
+    """
+    if target and target.hedging:
+        return await target.hedging.run(
+            lambda: post_completions(session, question, system_prompt, answer_kind, n, target), target.dispatcher, n
+        )
+    return await post_completions(session, question, system_prompt, answer_kind, n, target)
+
+async def post_completions(session, question, system_prompt, answer_kind, n, target):
     headers = {
-        'Authorization': f'Bearer {API_KEY}',
+        'Authorization': f'Bearer {target.key if target else API_KEY}',
         'Content-Type': 'application/json'
     }
     data = {
-        "model": MODEL,
+        "model": target.model if target else MODEL,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": question}
-        ]
+        ],
+        **(target.request_profiles if target else REQUEST_PROFILES).get(answer_kind, {})
     }
+    if n > 1:
+        data["n"] = n
+    url = target.url if target else API_URL
+    # Responses and overload signals (429s, server errors, timeouts) feed the target's dispatcher
+    dispatcher = target.dispatcher if target else None
+    loop = asyncio.get_running_loop()
     for attempt in range(MAX_RETRIES):
+        started = loop.time()
         try:
-            async with session.post(API_URL, headers=headers, json=data) as response:
+            if target and target.rate_limiter:
+                await target.rate_limiter.acquire()
+                started = loop.time()
+            async with session.post(url, headers=headers, json=data) as response:
                 response_data = await response.json()
+                if dispatcher:
+                    if response.status == 429 or response.status >= 500:
+                        dispatcher.record_overload(started, str(response.status))
+                    else:
+                        dispatcher.record_response(started, loop.time() - started)
                 if response.status == 200 and 'choices' in response_data and response_data['choices']:
-                    return response_data['choices'][0]['message']['content']
+                    choices = sorted(response_data['choices'], key=lambda choice: choice.get('index', 0))
+                    completions = [choice['message']['content'] for choice in choices]
+                    if len(completions) < n:
+                        logging.error(f"API returned {len(completions)} of {n} completions")
+                        completions += [f"API request failed: returned {len(completions)} of {n} completions"] * (n - len(completions))
+                    return completions[:n]
                 elif response.status == 429:
                     error_message = response_data.get('error', {}).get('message', 'Rate limit exceeded')
                     logging.warning(f"Rate limit exceeded: {error_message}. Retrying in 5 seconds...")
@@ -37,11 +361,15 @@ async def ask_economic_question(session, question, system_prompt):
                 else:
                     error_message = response_data.get('error', {}).get('message', 'Unknown error')
                     logging.error(f"API request failed: {error_message}")
-                    return f"API request failed: {error_message}"
+                    return [f"API request failed: {error_message}"] * n
         except aiohttp.ClientError as e:
+            if dispatcher and isinstance(e, asyncio.TimeoutError):
+                dispatcher.record_overload(started, "timeout")
             logging.error(f"Client error: {e}")
-            return "Client error in making API request."
+            return ["Client error in making API request."] * n
         except Exception as e:
+            if dispatcher and isinstance(e, asyncio.TimeoutError):
+                dispatcher.record_overload(started, "timeout")
             logging.error(f"Unexpected error: {e}")
-            return "Unexpected error in making API request."
-    return "Failed after maximum retries."
\ No newline at end of file
+            return ["Unexpected error in making API request."] * n
+    return ["Failed after maximum retries."] * n
\ No newline at end of file
@@ -0,0 +1,108 @@
+# scripts/benchmark_loader.py
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+# Columns of the GPS individual dataset used by the analysis scripts
+BENCHMARK_COLUMNS = [
+    'country', 'age', 'gender',
+    'patience', 'risktaking', 'posrecip', 'negrecip', 'altruism', 'trust', 'subj_math_skills'
+]
+
+# File in the cache folder remembering the content hash of each source file
+HASH_INDEX_FILE = "hashes.json"
+
+def compute_file_hash(file_path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file's contents.
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def get_file_hash(file_path, cache_dir):
+    """
+    Return the content hash of a file, reusing the hash recorded in the cache folder
+    while the file's size and modification time are unchanged.
+    """
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    index_file = Path(cache_dir) / HASH_INDEX_FILE
+
+    index = {}
+    if index_file.exists():
+        try:
+            with open(index_file, 'r') as file:
+                index = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Could not read hash index {index_file}: {e}")
+
+    entry = index.get(str(file_path))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    file_hash = compute_file_hash(file_path)
+    index[str(file_path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash}
+    with open(index_file, 'w') as file:
+        json.dump(index, file, indent=2)
+    return file_hash
+
+def build_benchmark_cache(stata_file, cache_file):
+    """
+    Convert the Stata file into an uncompressed Feather (Arrow IPC) file that can be
+    memory-mapped on later loads.
+    """
+    logging.info(f"Building benchmark cache from {stata_file}. This only happens once per file version.")
+    benchmark = pd.read_stata(stata_file)
+    table = pa.Table.from_pandas(benchmark, preserve_index=False)
+
+    # Write to a temporary file first so an interrupted conversion never leaves a broken cache
+    tmp_file = Path(f"{cache_file}.tmp")
+    feather.write_feather(table, tmp_file, compression='uncompressed')
+    os.replace(tmp_file, cache_file)
+    logging.info(f"Benchmark cache saved to {cache_file}")
+
+def load_benchmark(stata_file, columns=None, countries=None, cache_dir=None):
+    """
+    Load the GPS individual benchmark dataset through a memory-mapped Arrow cache.
+
+    Parameters:
+    - stata_file: Path to the benchmark Stata file (e.g. individual_new.dta).
+    - columns: Columns to load; None loads all columns. Unknown columns are skipped.
+    - countries: Countries to keep; None keeps all countries.
+    - cache_dir: Folder for the cache files (default: a 'cache' folder next to the Stata file).
+    """
+    stata_file = Path(stata_file)
+    cache_dir = Path(cache_dir) if cache_dir else stata_file.parent / "cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    file_hash = get_file_hash(stata_file, cache_dir)
+    cache_file = cache_dir / f"{stata_file.stem}_{file_hash[:16]}.feather"
+    if not cache_file.exists():
+        build_benchmark_cache(stata_file, cache_file)
+
+    table = feather.read_table(cache_file, memory_map=True)
+
+    if columns is not None:
+        missing_columns = [col for col in columns if col not in table.column_names]
+        if missing_columns:
+            logging.warning(f"Columns not found in benchmark data and skipped: {missing_columns}")
+        table = table.select([col for col in columns if col in table.column_names])
+
+    if countries is not None:
+        if 'country' not in table.column_names:
+            raise ValueError("Cannot filter by country: 'country' column was not loaded.")
+        country_values = table['country'].cast(pa.string())
+        table = table.filter(pc.is_in(country_values, value_set=pa.array(list(countries), pa.string())))
+
+    logging.info(f"Loaded {table.num_rows} benchmark rows with {table.num_columns} columns from {cache_file}")
+    return table.to_pandas()
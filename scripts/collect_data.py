@@ -0,0 +1,373 @@
+# scripts/collect_data.py
+
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import yaml
+import os
+import sys
+if not __package__:
+    # Run as a script (python scripts/collect_data.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.concat_and_clean import GPSDataConcatenator, RESULTS_CATEGORICAL_COLUMNS
+from scripts.data_loader import (
+    PARTICIPANTS_TABLE, ANSWERS_TABLE, RUN_CONFIG_FILE, has_normalized_results, load_wide_results
+)
+from scripts.utils import load_config
+
+# Index file kept in the base folder of the runs
+CATALOG_FILE = "run_catalog.sqlite"
+
+# Bump when the indexed fields change so every run is indexed again
+CATALOG_VERSION = 1
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    started_at TEXT,
+    completed_at TEXT,
+    model TEXT,
+    config_snapshot TEXT,
+    layout TEXT,
+    status TEXT,
+    participants INTEGER,
+    processed_participants INTEGER,
+    answers INTEGER,
+    raw_bytes INTEGER,
+    processed_bytes INTEGER,
+    fingerprint TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS run_files (
+    run_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    country TEXT,
+    path TEXT NOT NULL,
+    size INTEGER,
+    participants INTEGER,
+    rows INTEGER,
+    PRIMARY KEY (run_name, kind, path)
+);
+"""
+
+RUN_COLUMNS = [
+    'run_name', 'path', 'started_at', 'completed_at', 'model', 'config_snapshot', 'layout', 'status',
+    'participants', 'processed_participants', 'answers', 'raw_bytes', 'processed_bytes', 'fingerprint', 'indexed_at'
+]
+
+def run_started_at(run_folder):
+    """
+    Parse the start time from a 'gps_run_<YYYYmmdd_HHMMSS>' folder name.
+    """
+    try:
+        return datetime.strptime(run_folder.name[len("gps_run_"):], "%Y%m%d_%H%M%S").isoformat()
+    except ValueError:
+        return None
+
+def run_data_files(run_folder):
+    """
+    List the data files of a run: (kind, path) for the raw 'gps' and processed 'gps_proc' files
+    and the configuration snapshot.
+    """
+    files = []
+    for kind, subfolder in (('raw', 'gps'), ('processed', 'gps_proc')):
+        folder = run_folder / subfolder
+        if folder.is_dir():
+            files.extend((kind, path) for path in sorted(folder.glob("*.csv")))
+    config_file = run_folder / RUN_CONFIG_FILE
+    if config_file.exists():
+        files.append(('config', config_file))
+    return files
+
+def run_fingerprint(files):
+    """
+    Fingerprint of a run's files (name, size, modification time); a run is only
+    indexed again when it changes.
+    """
+    key = hashlib.sha256(f"{CATALOG_VERSION}".encode('utf-8'))
+    for kind, path in files:
+        stat = path.stat()
+        key.update(f"|{kind}|{path.name}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    return key.hexdigest()[:16]
+
+def file_country(path):
+    """
+    Country of a per-country results file ('results_<country>.csv').
+    """
+    return path.stem[len("results_"):] if path.stem.startswith("results_") else None
+
+def count_participants(csv_file):
+    """
+    Count the rows and distinct participants of a results file, reading only the
+    participant IDs.
+    """
+    try:
+        ids = pd.read_csv(csv_file, usecols=['Participant ID'])['Participant ID']
+    except pd.errors.EmptyDataError:
+        return 0, 0
+    return len(ids), ids.nunique()
+
+class RunCatalog:
+    """
+    Index of the 'gps_run_*' folders in a base folder, kept in a small SQLite file.
+
+    The index records each run's configuration snapshot, model, participant and answer
+    counts, file sizes and processing status, and the per-country files of the run, so
+    runs can be listed and loaded without scanning folders or reading CSV files.
+    """
+
+    def __init__(self, base_folder: Path):
+        self.base_folder = Path(base_folder)
+        self.catalog_file = self.base_folder / CATALOG_FILE
+        self.connection = sqlite3.connect(self.catalog_file)
+        self.connection.executescript(CATALOG_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, run_folders: list = None) -> int:
+        """
+        Index new and changed runs and drop runs whose folders were removed.
+
+        Parameters:
+        - run_folders: Run folders to index; None indexes every run in the base folder.
+
+        Returns:
+        - int: Number of runs (re)indexed.
+        """
+        if run_folders is None:
+            run_folders = sorted(
+                f for f in self.base_folder.iterdir() if f.is_dir() and f.name.startswith("gps_run_")
+            )
+            indexed_names = {row[0] for row in self.connection.execute("SELECT run_name FROM runs")}
+            removed = indexed_names - {f.name for f in run_folders}
+            with self.connection:
+                for run_name in removed:
+                    self.connection.execute("DELETE FROM runs WHERE run_name = ?", (run_name,))
+                    self.connection.execute("DELETE FROM run_files WHERE run_name = ?", (run_name,))
+            if removed:
+                logging.info(f"Removed {len(removed)} runs without a folder from the catalog.")
+
+        fingerprints = dict(self.connection.execute("SELECT run_name, fingerprint FROM runs"))
+        updated = 0
+        for run_folder in map(Path, run_folders):
+            files = run_data_files(run_folder)
+            fingerprint = run_fingerprint(files)
+            if fingerprints.get(run_folder.name) == fingerprint:
+                continue
+            self.index_run(run_folder, files, fingerprint)
+            updated += 1
+
+        logging.info(f"Run catalog {self.catalog_file}: {updated} runs indexed.")
+        return updated
+
+    def index_run(self, run_folder: Path, files: list, fingerprint: str):
+        """
+        Read a run's configuration snapshot and count its participants and answers.
+        """
+        logging.info(f"Indexing run: {run_folder.name}")
+        snapshot = {}
+        config_file = run_folder / RUN_CONFIG_FILE
+        if config_file.exists():
+            with open(config_file, 'r') as file:
+                snapshot = yaml.safe_load(file) or {}
+        run_info = snapshot.get('run', {})
+
+        gps_folder = run_folder / "gps"
+        layout = 'normalized' if has_normalized_results(gps_folder) else 'wide'
+        file_rows = []
+        for kind, path in files:
+            if kind == 'config':
+                continue
+            country = file_country(path)
+            rows, participants = count_participants(path) if country else (None, None)
+            file_rows.append((run_folder.name, kind, country, str(path), path.stat().st_size, participants, rows))
+
+        if layout == 'normalized':
+            participants = len(pd.read_csv(gps_folder / PARTICIPANTS_TABLE, usecols=['Participant ID'])) \
+                if (gps_folder / PARTICIPANTS_TABLE).exists() else 0
+            answers = len(pd.read_csv(gps_folder / ANSWERS_TABLE, usecols=['Participant ID']))
+        else:
+            participants = sum(row[5] for row in file_rows if row[1] == 'raw' and row[5] is not None)
+            answers = sum(row[6] for row in file_rows if row[1] == 'raw' and row[6] is not None)
+        processed_participants = sum(row[5] for row in file_rows if row[1] == 'processed' and row[5] is not None)
+
+        if participants == 0:
+            status = 'empty'
+        elif processed_participants == 0:
+            status = 'raw'
+        elif processed_participants < participants:
+            status = 'partial'
+        else:
+            status = 'processed'
+
+        record = {
+            'run_name': run_folder.name,
+            'path': str(run_folder),
+            'started_at': run_info.get('started_at') or run_started_at(run_folder),
+            'completed_at': run_info.get('completed_at'),
+            'model': ', '.join(target.get('name', target.get('model', '')) for target in snapshot['targets'])
+                     if snapshot.get('targets') else snapshot.get('api', {}).get('model'),
+            'config_snapshot': json.dumps(snapshot) if snapshot else None,
+            'layout': layout,
+            'status': status,
+            'participants': participants,
+            'processed_participants': processed_participants,
+            'answers': answers,
+            'raw_bytes': sum(row[4] for row in file_rows if row[1] == 'raw'),
+            'processed_bytes': sum(row[4] for row in file_rows if row[1] == 'processed'),
+            'fingerprint': fingerprint,
+            'indexed_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                [record[col] for col in RUN_COLUMNS]
+            )
+            self.connection.execute("DELETE FROM run_files WHERE run_name = ?", (run_folder.name,))
+            self.connection.executemany("INSERT INTO run_files VALUES (?, ?, ?, ?, ?, ?, ?)", file_rows)
+
+    def list_runs(self, model: str = None, status: str = None, since: str = None) -> pd.DataFrame:
+        """
+        List the indexed runs, optionally filtered by model (one of the run's models for
+        multi-model runs), processing status and start time (ISO format, inclusive).
+        """
+        conditions, parameters = [], []
+        if model is not None:
+            # Multi-model runs list their models as 'a, b, c'
+            conditions.append("instr(', ' || model || ', ', ?) > 0")
+            parameters.append(f", {model}, ")
+        for column, operator, value in (('status', '=', status), ('started_at', '>=', since)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return pd.read_sql_query(f"SELECT * FROM runs{where} ORDER BY run_name", self.connection, params=parameters)
+
+    def most_recent_run(self) -> Path:
+        """
+        Folder of the most recent indexed run (by the timestamp in its name).
+        """
+        row = self.connection.execute("SELECT path FROM runs ORDER BY run_name DESC LIMIT 1").fetchone()
+        return Path(row[0]) if row else None
+
+    def config_snapshot(self, run_name: str) -> dict:
+        """
+        Configuration snapshot of a run, or None if the run has none.
+        """
+        row = self.connection.execute("SELECT config_snapshot FROM runs WHERE run_name = ?", (run_name,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def load_runs(self, run_names: list = None, kind: str = 'processed', columns: list = None, countries: list = None):
+        """
+        Load a set of runs lazily as one dataset.
+
+        Parameters:
+        - run_names: Runs to load; None loads every indexed run.
+        - kind: 'processed' for the 'gps_proc' rows or 'raw' for the rows as answered.
+        - columns: Columns to read; None reads all columns.
+        - countries: Countries to read; None reads all countries.
+        """
+        if run_names is None:
+            run_names = self.list_runs()['run_name'].tolist()
+        files = pd.read_sql_query(
+            f"SELECT run_name, country, path FROM run_files WHERE kind = ? AND run_name IN ({', '.join('?' * len(run_names))}) "
+            "ORDER BY run_name, country",
+            self.connection, params=[kind] + list(run_names)
+        )
+        if countries is not None:
+            files = files[files['country'].isin(countries)]
+        runs = {
+            run_name: (Path(path), layout) for run_name, path, layout in self.connection.execute(
+                f"SELECT run_name, path, layout FROM runs WHERE run_name IN ({', '.join('?' * len(run_names))}) "
+                "ORDER BY run_name", list(run_names)
+            )
+        }
+        return RunDataset(runs, files, kind, columns, countries)
+
+class RunDataset:
+    """
+    Lazily loaded rows of several runs, with a 'Run' column naming the run of each row.
+    Iterating reads one file at a time; to_pandas reads and concatenates all of them.
+    """
+
+    def __init__(self, runs: dict, files: pd.DataFrame, kind: str, columns: list = None, countries: list = None):
+        self.runs = runs
+        self.files = files
+        self.kind = kind
+        self.columns = columns
+        self.countries = countries
+        self.concatenator = GPSDataConcatenator(None, None)
+
+    def __iter__(self):
+        for run_name, (run_folder, layout) in self.runs.items():
+            if self.kind == 'raw' and layout == 'normalized':
+                # Raw rows of normalized runs are rebuilt from the run's tables
+                df = load_wide_results(run_folder / "gps", self.countries)
+                df = df[self.columns] if self.columns else df
+                df = df.astype({col: 'category' for col in RESULTS_CATEGORICAL_COLUMNS if col in df.columns})
+                yield self.tag(df, run_name)
+                continue
+
+            for file in self.files[self.files['run_name'] == run_name].itertuples(index=False):
+                if file.country is None:
+                    continue
+                try:
+                    df = self.concatenator.read_results_csv(Path(file.path), self.columns)
+                except pd.errors.EmptyDataError:
+                    logging.warning(f"Empty CSV file skipped: {file.path}")
+                    continue
+                except Exception as e:
+                    logging.error(f"Error reading {file.path}: {e}")
+                    continue
+                yield self.tag(df, run_name)
+
+    def tag(self, df: pd.DataFrame, run_name: str) -> pd.DataFrame:
+        df.insert(0, 'Run', run_name)
+        return df
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Read all files of the dataset into one DataFrame with shared categories.
+        """
+        df_list = list(self)
+        if not df_list:
+            logging.error("No run data found for the selected runs.")
+            return None
+        self.concatenator.align_categories(df_list)
+        df = pd.concat(df_list, ignore_index=True)
+        df['Run'] = df['Run'].astype('category')
+        return df
+
+if __name__ == "__main__":
+    config = load_config()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Index the GPS run folders and list the indexed runs.")
+    parser.add_argument('--base_folder', type=str, default=config['paths']['output_folder'], help='Base folder path for processed data.')
+    parser.add_argument('--model', type=str, default=None, help='Only list runs of this model.')
+    parser.add_argument('--status', type=str, default=None, help='Only list runs with this status (empty, raw, partial, processed).')
+    parser.add_argument('--log_level', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).')
+    args = parser.parse_args()
+
+    # Configure logging with timestamp and dynamic level
+    numeric_level = getattr(logging, args.log_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError(f'Invalid log level: {args.log_level}')
+    logging.basicConfig(
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=numeric_level,
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    catalog = RunCatalog(Path(args.base_folder))
+    catalog.update()
+    runs = catalog.list_runs(model=args.model, status=args.status)
+    print(runs.drop(columns=['path', 'config_snapshot', 'fingerprint']).to_string(index=False))
+    catalog.close()
@@ -0,0 +1,239 @@
+# scripts/compare_benchmarks.py
+
+import argparse
+import hashlib
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import os
+import sys
+if not __package__:
+    # Run as a script (python scripts/compare_benchmarks.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.benchmark_loader import load_benchmark, get_file_hash, BENCHMARK_COLUMNS
+from scripts.concat_and_clean import GPSDataConcatenator
+from scripts.preference_data import PREFERENCE_MEASURES, build_run_preferences
+from scripts.utils import load_config
+
+# Bump when the comparison output changes so cached results are recomputed
+COMPARISON_VERSION = 1
+
+def stack_measures(df, measures, sample):
+    """
+    Reshape one row per respondent into one row per (country, measure, value), dropping
+    missing values, and tag the rows with the sample they come from (0 = run, 1 = benchmark).
+    """
+    available = [m for m in measures if m in df.columns]
+    long_df = df[['country'] + available].melt(id_vars='country', var_name='measure', value_name='value')
+    long_df = long_df.dropna(subset=['country', 'value'])
+    long_df['country'] = long_df['country'].astype(str)
+    long_df['sample'] = sample
+    return long_df
+
+def compare_distributions(run_preferences, benchmark, measures=PREFERENCE_MEASURES):
+    """
+    Compare the run with the benchmark for every country x preference measure in one
+    vectorized pass: counts, means and standard deviations of both samples, the
+    Kolmogorov-Smirnov statistic and the Wasserstein (earth mover's) distance.
+
+    Both samples are pooled and sorted by group and value once; the empirical CDFs of the
+    two samples are then cumulative counts within each group, and the distances are
+    group-wise reductions over the pooled points.
+
+    Parameters:
+    - run_preferences: One row per run participant (see preference_data.build_run_preferences).
+    - benchmark: One row per benchmark respondent.
+    - measures: Preference measures to compare.
+    """
+    pooled = pd.concat(
+        [stack_measures(run_preferences, measures, 0), stack_measures(benchmark, measures, 1)],
+        ignore_index=True
+    )
+    group_codes, groups = pd.MultiIndex.from_frame(pooled[['country', 'measure']]).factorize()
+    n_groups = len(groups)
+    values = pooled['value'].to_numpy(dtype=float)
+    is_benchmark = pooled['sample'].to_numpy() == 1
+
+    # Moments per group and sample
+    def moments(mask):
+        counts = np.bincount(group_codes[mask], minlength=n_groups).astype(float)
+        sums = np.bincount(group_codes[mask], weights=values[mask], minlength=n_groups)
+        squares = np.bincount(group_codes[mask], weights=values[mask] ** 2, minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            variances = (squares - counts * means ** 2) / (counts - 1)
+        return counts, means, np.sqrt(np.clip(variances, 0, None))
+
+    n_run, mean_run, sd_run = moments(~is_benchmark)
+    n_benchmark, mean_benchmark, sd_benchmark = moments(is_benchmark)
+
+    # Sort the pooled points by group, then value
+    order = np.lexsort((values, group_codes))
+    sorted_groups = group_codes[order]
+    sorted_values = values[order]
+    sorted_benchmark = is_benchmark[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(sorted_groups) != 0])
+    present_groups = sorted_groups[starts]
+
+    # Empirical CDFs of both samples at every pooled point (cumulative counts within the group)
+    run_cumulative = np.cumsum(~sorted_benchmark)
+    benchmark_cumulative = np.cumsum(sorted_benchmark)
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    run_before = np.r_[0, run_cumulative][group_start]
+    benchmark_before = np.r_[0, benchmark_cumulative][group_start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        run_cdf = (run_cumulative - run_before) / n_run[sorted_groups]
+        benchmark_cdf = (benchmark_cumulative - benchmark_before) / n_benchmark[sorted_groups]
+    cdf_gap = np.abs(run_cdf - benchmark_cdf)
+
+    # Only evaluate the KS statistic after the last of tied values
+    next_same = np.r_[(sorted_groups[1:] == sorted_groups[:-1]) & (sorted_values[1:] == sorted_values[:-1]), False]
+    ks = np.full(n_groups, np.nan)
+    ks[present_groups] = np.maximum.reduceat(np.where(next_same, 0.0, cdf_gap), starts)
+
+    # Wasserstein-1 distance: integral of the CDF gap between consecutive pooled points
+    next_in_group = np.r_[sorted_groups[1:] == sorted_groups[:-1], False]
+    widths = np.where(next_in_group, np.r_[np.diff(sorted_values), 0.0], 0.0)
+    wasserstein = np.full(n_groups, np.nan)
+    wasserstein[present_groups] = np.add.reduceat(np.nan_to_num(cdf_gap) * widths, starts)
+
+    # Distances are undefined when either sample is empty
+    undefined = (n_run == 0) | (n_benchmark == 0)
+    ks[undefined] = np.nan
+    wasserstein[undefined] = np.nan
+
+    comparison = pd.DataFrame({
+        'country': groups.get_level_values(0),
+        'measure': groups.get_level_values(1),
+        'n_run': n_run.astype(int),
+        'n_benchmark': n_benchmark.astype(int),
+        'mean_run': mean_run,
+        'mean_benchmark': mean_benchmark,
+        'sd_run': sd_run,
+        'sd_benchmark': sd_benchmark,
+        'ks': ks,
+        'wasserstein': wasserstein
+    })
+    return comparison.sort_values(['measure', 'country']).reset_index(drop=True)
+
+def summarize_comparison(comparison):
+    """
+    Summarize a comparison per measure: rank correlations (Spearman, Kendall) of run and
+    benchmark country means and the average distances over countries with both samples.
+    """
+    both = comparison.dropna(subset=['mean_run', 'mean_benchmark'])
+    rows = []
+    for measure, group in both.groupby('measure', sort=True):
+        rows.append({
+            'measure': measure,
+            'n_countries': len(group),
+            'spearman': group['mean_run'].corr(group['mean_benchmark'], method='spearman'),
+            'kendall': group['mean_run'].corr(group['mean_benchmark'], method='kendall'),
+            'mean_ks': group['ks'].mean(),
+            'mean_wasserstein': group['wasserstein'].mean()
+        })
+    return pd.DataFrame(rows, columns=['measure', 'n_countries', 'spearman', 'kendall', 'mean_ks', 'mean_wasserstein'])
+
+def load_run_data(run_path):
+    """
+    Load a run's processed answers, either from a cleaned CSV file or from a run folder's
+    'gps_proc' subfolder.
+    """
+    run_path = Path(run_path)
+    if run_path.is_dir():
+        concatenator = GPSDataConcatenator(run_path.parent, None)
+        return concatenator.concat_all_csv_files(run_path / "gps_proc")
+    return pd.read_csv(run_path)
+
+def run_cache_key(run_path, benchmark_hash, measures):
+    """
+    Key of a run's cached comparison: the run data's files (path, size, modification time),
+    the benchmark file hash and the compared measures.
+    """
+    run_path = Path(run_path).resolve()
+    files = sorted((run_path / "gps_proc").glob("*.csv")) if run_path.is_dir() else [run_path]
+    key = hashlib.sha256(f"{COMPARISON_VERSION}|{benchmark_hash}|{','.join(measures)}".encode('utf-8'))
+    for file in files:
+        stat = file.stat()
+        key.update(f"|{file}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    return key.hexdigest()[:16]
+
+def compare_runs(run_paths, benchmark, benchmark_hash, cache_dir, measures=PREFERENCE_MEASURES):
+    """
+    Compare many runs with the benchmark, reusing cached comparisons of unchanged runs.
+
+    Returns:
+    - tuple: Comparison per (run, country, measure) and summary per (run, measure).
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    comparisons = []
+    for run_path in run_paths:
+        cache_file = cache_dir / f"comparison_{run_cache_key(run_path, benchmark_hash, measures)}.csv"
+        if cache_file.exists():
+            logging.info(f"Using cached comparison for {run_path}: {cache_file}")
+            comparison = pd.read_csv(cache_file)
+        else:
+            run_data = load_run_data(run_path)
+            if run_data is None or run_data.empty:
+                logging.error(f"No run data found for {run_path}. Skipping.")
+                continue
+            comparison = compare_distributions(build_run_preferences(run_data), benchmark, measures)
+            comparison.to_csv(cache_file, index=False)
+            logging.info(f"Comparison for {run_path} cached at {cache_file}")
+        comparison.insert(0, 'run', str(run_path))
+        comparisons.append(comparison)
+
+    if not comparisons:
+        return pd.DataFrame(), pd.DataFrame()
+
+    comparison_df = pd.concat(comparisons, ignore_index=True)
+    summary_df = pd.concat(
+        [summarize_comparison(group).assign(run=run) for run, group in comparison_df.groupby('run', sort=False)],
+        ignore_index=True
+    )
+    summary_df = summary_df[['run'] + [col for col in summary_df.columns if col != 'run']]
+    return comparison_df, summary_df
+
+if __name__ == "__main__":
+    config = load_config()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Compare the preference distributions of runs with the GPS benchmark.")
+    parser.add_argument('--runs', type=str, nargs='+', required=True, help='Cleaned run CSV files or gps_run_* folders to compare.')
+    parser.add_argument('--benchmark_file', type=str, default=config['paths']['benchmark_file'], help='Path to the GPS individual Stata file.')
+    parser.add_argument('--cache_folder', type=str, default=config['paths'].get('benchmark_cache_folder'), help='Folder for the benchmark data and comparison caches.')
+    parser.add_argument('--results_folder', type=str, required=True, help='Path to the folder to save the comparison tables.')
+    parser.add_argument('--measures', type=str, nargs='*', default=PREFERENCE_MEASURES, help='Preference measures to compare.')
+    parser.add_argument('--log_level', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).')
+    args = parser.parse_args()
+
+    # Configure logging with timestamp and dynamic level
+    numeric_level = getattr(logging, args.log_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError(f'Invalid log level: {args.log_level}')
+    logging.basicConfig(
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=numeric_level,
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    results_folder = Path(args.results_folder)
+    results_folder.mkdir(parents=True, exist_ok=True)
+    cache_folder = Path(args.cache_folder) if args.cache_folder else Path(args.benchmark_file).parent / "cache"
+
+    benchmark = load_benchmark(args.benchmark_file, columns=BENCHMARK_COLUMNS, cache_dir=cache_folder)
+    benchmark_hash = get_file_hash(args.benchmark_file, cache_folder)
+
+    comparison_df, summary_df = compare_runs(
+        args.runs, benchmark, benchmark_hash, cache_folder / "comparisons", args.measures
+    )
+    if comparison_df.empty:
+        logging.error("No runs could be compared. Exiting.")
+    else:
+        comparison_df.to_csv(results_folder / "benchmark_comparison.csv", index=False)
+        summary_df.to_csv(results_folder / "benchmark_comparison_summary.csv", index=False)
+        logging.info(f"Comparison tables saved to: {results_folder}")
+        print(summary_df.to_string(index=False))
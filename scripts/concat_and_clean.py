@@ -1,11 +1,35 @@
 # concat_and_clean.py
 
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 import yaml
 import argparse
 
+# Declared schema of the processed results files. Repeated text columns are read as
+# categoricals so each distinct value is stored once; numeric columns are coerced after reading.
+RESULTS_CATEGORICAL_COLUMNS = [
+    'Participant ID', 'Participant Hash', 'Question', 'Short Title', 'Gender', 'Country', 'Model', 'Parse Status'
+]
+RESULTS_NUMERIC_DTYPES = {
+    'Answer': 'float64',
+    'Age': 'Int8',
+}
+# The same schema as Arrow types: categorical columns are dictionary-encoded, so they
+# convert to pandas categoricals
+RESULTS_ARROW_TYPES = {
+    **{col: pa.dictionary(pa.int32(), pa.string()) for col in RESULTS_CATEGORICAL_COLUMNS},
+    'Answer': pa.float64(),
+    'Age': pa.int8(),
+}
+# Columns of an answer that rows sharing them are expected to agree on; the same question can be
+# asked a participant twice (e.g. a repeated reciprocation stake), so they are checked, not deduplicated on
+RESULTS_KEY_COLUMNS = ['Participant ID', 'Short Title', 'Question']
+
 class GPSDataConcatenator:
     def __init__(self, base_folder: Path, output_csv: Path):
         self.base_folder = base_folder
@@ -13,7 +37,9 @@ class GPSDataConcatenator:
 
     def find_most_recent_run_folder(self) -> Path:
         """
-        Find the most recent run folder based on its creation/modification time.
+        Find the most recent run folder based on the timestamp in its name, like
+        data_processor and the run catalog (modification times change whenever a
+        run is reprocessed).
         """
         run_folders = [f for f in self.base_folder.iterdir() if f.is_dir() and f.name.startswith("gps_run_")]
 
@@ -21,13 +47,17 @@ class GPSDataConcatenator:
             logging.error("No run folders found.")
             return None
 
-        most_recent_run_folder = max(run_folders, key=lambda f: f.stat().st_mtime)
+        most_recent_run_folder = max(run_folders, key=lambda f: f.name)
         logging.info(f"Most recent run folder: {most_recent_run_folder}")
         return most_recent_run_folder
 
-    def concat_all_csv_files(self, gps_proc_folder: Path) -> pd.DataFrame:
+    def concat_all_csv_files(self, gps_proc_folder: Path, workers: int = None) -> pd.DataFrame:
         """
         Concatenate all CSV files in the 'gps_proc' subfolder.
+
+        The files are parsed concurrently by the Arrow CSV reader with the declared
+        schema; the Arrow tables are concatenated without copying and converted to
+        pandas once at the end.
         """
         csv_files = list(gps_proc_folder.glob("*.csv"))
 
@@ -35,28 +65,85 @@ class GPSDataConcatenator:
             logging.error("No CSV files found in the gps_proc folder.")
             return None
 
-        df_list = []
-        for csv_file in csv_files:
-            logging.info(f"Reading file: {csv_file.name}")
-            try:
-                df = pd.read_csv(csv_file)
-                df_list.append(df)
-            except pd.errors.EmptyDataError:
-                logging.warning(f"Empty CSV file skipped: {csv_file.name}")
-            except Exception as e:
-                logging.error(f"Error reading {csv_file.name}: {e}")
-
-        if not df_list:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            tables = list(executor.map(self.read_results_table, csv_files))
+        tables = [table for table in tables if table is not None]
+
+        if not tables:
             logging.error("No valid CSV files to concatenate.")
             return None
 
-        concatenated_df = pd.concat(df_list, ignore_index=True)
-        logging.info(f"Concatenated {len(df_list)} CSV files.")
+        # Columns missing from some files (e.g. written before a column was added) become null
+        concatenated = pa.concat_tables(tables, promote_options='default')
+        concatenated_df = concatenated.to_pandas(types_mapper={pa.int8(): pd.Int8Dtype()}.get)
+        logging.info(f"Concatenated {len(tables)} CSV files.")
         return concatenated_df
 
+    def read_results_table(self, csv_file: Path) -> pa.Table:
+        """
+        Read a single results CSV file into an Arrow table with the declared results
+        schema. Returns None for files that cannot be used, with the same per-file
+        handling as before: empty files are skipped with a warning, unreadable files
+        with an error. Files with values the Arrow parser rejects are read with pandas.
+        """
+        logging.info(f"Reading file: {csv_file.name}")
+        try:
+            if os.path.getsize(csv_file) == 0:
+                raise pd.errors.EmptyDataError("No columns to parse from file")
+            try:
+                table = pa_csv.read_csv(
+                    csv_file,
+                    convert_options=pa_csv.ConvertOptions(column_types=RESULTS_ARROW_TYPES, strings_can_be_null=True)
+                )
+            except pa.ArrowInvalid:
+                # e.g. a non-numeric answer, which the declared schema coerces to missing
+                table = pa.Table.from_pandas(self.read_results_csv(csv_file), preserve_index=False)
+            # Give every file the declared types, so the tables concatenate without conversion
+            for i, field in enumerate(table.schema):
+                if field.name in RESULTS_ARROW_TYPES and field.type != RESULTS_ARROW_TYPES[field.name]:
+                    table = table.set_column(i, field.name, table.column(i).cast(RESULTS_ARROW_TYPES[field.name]))
+            return table
+        except pd.errors.EmptyDataError:
+            logging.warning(f"Empty CSV file skipped: {csv_file.name}")
+        except Exception as e:
+            logging.error(f"Error reading {csv_file.name}: {e}")
+        return None
+
+    def read_results_csv(self, csv_file: Path, columns: list = None) -> pd.DataFrame:
+        """
+        Read a single results CSV file using the declared results schema.
+        If columns are given, only those columns are read.
+        """
+        df = pd.read_csv(
+            csv_file,
+            usecols=columns,
+            dtype={col: 'category' for col in RESULTS_CATEGORICAL_COLUMNS}
+        )
+        for col, dtype in RESULTS_NUMERIC_DTYPES.items():
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        return df
+
+    def align_categories(self, df_list: list):
+        """
+        Give every categorical column the same categories in all DataFrames so that
+        pd.concat keeps them categorical instead of falling back to object strings.
+        """
+        for col in RESULTS_CATEGORICAL_COLUMNS:
+            frames = [df for df in df_list if col in df.columns]
+            if not frames:
+                continue
+            categories = pd.api.types.union_categoricals(
+                [df[col] for df in frames], ignore_order=True
+            ).categories
+            for df in frames:
+                df[col] = df[col].cat.set_categories(categories)
+
     def basic_cleaning(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Perform basic data cleaning such as removing duplicates and handling missing values.
+        Only exact duplicate rows are dropped; rows sharing a participant and question but
+        differing otherwise are distinct answers to a repeated question, which are kept and counted.
         """
         initial_count = len(df)
         df = df.drop_duplicates()
@@ -64,6 +151,11 @@ class GPSDataConcatenator:
         if duplicates_dropped > 0:
             logging.info(f"Dropped {duplicates_dropped} duplicate rows.")
 
+        if all(col in df.columns for col in RESULTS_KEY_COLUMNS):
+            repeated = int(df.duplicated(subset=RESULTS_KEY_COLUMNS, keep=False).sum())
+            if repeated:
+                logging.warning(f"{repeated} rows repeat a participant's question with a different answer; all of them are kept.")
+
         # Example of handling missing values: drop rows where all elements are NaN
         df = df.dropna(how='all')
         logging.info("Dropped rows where all elements are NaN.")
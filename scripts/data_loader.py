@@ -1,8 +1,32 @@
 # scripts/data_loader.py
 
+import os
 import pandas as pd
 from .utils import load_config
 
+# Normalized results layout written to a run's GPS folder
+QUESTIONS_TABLE = "questions.csv"
+PARTICIPANTS_TABLE = "participants.csv"
+ANSWERS_TABLE = "answers.csv"
+
+# Configuration snapshot written to each run folder
+RUN_CONFIG_FILE = "run_config.yaml"
+
+QUESTION_COLUMNS = ['Question ID', 'Battery', 'Stake', 'Currency', 'Short Title', 'Question']
+PARTICIPANT_COLUMNS = ['Participant ID', 'Participant Hash', 'Age', 'Gender', 'Country']
+ANSWER_COLUMNS = ['Participant ID', 'Question ID', 'Answer', 'Value', 'Parse Status']
+
+# Columns with the answers parsed at ingest (absent in runs written before answers were parsed)
+TYPED_ANSWER_COLUMNS = ['Value', 'Parse Status']
+
+# API target a participant was asked to (absent in runs written before multi-model runs)
+MODEL_COLUMNS = ['Model']
+
+# Column order of the wide results rows (one row per answer)
+WIDE_RESULT_COLUMNS = [
+    'Participant ID', 'Participant Hash', 'Question', 'Answer', 'Short Title', 'Age', 'Gender', 'Country'
+]
+
 def load_stakes_data():
     config = load_config()
     stakes_file_path = config['paths']['stakes_file']
@@ -15,4 +39,50 @@ def load_stakes_data():
     time_stakes_df = stakes_sheets['QXIV-TIME']
     recip_stakes_df = stakes_sheets['QXII-RECIP']
     donation_stakes_df = stakes_sheets['QXIII-DONATION']
-    return stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df
\ No newline at end of file
+    return stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df
+
+def has_normalized_results(gps_folder_path):
+    """
+    Check whether a GPS folder contains results in the normalized table layout.
+    """
+    return os.path.exists(os.path.join(gps_folder_path, ANSWERS_TABLE))
+
+def load_participants_table(gps_folder_path):
+    """
+    Load the participants table of a run, or an empty table if none was written yet.
+    """
+    participants_file = os.path.join(gps_folder_path, PARTICIPANTS_TABLE)
+    if not os.path.exists(participants_file):
+        return pd.DataFrame(columns=PARTICIPANT_COLUMNS)
+    return pd.read_csv(participants_file)
+
+def load_wide_results(gps_folder_path, countries=None):
+    """
+    Rebuild the wide results rows (one row per answer, with the participant's
+    demographics and the full question text) from the normalized tables.
+
+    Parameters:
+    - gps_folder_path: Path to a run's GPS folder containing the normalized tables.
+    - countries: Optional list of countries to restrict the result to.
+    """
+    questions_df = pd.read_csv(
+        os.path.join(gps_folder_path, QUESTIONS_TABLE),
+        usecols=['Question ID', 'Short Title', 'Question'],
+        dtype={'Short Title': 'category', 'Question': 'category'}
+    )
+    participants_df = load_participants_table(gps_folder_path)
+    answers_df = pd.read_csv(
+        os.path.join(gps_folder_path, ANSWERS_TABLE),
+        dtype={'Answer': 'object'}
+    )
+
+    if countries is not None:
+        participants_df = participants_df[participants_df['Country'].isin(countries)]
+        answers_df = answers_df[answers_df['Participant ID'].isin(participants_df['Participant ID'])]
+
+    # Left merges keep the answers in the order they were given
+    wide_df = answers_df.merge(participants_df, on='Participant ID', how='left')
+    wide_df = wide_df.merge(questions_df, on='Question ID', how='left')
+    wide_df['Question'] = wide_df['Question'].astype('object')
+    wide_df['Short Title'] = wide_df['Short Title'].astype('object')
+    return wide_df[WIDE_RESULT_COLUMNS + [col for col in MODEL_COLUMNS + TYPED_ANSWER_COLUMNS if col in wide_df.columns]]
@@ -1,11 +1,17 @@
 # scripts/data_processor.py
 
 import os
+import re
 import pandas as pd
 import logging
 import traceback
 from pathlib import Path
 from datetime import datetime
+import sys
+if not __package__:
+    # Run as a script (python scripts/data_processor.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.data_loader import has_normalized_results, load_wide_results
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
@@ -86,8 +92,6 @@ def clean_and_extract_numbers(df):
 
     return df
 
-import re
-
 def process_recip_donation(df):
     """
     For Reciprocity and Donation questions:
@@ -142,6 +146,46 @@ def process_recip_donation(df):
 
     return df
 
+def apply_typed_values(df):
+    """
+    Replace the raw answers with the values parsed at ingest (see answer_parser):
+    "Option 1" / "Option 2" for Risk and Delay questions (coded 1 and 2), the number
+    otherwise. Answers that could not be parsed become missing.
+    """
+    choice_mask = df['Short Title'].str.startswith((RISK_SHORT_TITLE_PREFIX, DELAY_SHORT_TITLE_PREFIX))
+    values = pd.to_numeric(df['Value'], errors='coerce')
+    choices = values.map({1.0: "Option 1", 2.0: "Option 2"})
+    df['Answer'] = choices.where(choice_mask, values).astype(object)
+    return df.drop(columns=['Value'])
+
+def process_participant_results(df):
+    """
+    Run the full processing pipeline on raw result rows.
+
+    Every step only looks at rows of the same participant, so this can be applied
+    to a single participant's answers as soon as they are saved, or to a whole
+    country file at once. Rows with answers parsed at ingest ('Value' column) use the
+    parsed values instead of extracting numbers from the text.
+    """
+    typed = 'Value' in df.columns
+    if typed:
+        df = apply_typed_values(df)
+
+    # Step 1: Process Risk and Delay Questions
+    df = process_risk_delay(df)
+
+    # Step 2: Clean the DataFrame by deleting "Option 1" rows and extracting numbers
+    if typed:
+        df = df[df['Answer'] != "Option 1"].copy()
+        df['Answer'] = pd.to_numeric(df['Answer'], errors='coerce')
+    else:
+        df = clean_and_extract_numbers(df)
+
+    # Step 3: Process Reciprocity and Donation Questions (now the answers should be clean)
+    df = process_recip_donation(df)
+
+    return df
+
 def process_file(file_path, output_dir):
     """
     Process a single CSV file and save the result in the output directory.
@@ -156,14 +200,8 @@ def process_file(file_path, output_dir):
             logger.error(f"Missing required columns in {file_path.name}. Skipping file.")
             return
 
-        # Step 1: Process Risk and Delay Questions
-        df = process_risk_delay(df)
-
-        # Step 2: Clean the DataFrame by deleting "Option 1" rows and extracting numbers
-        df = clean_and_extract_numbers(df)
-
-        # Step 3: Process Reciprocity and Donation Questions (now the answers should be clean)
-        df = process_recip_donation(df)
+        # Steps 1-3: Process risk/delay, clean answers, process reciprocity/donation
+        df = process_participant_results(df)
 
         # Step 4: Save the processed DataFrame to the output directory
         output_file = output_dir / file_path.name
@@ -173,6 +211,30 @@ def process_file(file_path, output_dir):
     except Exception as e:
         logger.error(f"Error processing file {file_path.name}: {e}")
         logger.error(traceback.format_exc())
+
+def process_normalized_results(input_dir, output_dir):
+    """
+    Rebuild the wide results rows from a run's normalized tables, process them and
+    save one processed file per country in the output directory.
+    """
+    try:
+        wide_df = load_wide_results(input_dir)
+        logger.info(f"Loaded {len(wide_df)} answers from normalized tables in {input_dir}")
+    except Exception as e:
+        logger.error(f"Error loading normalized results from {input_dir}: {e}")
+        logger.error(traceback.format_exc())
+        return
+
+    for country, country_df in wide_df.groupby('Country', sort=False):
+        try:
+            df = process_participant_results(country_df.copy())
+            output_file = output_dir / f"results_{country}.csv"
+            df.to_csv(output_file, index=False)
+            logger.info(f"Processed file saved to: {output_file}")
+        except Exception as e:
+            logger.error(f"Error processing results for {country}: {e}")
+            logger.error(traceback.format_exc())
+
 def main():
     """
     Main function to find the most recent run folder, process all CSV files in the 'gps' subfolder,
@@ -190,6 +252,11 @@ def main():
     # Ensure the output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    # Runs written with the normalized layout are rebuilt into wide rows first
+    if has_normalized_results(input_dir):
+        process_normalized_results(input_dir, output_dir)
+        return
+
     # Process all CSV files in the input directory
     for csv_file in input_dir.glob("*.csv"):
         process_file(csv_file, output_dir)
@@ -1,54 +1,165 @@
 # scripts/data_saver.py
 
 import asyncio
+import copy
 import pandas as pd
 import os
 import logging
+import yaml
+from .data_processor import process_participant_results
+from .data_loader import (
+    QUESTIONS_TABLE, PARTICIPANTS_TABLE, ANSWERS_TABLE, RUN_CONFIG_FILE,
+    QUESTION_COLUMNS, PARTICIPANT_COLUMNS, ANSWER_COLUMNS, WIDE_RESULT_COLUMNS, MODEL_COLUMNS, TYPED_ANSWER_COLUMNS
+)
+
+# Table file -> columns of its header, read once per file
+table_headers = {}
+# Table files whose dropped columns were already reported
+misaligned_tables = set()
+
+def append_table_rows(df, table_file):
+    """
+    Append rows to a CSV table, writing the header only when the file is created.
+
+    Rows appended to an existing table are aligned to its header, so a resumed run written
+    before columns were added (e.g. Model or the typed answer columns) stays readable:
+    columns missing from the header are left out, with a warning, and columns missing
+    from the rows are left empty.
+    """
+    if not os.path.exists(table_file):
+        df.to_csv(table_file, index=False)
+        table_headers[table_file] = list(df.columns)
+        return
+    header = table_headers.get(table_file)
+    if header is None:
+        header = list(pd.read_csv(table_file, nrows=0).columns)
+        table_headers[table_file] = header
+    if list(df.columns) != header:
+        dropped = [column for column in df.columns if column not in header]
+        if dropped and table_file not in misaligned_tables:
+            misaligned_tables.add(table_file)
+            logging.warning(f"Columns {dropped} are not in the header of {table_file} and are not saved.")
+        df = df.reindex(columns=header)
+    df.to_csv(table_file, mode='a', header=False, index=False)
+
+def participant_table_row(participant):
+    """
+    A participant's row of the participants table: the standard participant columns and
+    the model, followed by any extra demographic covariates of the design.
+    """
+    values = [participant.participant_id, participant.participant_hash, participant.age, participant.gender, participant.country]
+    return pd.DataFrame(
+        [values + [participant.model] + list(participant.covariates.values())],
+        columns=PARTICIPANT_COLUMNS + MODEL_COLUMNS + list(participant.covariates)
+    )
+
+def wide_result_rows(participant, answers):
+    """
+    A participant's answers as wide results rows (one row per answer), built column by
+    column from the answer buffer.
+    """
+    return pd.DataFrame({
+        'Participant ID': participant.participant_id,
+        'Participant Hash': participant.participant_hash,
+        'Question': answers.questions,
+        'Answer': answers.answers,
+        'Short Title': answers.short_titles,
+        'Age': participant.age,
+        'Gender': participant.gender,
+        'Country': participant.country,
+        'Model': participant.model,
+        'Value': answers.values,
+        'Parse Status': answers.parse_statuses
+    }, columns=WIDE_RESULT_COLUMNS + MODEL_COLUMNS + TYPED_ANSWER_COLUMNS)
+
+def save_questions_table(questions_df, gps_folder_path):
+    """
+    Write the question dictionary of the current run to the GPS folder.
+
+    Parameters:
+    - questions_df: DataFrame with one row per distinct question (see build_questions_table).
+    - gps_folder_path: Path to the current run's GPS folder.
+    """
+    os.makedirs(gps_folder_path, exist_ok=True)
+    questions_file = os.path.join(gps_folder_path, QUESTIONS_TABLE)
+    questions_df[QUESTION_COLUMNS].to_csv(questions_file, index=False)
+    logging.info(f"Question table with {len(questions_df)} questions saved to {questions_file}")
+
+def save_run_config(config, run_folder, started_at, completed_at=None):
+    """
+    Write a snapshot of the configuration that produced a run to the run folder,
+    without the API keys.
+
+    Parameters:
+    - config: The loaded configuration (see utils.load_config).
+    - run_folder: Path to the current run folder.
+    - started_at: Start time of the run.
+    - completed_at: End time of the run, once all participants are processed.
+    """
+    snapshot = copy.deepcopy(config)
+    snapshot.get('api', {}).pop('key', None)
+    for target in snapshot.get('targets') or []:
+        target.pop('key', None)
+    snapshot['run'] = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'completed_at': completed_at.isoformat(timespec='seconds') if completed_at else None
+    }
+    config_file = os.path.join(run_folder, RUN_CONFIG_FILE)
+    with open(config_file, 'w') as file:
+        yaml.safe_dump(snapshot, file, sort_keys=False, allow_unicode=True)
+    logging.info(f"Run configuration saved to {config_file}")
 
 async def save_results_for_participant(
-    results, country, existing_hashes_per_country, country_locks, processed_counts_per_country,
-    gps_folder_path
+    participant, answers, existing_hashes_per_country, country_locks, processed_counts_per_country,
+    gps_folder_path, gps_proc_folder_path=None
 ):
     """
-    Save the participant's results to a CSV file in the specified GPS folder.
+    Save the participant's results to the normalized tables in the specified GPS folder:
+    one row in the participants table and one row per answer in the answers table.
+    If a processed folder is given, the processed rows for the participant are
+    appended to the matching country file there as well.
 
     Parameters:
-    - results: List of dictionaries containing participant responses.
-    - country: The country of the participant.
+    - participant: The Participant record.
+    - answers: AnswerBuffer with the participant's answers.
     - existing_hashes_per_country: Existing participant hashes to avoid duplicates.
     - country_locks: Asyncio locks per country to prevent race conditions.
     - processed_counts_per_country: Counts of processed participants per country.
     - gps_folder_path: Path to the current run's GPS folder.
+    - gps_proc_folder_path: Path to the current run's processed GPS folder (optional).
+
+    Returns:
+    - bool: True if the participant's rows were written to the results tables.
     """
     try:
         # Ensure the gps folder path exists
         os.makedirs(gps_folder_path, exist_ok=True)
-        output_file = os.path.join(gps_folder_path, f"results_{country}.csv")
+        participants_file = os.path.join(gps_folder_path, PARTICIPANTS_TABLE)
+        answers_file = os.path.join(gps_folder_path, ANSWERS_TABLE)
+
+        country = participant.country
 
         # Get or create a lock for the country
         lock = country_locks.setdefault(country, asyncio.Lock())
 
-        # Convert results to DataFrame
-        df_results = pd.DataFrame(results)
+        # The answer buffer's lists become the table columns directly
+        df_answers = pd.DataFrame({
+            'Participant ID': participant.participant_id,
+            'Question ID': answers.question_ids,
+            'Answer': answers.answers,
+            'Value': answers.values,
+            'Parse Status': answers.parse_statuses
+        }, columns=ANSWER_COLUMNS)
 
         async with lock:
             try:
-                # Check if the file exists
-                if os.path.exists(output_file):
-                    # Read existing data
-                    existing_df = pd.read_csv(output_file)
-
-                    # Append new data
-                    df_combined = pd.concat([existing_df, df_results], ignore_index=True)
-                else:
-                    df_combined = df_results
-
-                # Write combined data back to CSV
-                df_combined.to_csv(output_file, index=False)
+                # Appends are synchronous, so rows of different participants never interleave
+                append_table_rows(participant_table_row(participant), participants_file)
+                append_table_rows(df_answers, answers_file)
 
                 # Update existing_hashes_per_country
                 existing_hashes = existing_hashes_per_country.get(country, set())
-                existing_hashes.update(df_results['Participant Hash'])
+                existing_hashes.add(participant.participant_hash)
                 existing_hashes_per_country[country] = existing_hashes
 
                 # Update processed counts per country
@@ -56,8 +167,39 @@ async def save_results_for_participant(
 
                 logging.info(f"Results saved for participant in {country}")
 
+                if gps_proc_folder_path is not None:
+                    save_processed_results_for_participant(
+                        wide_result_rows(participant, answers), country, gps_proc_folder_path
+                    )
+                return True
+
             except Exception as e:
                 logging.error(f"Error saving results for {country}: {e}")
 
     except Exception as e:
-        logging.error(f"Unexpected error in save_results_for_participant: {e}")
\ No newline at end of file
+        logging.error(f"Unexpected error in save_results_for_participant: {e}")
+    return False
+
+def save_processed_results_for_participant(df_results, country, gps_proc_folder_path):
+    """
+    Process a single participant's raw results and append them to the country's
+    file in the processed GPS folder.
+
+    Parameters:
+    - df_results: DataFrame with the participant's raw responses.
+    - country: The country of the participant.
+    - gps_proc_folder_path: Path to the current run's processed GPS folder.
+    """
+    try:
+        os.makedirs(gps_proc_folder_path, exist_ok=True)
+        output_file = os.path.join(gps_proc_folder_path, f"results_{country}.csv")
+
+        df_processed = process_participant_results(df_results.copy())
+
+        # Append without re-reading the file
+        append_table_rows(df_processed, output_file)
+
+        logging.info(f"Processed results saved for participant in {country}")
+
+    except Exception as e:
+        logging.error(f"Error saving processed results for {country}: {e}")
@@ -0,0 +1,66 @@
+# scripts/diagnostics.py
+
+import logging
+import numpy as np
+import pandas as pd
+
+# Relative eigenvalue below which the predictor correlation matrix is treated as singular
+SINGULAR_TOLERANCE = 1e-10
+
+def build_interaction_design(df, predictors, interact_with):
+    """
+    Build a design with the predictors, the interacting variable and each predictor's
+    interaction with it (named '<predictor>:<interact_with>', as in formulas).
+
+    Parameters:
+    - df: DataFrame containing the predictors and the interacting variable.
+    - predictors: List of predictor column names.
+    - interact_with: Column name of the variable every predictor is interacted with.
+    """
+    base = df[predictors + [interact_with]].astype(float)
+    interactions = base[predictors].mul(base[interact_with], axis=0)
+    interactions.columns = [f"{col}:{interact_with}" for col in predictors]
+    return pd.concat([base, interactions], axis=1)
+
+def variance_inflation_factors(X):
+    """
+    Compute the variance inflation factor of every column in one pass.
+
+    The VIF of a predictor is 1 / (1 - R^2) of its regression on all other predictors
+    plus a constant, which equals the matching diagonal entry of the inverse of the
+    predictors' correlation matrix. Constant columns get NaN. Columns that are exact
+    linear combinations of others get inf; the remaining VIFs use the pseudo-inverse.
+
+    Parameters:
+    - X: DataFrame of predictors (without a constant column).
+    """
+    values = np.asarray(X, dtype=float)
+    std = values.std(axis=0)
+    varying = std > 0
+    if not varying.all():
+        logging.warning(f"Constant columns have no VIF: {list(X.columns[~varying])}")
+
+    vif = np.full(values.shape[1], np.nan)
+    if varying.any():
+        standardized = (values[:, varying] - values[:, varying].mean(axis=0)) / std[varying]
+        corr = standardized.T @ standardized / len(standardized)
+
+        eigenvalues, eigenvectors = np.linalg.eigh(corr)
+        singular = eigenvalues < SINGULAR_TOLERANCE * max(eigenvalues.max(), 1.0)
+        if singular.any():
+            # Columns loading on the null space take part in an exact linear dependency
+            null_loadings = np.abs(eigenvectors[:, singular]).max(axis=1)
+            collinear = null_loadings > np.sqrt(SINGULAR_TOLERANCE)
+            logging.warning(
+                f"Predictor correlation matrix is singular; {int(collinear.sum())} collinear columns get an infinite VIF."
+            )
+            inverse_eigenvalues = np.where(singular, 0.0, 1.0 / np.where(singular, 1.0, eigenvalues))
+        else:
+            collinear = np.zeros(len(eigenvalues), dtype=bool)
+            inverse_eigenvalues = 1.0 / eigenvalues
+
+        varying_vif = np.einsum('ij,j,ij->i', eigenvectors, inverse_eigenvalues, eigenvectors)
+        varying_vif[collinear] = np.inf
+        vif[varying] = varying_vif
+
+    return pd.DataFrame({'feature': list(X.columns), 'VIF': vif})
@@ -0,0 +1,219 @@
+# scripts/dispatcher.py
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+from collections import Counter, deque
+
+# Weights of the latency averages of AdaptiveDispatcher: the baseline follows the endpoint's
+# latency over hundreds of requests, the recent latency over the last few
+BASELINE_LATENCY_WEIGHT = 0.01
+RECENT_LATENCY_WEIGHT = 0.2
+
+class RequestDispatcher:
+    """
+    Limits the concurrent API requests of a target like a semaphore, but hands free
+    slots to the waiting request of the participant that is furthest along instead of
+    first come, first served, so participants finish (and are saved) steadily during
+    the run instead of all near its end.
+
+    Countries take turns for the free slots, so a country with many waiting participants
+    cannot crowd out the others, and a request waiting longer than `starvation_timeout`
+    seconds is served next regardless of its priority.
+
+    Parameters:
+    - limit: Maximum number of concurrent requests.
+    - starvation_timeout: Seconds after which a waiting request is served first.
+    """
+
+    def __init__(self, limit, starvation_timeout=30.0):
+        self.limit = limit
+        self.starvation_timeout = starvation_timeout
+        self.active = 0
+        # Country -> heap of waiting requests (-progress, arrival order, arrival time, future);
+        # the dict order is the countries' turn order
+        self.queues = {}
+        # All waiting requests in arrival order, for the starvation timeout
+        self.arrivals = deque()
+        self.arrival_order = itertools.count()
+        # Requests not yet served or cancelled; the queues still hold finished entries
+        self.waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, country, progress=0):
+        """
+        Hold a request slot for a participant of `country` that has answered `progress`
+        questions.
+        """
+        await self.acquire(country, progress)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def try_acquire(self):
+        """
+        Take a free slot without waiting; False if there is none or requests are waiting
+        for one. Release it with release().
+        """
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, country, progress=0):
+        if self.try_acquire():
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (-progress, next(self.arrival_order), loop.time(), future)
+        if country not in self.queues:
+            self.queues[country] = []
+        heapq.heappush(self.queues[country], entry)
+        self.arrivals.append(entry)
+        self.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation
+                self.release()
+            else:
+                self.waiting -= 1
+                future.cancel()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self.dispatch()
+
+    def set_limit(self, limit):
+        self.limit = limit
+        self.dispatch()
+
+    def record_response(self, started, latency):
+        """
+        Called with each successful API response (start time on the loop clock and latency
+        in seconds). A fixed limit ignores it; see AdaptiveDispatcher.
+        """
+
+    def record_overload(self, started, reason):
+        """
+        Called when the endpoint signals overload (a 429, 5xx or timeout). A fixed limit
+        ignores it; see AdaptiveDispatcher.
+        """
+
+    def dispatch(self):
+        """
+        Hand free slots to waiting requests.
+        """
+        while self.active < self.limit:
+            future = self.next_waiting()
+            if future is None:
+                return
+            self.active += 1
+            self.waiting -= 1
+            future.set_result(None)
+
+    def drop_finished_arrivals(self):
+        # Served and cancelled requests stay in the queues until they reach the front
+        while self.arrivals and self.arrivals[0][-1].done():
+            self.arrivals.popleft()
+
+    def next_waiting(self):
+        self.drop_finished_arrivals()
+        if not self.arrivals:
+            return None
+        if asyncio.get_running_loop().time() - self.arrivals[0][2] >= self.starvation_timeout:
+            return self.arrivals.popleft()[-1]
+        while self.queues:
+            country = next(iter(self.queues))
+            queue = self.queues.pop(country)
+            while queue and queue[0][-1].done():
+                heapq.heappop(queue)
+            if queue:
+                entry = heapq.heappop(queue)
+                if queue:
+                    # The country's turn is over; it waits behind the other countries
+                    self.queues[country] = queue
+                return entry[-1]
+        return None
+
+    def telemetry(self):
+        return {'concurrency_limit': self.limit, 'active_requests': self.active, 'waiting_requests': self.waiting}
+
+class AdaptiveDispatcher(RequestDispatcher):
+    """
+    A RequestDispatcher whose limit adapts to what the endpoint sustains (AIMD): the limit
+    grows by one per round of `limit` healthy responses while requests are waiting for
+    it, and is multiplied by `decrease_factor` on a 429, server error or timeout, or when
+    the recent latency exceeds `latency_tolerance` times the baseline latency.
+
+    Only requests sent after the last change of the limit count towards the next one, so
+    a burst of 429s from requests sent under the old limit lowers it only once.
+
+    Parameters (besides those of RequestDispatcher, where `limit` is the initial limit):
+    - min_limit, max_limit: Bounds of the limit.
+    - decrease_factor: Factor of the limit on overload.
+    - latency_tolerance: Ratio of recent to baseline latency taken as overload.
+    - name: Name of the target in the log messages.
+    """
+
+    def __init__(self, limit, starvation_timeout=30.0, min_limit=1, max_limit=100, decrease_factor=0.5, latency_tolerance=2.0,
+                 name=None):
+        super().__init__(min(max(limit, min_limit), max_limit), starvation_timeout)
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.baseline_latency = None
+        self.recent_latency = None
+        self.last_change = float('-inf')
+        self.healthy_responses = 0
+        self.increases = 0
+        self.decreases = Counter()
+
+    def record_response(self, started, latency):
+        if self.baseline_latency is None:
+            self.baseline_latency = self.recent_latency = latency
+        else:
+            self.baseline_latency += BASELINE_LATENCY_WEIGHT * (latency - self.baseline_latency)
+            self.recent_latency += RECENT_LATENCY_WEIGHT * (latency - self.recent_latency)
+        if started < self.last_change:
+            return
+        if self.recent_latency > self.latency_tolerance * self.baseline_latency:
+            self.decrease("latency")
+            return
+        self.healthy_responses += 1
+        # Raise the limit only while it holds requests back
+        if self.healthy_responses >= self.limit and self.limit < self.max_limit and self.waiting:
+            self.increases += 1
+            self.change_limit(self.limit + 1)
+
+    def record_overload(self, started, reason):
+        if started >= self.last_change:
+            self.decrease(reason)
+
+    def decrease(self, reason):
+        self.decreases[reason] += 1
+        # The latency spike is answered; the recent latency starts over from the baseline
+        self.recent_latency = self.baseline_latency
+        limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        logging.info(f"Concurrency limit of {self.name} lowered from {self.limit} to {limit} ({reason}).")
+        self.change_limit(limit)
+
+    def change_limit(self, limit):
+        self.last_change = asyncio.get_running_loop().time()
+        self.healthy_responses = 0
+        self.set_limit(limit)
+
+    def telemetry(self):
+        return {
+            **super().telemetry(),
+            'limit_increases': self.increases,
+            'limit_decreases': dict(self.decreases),
+            'baseline_latency': self.baseline_latency
+        }
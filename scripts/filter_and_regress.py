@@ -1,5 +1,6 @@
 # filter_and_regress.py
 
+import os
 import pandas as pd
 from pathlib import Path
 import logging
@@ -7,13 +8,161 @@ import statsmodels.api as sm
 import yaml
 import numpy as np
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import sys
+if not __package__:
+    # Run as a script (python scripts/filter_and_regress.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.inference import cluster_robust_covariance, bootstrap_ols, inference_table, demean_within
+from scripts.streaming_ols import STREAMING_CHUNK_SIZE, streaming_ols, format_fit
+
+# 'Short Title' prefix used when a regression does not configure a battery
+DEFAULT_BATTERY = 'Risk'
+
+def absorb_fixed_effects(y: pd.Series, X: pd.DataFrame, fe_codes: list):
+    """
+    Absorb fixed effects by within-transformation.
+
+    With a single fixed effect, y and X are demeaned within groups in one pass.
+    With several, group means are removed for each fixed effect in turn until the
+    variables stop changing (alternating projections). The coefficients of the
+    demeaned regression equal those of the regression with a full set of dummies.
+
+    Parameters:
+        y (pd.Series): Dependent variable.
+        X (pd.DataFrame): Independent variables (without constant).
+        fe_codes (list): Integer group codes (np.ndarray) for each fixed effect.
+
+    Returns:
+        tuple: Demeaned y, demeaned X and the number of absorbed parameters.
+    """
+    data = demean_within(np.column_stack([y.to_numpy(dtype=float), X.to_numpy(dtype=float)]), fe_codes)
+    counts = [np.bincount(codes) for codes in fe_codes]
+
+    # Every fixed effect absorbs one parameter per group; all but the first also
+    # share the overall mean (exact for one fixed effect, assumes connected groups otherwise)
+    absorbed_params = sum(len(count) for count in counts) - (len(fe_codes) - 1)
+
+    y_within = pd.Series(data[:, 0], index=y.index, name=y.name)
+    X_within = pd.DataFrame(data[:, 1:], index=X.index, columns=X.columns)
+    return y_within, X_within, absorbed_params
+
+def fixed_effects_r_squared(y: pd.Series, y_within: pd.Series, residuals, df_resid: float) -> dict:
+    """
+    Within and overall R-squared of a regression with absorbed fixed effects, and their
+    adjusted versions with the residual degrees of freedom of the equivalent dummy
+    regression (statsmodels reports them for the demeaned data instead).
+    """
+    n = len(y)
+    ssr = float(np.sum(np.square(residuals)))
+    tss_within = float(np.sum(np.square(y_within)))
+    tss = float(np.sum(np.square(y - y.mean())))
+    within = 1 - ssr / tss_within if tss_within > 0 else np.nan
+    overall = 1 - ssr / tss if tss > 0 else np.nan
+    return {
+        'Within R-squared': within,
+        'Adj. within R-squared': 1 - (1 - within) * (n - 1) / df_resid,
+        'Overall R-squared': overall,
+        'Adj. overall R-squared': 1 - (1 - overall) * (n - 1) / df_resid
+    }
+
+def fit_regression(job: dict) -> bool:
+    """
+    Fit a prepared regression and save its summary to the job's results file.
+    Only uses the data carried by the job, so it can run in a worker process.
+
+    Parameters:
+        job (dict): Prepared regression from GPSDataRegressor.prepare_regression.
+
+    Returns:
+        bool: True if the regression was fitted and saved.
+    """
+    name = job['name']
+    y = job['y']
+    X = job['X']
+    fixed_effects = job['fixed_effects']
+
+    absorbed_params = 0
+    if fixed_effects:
+        # Absorb fixed effects instead of adding dummy columns; the constant is absorbed too
+        y_levels, X_levels = y, X
+        y, X, absorbed_params = absorb_fixed_effects(y, X, job['fe_codes'])
+        logging.info(f"Absorbed {absorbed_params} fixed-effect parameters for: {fixed_effects}")
+    else:
+        # Add a constant term to the regression
+        X = sm.add_constant(X, has_constant='add')
+
+    logging.info(
+        f"Running regression for {name} with y: {job['y_col']} and X columns: {X.columns.tolist()}"
+    )
+
+    try:
+        # Fit the linear regression model
+        ols_model = sm.OLS(y, X)
+        if absorbed_params:
+            # Residual degrees of freedom of the equivalent dummy regression
+            ols_model.df_resid = ols_model.df_resid - absorbed_params
+        model = ols_model.fit()
+
+        # Cluster-robust and bootstrap inference, if configured
+        inference = None
+        clusters = job.get('clusters')
+        bootstrap = job.get('bootstrap')
+        if clusters is not None or bootstrap:
+            covariance = None
+            if clusters is not None:
+                covariance = cluster_robust_covariance(
+                    X, model.resid, clusters, n_params=X.shape[1] + absorbed_params
+                )
+            replicates = None
+            if bootstrap:
+                # With absorbed fixed effects every replicate demeans its resampled data again
+                replicates = bootstrap_ols(
+                    X_levels if absorbed_params else X, y_levels if absorbed_params else y, groups=clusters,
+                    replicates=bootstrap.get('replicates', 999),
+                    seed=bootstrap.get('seed', 0),
+                    workers=job.get('bootstrap_workers', 1),
+                    fe_codes=job['fe_codes'] if absorbed_params else None
+                )
+            inference = inference_table(model.params, X.columns, covariance, replicates)
+
+        # Save the summary of the regression results to a text file
+        results_file = job['results_file']
+        with open(results_file, 'w') as f:
+            if absorbed_params:
+                f.write(f"Absorbed fixed effects: {fixed_effects} ({absorbed_params} parameters)\n")
+                for statistic, value in fixed_effects_r_squared(y_levels, y, model.resid, model.df_resid).items():
+                    f.write(f"{statistic}: {value:.4f}\n")
+                f.write("The R-squared and F statistics of the summary below are those of the demeaned data.\n\n")
+            f.write(model.summary().as_text())
+            if inference is not None:
+                f.write("\n\nInference")
+                if clusters is not None:
+                    f.write(f" (clustered by {job['cluster']})")
+                if bootstrap:
+                    f.write(f" ({len(replicates)} {'cluster' if clusters is not None else 'pairs'} bootstrap replicates")
+                    f.write(", fixed effects absorbed in each replicate)" if absorbed_params else ")")
+                f.write(":\n")
+                f.write(inference.to_string() + "\n")
+
+        logging.info(f"Regression results saved to: {results_file}")
+        return True
+    except Exception as e:
+        logging.error(f"Error performing regression {name}: {e}")
+        return False
 
 class GPSDataRegressor:
-    def __init__(self, input_csv: Path, config_file: Path, results_folder: Path):
+    def __init__(self, input_csv: Path, config_file: Path, results_folder: Path, workers: int = 1):
         self.input_csv = input_csv
         self.config_file = config_file
         self.results_folder = results_folder
+        self.workers = workers
         self.regression_configs = self.load_regression_configs()
+        # Filtered data per battery and encoded design components per (battery, kind, column),
+        # both of the DataFrame they were computed from
+        self.cached_df = None
+        self.battery_cache = {}
+        self.component_cache = {}
 
     def load_regression_configs(self) -> list:
         """
@@ -30,185 +179,289 @@ class GPSDataRegressor:
             logging.error(f"Error parsing YAML file: {e}")
             return []
 
-    def filter_risk_questions(self, df: pd.DataFrame) -> pd.DataFrame:
+    def filter_battery(self, df: pd.DataFrame, battery: str) -> pd.DataFrame:
         """
-        Filter the DataFrame for rows where 'Short Title' starts with 'Risk'.
+        Filter the DataFrame for rows where 'Short Title' starts with the battery prefix
+        (e.g. 'Risk', 'Delay', 'Reciprocation', 'Donation'). Results are cached per battery
+        while the same DataFrame is filtered; another DataFrame starts the caches over.
         """
+        if df is not self.cached_df:
+            self.battery_cache.clear()
+            self.component_cache.clear()
+            self.cached_df = df
+        if battery in self.battery_cache:
+            return self.battery_cache[battery]
+
         if 'Short Title' not in df.columns:
             logging.error("'Short Title' column is missing from the data.")
             return pd.DataFrame()
 
-        risk_df = df[df['Short Title'].str.startswith('Risk', na=False)]
-        logging.info(f"Filtered down to {len(risk_df)} rows where 'Short Title' starts with 'Risk'.")
-        return risk_df
+        battery_df = df[df['Short Title'].str.startswith(battery, na=False)]
+        logging.info(f"Filtered down to {len(battery_df)} rows where 'Short Title' starts with '{battery}'.")
+        self.battery_cache[battery] = battery_df
+        return battery_df
 
-    def perform_regression(self, df: pd.DataFrame, regression_setup: dict):
+    def filter_risk_questions(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Performs a regression based on the provided setup.
+        Filter the DataFrame for rows where 'Short Title' starts with 'Risk'.
+        """
+        return self.filter_battery(df, 'Risk')
+
+    def preprocess(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Clean the loaded data once for all regressions: strip whitespace from string
+        columns to prevent conversion issues.
+        """
+        df = df.copy()
+        object_cols = df.select_dtypes(include=['object']).columns.tolist()
+        for col in object_cols:
+            df[col] = df[col].str.strip()
+        self.battery_cache.clear()
+        self.component_cache.clear()
+        return df
+
+    def encode_dependent(self, df: pd.DataFrame, battery: str, y_col: str) -> pd.Series:
+        """
+        Return the dependent variable as a numeric Series, mapping binary Yes/No answers
+        and coercing anything else to numeric. Cached per battery and column.
+        """
+        key = (battery, 'y', y_col)
+        if key in self.component_cache:
+            return self.component_cache[key]
+
+        y = df[y_col]
+        if not pd.api.types.is_numeric_dtype(y):
+            # Attempt to map categorical to numeric if applicable
+            unique_answers = y.dropna().unique()
+            logging.info(f"Unique '{y_col}' values before mapping: {unique_answers}")
+
+            # Example for binary categorical data
+            binary_mapping = {'No': 0, 'Yes': 1}
+            if set(unique_answers).issubset(binary_mapping.keys()):
+                y = y.map(binary_mapping)
+                logging.info(f"Mapped '{y_col}' categories to numeric codes: {binary_mapping}")
+            else:
+                # Attempt to convert to numeric, coercing errors to NaN
+                y = pd.to_numeric(y, errors='coerce')
+                logging.info(f"Converted '{y_col}' to numeric, coerced errors to NaN.")
+
+        self.component_cache[key] = y
+        return y
+
+    def encode_component(self, df: pd.DataFrame, battery: str, col: str, col_type: str) -> pd.DataFrame:
+        """
+        Return the design-matrix columns for an independent variable: the numeric column
+        itself, or dummy variables (first category dropped) for a categorical column.
+        Cached per battery and column so regressions sharing a variable encode it once.
+        """
+        key = (battery, col_type, col)
+        if key in self.component_cache:
+            return self.component_cache[key]
+
+        if col_type == "numeric":
+            # Convert to numeric
+            component = pd.to_numeric(df[col], errors='coerce').to_frame(col)
+            if component[col].isnull().any():
+                logging.warning(f"Some values in '{col}' could not be converted to numeric and are set to NaN.")
+        elif col_type == "categorical":
+            # Create dummy variables, drop the first category
+            component = pd.get_dummies(df[col], prefix=col, drop_first=True)
+            component = component.astype(int)  # Convert bool to int
+            logging.info(f"Created dummy variables for categorical column: {col}")
+        else:
+            raise ValueError(f"Unsupported type for column '{col}': {col_type}")
+
+        self.component_cache[key] = component
+        return component
+
+    def fixed_effect_codes(self, df: pd.DataFrame, fixed_effect) -> np.ndarray:
+        """
+        Return integer group codes for a fixed effect. A fixed effect is either a single
+        column name or a list of column names whose combinations form the groups
+        (interacted fixed effects).
+        """
+        columns = [fixed_effect] if isinstance(fixed_effect, str) else list(fixed_effect)
+        if len(columns) == 1:
+            codes, _ = pd.factorize(df[columns[0]], sort=True)
+        else:
+            codes = df.groupby(columns, sort=True).ngroup().to_numpy()
+        return codes
+
+    def prepare_regression(self, df: pd.DataFrame, battery: str, regression_setup: dict):
+        """
+        Assemble y, X and fixed-effect codes for a regression from the cached components.
 
         Parameters:
-            df (pd.DataFrame): The DataFrame containing the data.
+            df (pd.DataFrame): The preprocessed data filtered to the regression's battery.
+            battery (str): The battery prefix the data was filtered with.
             regression_setup (dict): Dictionary containing regression parameters.
 
         Returns:
-            None
+            dict: The prepared regression job, or None if the data is not usable.
         """
         y_col = regression_setup['y']
         x_cols_config = regression_setup['x']  # List of dicts with 'name' and 'type'
         include_country_dummies = regression_setup.get('include_country_dummies', False)
+        fixed_effects = regression_setup.get('fixed_effects', [])
+        save_processed_data = regression_setup.get('save_processed_data', True)
+        cluster = regression_setup.get('cluster')
+        bootstrap = regression_setup.get('bootstrap')
 
         # Extract x column names and types
         x_cols = [col['name'] for col in x_cols_config]
         x_types = {col['name']: col['type'] for col in x_cols_config}
 
+        # Columns defining the absorbed fixed effects and clusters
+        fe_cols = []
+        for fixed_effect in fixed_effects:
+            for col in ([fixed_effect] if isinstance(fixed_effect, str) else fixed_effect):
+                if col not in fe_cols and col not in x_cols:
+                    fe_cols.append(col)
+        if cluster and cluster not in fe_cols and cluster not in x_cols:
+            fe_cols.append(cluster)
+
+        if include_country_dummies and 'Country' in fixed_effects:
+            logging.info("'Country' is absorbed as a fixed effect; skipping country dummies.")
+            include_country_dummies = False
+
         # Ensure required columns exist
-        required_columns = [y_col] + x_cols + ['Country']
+        required_columns = [y_col] + x_cols + fe_cols + ['Country']
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
             logging.error(f"Required columns missing for {regression_setup['name']}: {missing_columns}")
-            return
+            return None
 
         # Drop rows with missing data in the relevant columns
-        initial_count = len(df)
-        df = df.dropna(subset=[y_col] + x_cols + ['Country'])
-        dropped_count = initial_count - len(df)
+        mask = df[required_columns].notna().all(axis=1)
+        dropped_count = int((~mask).sum())
         if dropped_count > 0:
             logging.info(f"Dropped {dropped_count} rows due to missing data.")
 
-        # Strip whitespace from string columns to prevent conversion issues
-        object_cols = df.select_dtypes(include=['object']).columns.tolist()
-        for col in object_cols:
-            df[col] = df[col].str.strip()
-
         # Convert y to numeric if it's not already
-        if not pd.api.types.is_numeric_dtype(df[y_col]):
-            # Attempt to map categorical to numeric if applicable
-            unique_answers = df[y_col].unique()
-            logging.info(f"Unique '{y_col}' values before mapping: {unique_answers}")
-
-            # Example for binary categorical data
-            binary_mapping = {'No': 0, 'Yes': 1}
-            if set(unique_answers).issubset(binary_mapping.keys()):
-                df[y_col] = df[y_col].map(binary_mapping)
-                logging.info(f"Mapped '{y_col}' categories to numeric codes: {binary_mapping}")
-                logging.debug(f"Unique '{y_col}' values after mapping: {df[y_col].unique()}")
-            else:
-                # Attempt to convert to numeric, coercing errors to NaN
-                df[y_col] = pd.to_numeric(df[y_col], errors='coerce')
-                logging.info(f"Converted '{y_col}' to numeric, coerced errors to NaN.")
-
-            # Check for unmapped or invalid entries
-            nan_count = df[y_col].isna().sum()
-            if nan_count > 0:
-                logging.warning(f"{nan_count} rows have non-numeric '{y_col}' values and will be dropped.")
-                df = df.dropna(subset=[y_col])
-
-        # After potential mapping, log unique 'Answer' values
-        logging.info(f"Unique '{y_col}' values after mapping: {df[y_col].unique()}")
-
-        # Initialize list for final x columns after encoding
-        final_x_cols = []
-
-        # Process each independent variable based on its type
-        for col in x_cols:
-            if x_types[col] == "numeric":
-                # Convert to numeric
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                if df[col].isnull().any():
-                    logging.warning(f"Some values in '{col}' could not be converted to numeric and are set to NaN.")
-                final_x_cols.append(col)
-            elif x_types[col] == "categorical":
-                # Create dummy variables, drop the first category
-                dummies = pd.get_dummies(df[col], prefix=col, drop_first=True)
-                dummies = dummies.astype(int)  # Convert bool to int
-                df = pd.concat([df, dummies], axis=1)
-                dummy_cols = dummies.columns.tolist()
-                final_x_cols.extend(dummy_cols)
-                logging.info(f"Created dummy variables for categorical column: {col}")
-            else:
-                logging.error(f"Unsupported type for column '{col}': {x_types[col]}")
-                return
-
-        # Handle country dummies if needed
-        if include_country_dummies:
-            if 'Country' not in df.columns:
-                logging.error("'Country' column is missing from the data.")
-                return
-            country_dummies = pd.get_dummies(df['Country'], prefix='Country', drop_first=True)
-            country_dummies = country_dummies.astype(int)  # Convert bool to int
-            df = pd.concat([df, country_dummies], axis=1)
-            final_x_cols.extend(country_dummies.columns.tolist())
-            logging.info("Created dummy variables for 'Country'.")
+        y = self.encode_dependent(df, battery, y_col)
+        nan_count = int((y.isna() & mask).sum())
+        if nan_count > 0:
+            logging.warning(f"{nan_count} rows have non-numeric '{y_col}' values and will be dropped.")
+            mask &= y.notna()
+
+        # Collect the encoded components of each independent variable
+        components = []
+        try:
+            for col in x_cols:
+                components.append(self.encode_component(df, battery, col, x_types[col]))
+            if include_country_dummies:
+                components.append(self.encode_component(df, battery, 'Country', "categorical"))
+                logging.info("Created dummy variables for 'Country'.")
+        except ValueError as e:
+            logging.error(str(e))
+            return None
+        dummy_groups = [list(component.columns) for col, component in zip(x_cols + ['Country'], components)
+                        if x_types.get(col, "categorical") == "categorical"]
+
+        X = pd.concat(components, axis=1)
 
         # Drop rows where any of the x columns are NaN after conversion/encoding
-        df = df.dropna(subset=final_x_cols)
-        if df.empty:
+        mask &= X.notna().all(axis=1)
+        if not mask.any():
             logging.error(f"No valid data for independent variables after preprocessing for {regression_setup['name']}.")
-            return
+            return None
 
-        y = df[y_col]
-        X = df[final_x_cols]
+        y = y[mask]
+        X = X[mask]
+
+        # Dummies of categories that only occur in dropped rows carry no information
+        empty_dummies = [col for col in X.columns if col not in x_cols and not X[col].any()]
+        if empty_dummies:
+            X = X.drop(columns=empty_dummies)
+
+        # The dummies are encoded on the whole battery; if the reference category only
+        # occurs in dropped rows, the remaining dummies add up to the constant and the
+        # first of them becomes the reference instead
+        for group in dummy_groups:
+            group = [col for col in group if col in X.columns]
+            if group and (X[group].sum(axis=1) == 1).all():
+                logging.info(f"Reference category not in the regression data; dropping '{group[0]}' as the new reference.")
+                X = X.drop(columns=group[0])
 
         # Convert all X columns to numeric explicitly, especially bools to ints
         X = X.astype(int)
 
-        # **Save the processed data to CSV for inspection**
-        processed_data_file = self.results_folder / f"{regression_setup['name'].replace(' ', '_')}_processed_data.csv"
-        df.to_csv(processed_data_file, index=False)
-        logging.info(f"Processed data saved to: {processed_data_file}")
+        # **Save the processed data to CSV for inspection** (optional, can be large)
+        if save_processed_data:
+            processed_data_file = self.results_folder / f"{regression_setup['name'].replace(' ', '_')}_processed_data.csv"
+            dummy_cols = [col for col in X.columns if col not in df.columns]
+            pd.concat([df[mask], X[dummy_cols]], axis=1).to_csv(processed_data_file, index=False)
+            logging.info(f"Processed data saved to: {processed_data_file}")
 
         # **Data Type Checks**
         if not pd.api.types.is_numeric_dtype(y):
             logging.error(f"Dependent variable '{y_col}' is not numeric after preprocessing.")
-            return
-
-        non_numeric_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
-        if non_numeric_cols:
-            logging.error(f"Independent variables contain non-numeric columns: {non_numeric_cols}")
-            return
+            return None
 
         # Check for infinite values
         if np.isinf(X).any().any():
             logging.error("Infinite values found in independent variables (X).")
-            return
+            return None
 
         if np.isinf(y).any():
             logging.error("Infinite values found in dependent variable (y).")
-            return
-
-        # Check for NaN values
-        if X.isnull().values.any():
-            logging.error("NaN values found in independent variables (X) after preprocessing.")
-            return
-
-        if y.isnull().values.any():
-            logging.error("NaN values found in dependent variable (y) after preprocessing.")
-            return
-
-        # Add a constant term to the regression
-        X = sm.add_constant(X, has_constant='add')
+            return None
 
         # Final validation
         if X.empty or y.empty:
             logging.error(f"No valid data for regression: {regression_setup['name']}")
-            return
+            return None
+
+        fe_codes = [self.fixed_effect_codes(df[mask], fixed_effect) for fixed_effect in fixed_effects]
+
+        return {
+            'name': regression_setup['name'],
+            'y_col': y_col,
+            'y': y,
+            'X': X,
+            'fixed_effects': fixed_effects,
+            'fe_codes': fe_codes,
+            'cluster': cluster,
+            'clusters': df.loc[mask, cluster].to_numpy() if cluster else None,
+            'bootstrap': bootstrap,
+            'bootstrap_workers': self.workers,
+            'results_file': self.results_folder / f"{regression_setup['name'].replace(' ', '_')}_results.txt"
+        }
 
-        logging.info(
-            f"Running regression for {regression_setup['name']} with y: {y_col} and X columns: {X.columns.tolist()}"
-        )
+    def perform_regression(self, df: pd.DataFrame, regression_setup: dict):
+        """
+        Performs a regression based on the provided setup.
 
-        try:
-            # Fit the linear regression model
-            model = sm.OLS(y, X).fit()
+        Parameters:
+            df (pd.DataFrame): The preprocessed DataFrame containing the data.
+            regression_setup (dict): Dictionary containing regression parameters.
 
-            # Save the summary of the regression results to a text file
-            results_file = self.results_folder / f"{regression_setup['name'].replace(' ', '_')}_results.txt"
-            with open(results_file, 'w') as f:
-                f.write(model.summary().as_text())
+        Returns:
+            None
+        """
+        battery = regression_setup.get('battery', DEFAULT_BATTERY)
+        battery_df = self.filter_battery(df, battery)
+        if battery_df.empty:
+            logging.error(f"No '{battery}' questions found for {regression_setup['name']}.")
+            return
 
-            logging.info(f"Regression results saved to: {results_file}")
-        except Exception as e:
-            logging.error(f"Error performing regression {regression_setup['name']}: {e}")
+        job = self.prepare_regression(battery_df, battery, regression_setup)
+        if job is not None:
+            fit_regression(job)
+
+    def fit_regressions(self, jobs: list):
+        """
+        Fit prepared regressions, in a process pool when more than one worker is configured.
+        """
+        if self.workers > 1 and len(jobs) > 1:
+            # Bootstraps inside pooled fits run in their worker process
+            for job in jobs:
+                job['bootstrap_workers'] = 1
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+                fitted = list(executor.map(fit_regression, jobs))
+        else:
+            fitted = [fit_regression(job) for job in jobs]
+        logging.info(f"Fitted {sum(fitted)} of {len(jobs)} regressions.")
 
     def run(self):
         """
@@ -228,23 +481,100 @@ class GPSDataRegressor:
             logging.error("Input CSV is empty. Exiting.")
             return
 
-        # Filter for risk questions
-        risk_df = self.filter_risk_questions(df)
+        # Clean once; filtering and encoding are cached across regressions
+        df = self.preprocess(df)
 
-        if risk_df.empty:
-            logging.error("No risk questions found after filtering. Exiting.")
-            return
+        # Prepare all regressions as per the configurations, then fit them
+        jobs = []
+        for regression_setup in self.regression_configs:
+            battery = regression_setup.get('battery', DEFAULT_BATTERY)
+            battery_df = self.filter_battery(df, battery)
+            if battery_df.empty:
+                logging.error(f"No '{battery}' questions found for {regression_setup['name']}. Skipping.")
+                continue
 
-        # Perform multiple regressions as per the configurations
+            job = self.prepare_regression(battery_df, battery, regression_setup)
+            if job is not None:
+                jobs.append(job)
+
+        self.fit_regressions(jobs)
+
+    def streaming_setups(self) -> list:
+        """
+        Regression configurations usable in streaming mode. Fixed effects enter as dummy
+        columns; interacted fixed effects, clustering and the bootstrap need the full
+        data and are not available.
+        """
+        setups = []
         for regression_setup in self.regression_configs:
-            self.perform_regression(risk_df, regression_setup)
+            if any(not isinstance(fixed_effect, str) for fixed_effect in regression_setup.get('fixed_effects', [])):
+                logging.error(f"Interacted fixed effects are not supported in streaming mode. Skipping {regression_setup['name']}.")
+                continue
+            if regression_setup.get('cluster') or regression_setup.get('bootstrap'):
+                logging.warning(
+                    f"Clustered and bootstrap inference need the full data; {regression_setup['name']} "
+                    "reports classical and robust (HC1) standard errors only."
+                )
+            setups.append(regression_setup)
+        return setups
+
+    def run_streaming(self, chunk_size: int = STREAMING_CHUNK_SIZE):
+        """
+        Execute the regressions without loading the input into memory: the CSV is read in
+        chunks, every chunk updates the sufficient statistics (X'X, X'y, y'y) of all
+        regressions at once, and a second pass adds the moments of the robust standard
+        errors. Chunks are spread over the worker processes and their partial statistics
+        merged, so memory is bounded by the chunk size and the number of regressors.
+        """
+        setups = self.streaming_setups()
+        if not setups:
+            logging.error("No regressions to run in streaming mode.")
+            return
+        if not self.input_csv.exists():
+            logging.error(f"Input CSV file not found: {self.input_csv}")
+            return
+
+        columns = {'Short Title', 'Country'}
+        for setup in setups:
+            columns.add(setup['y'])
+            columns.update(col['name'] for col in setup['x'])
+            columns.update(setup.get('fixed_effects', []))
+        header = pd.read_csv(self.input_csv, nrows=0).columns
+        missing_columns = columns - set(header)
+        if missing_columns:
+            logging.error(f"Required columns missing from {self.input_csv}: {sorted(missing_columns)}")
+            return
+
+        def read_chunks():
+            return pd.read_csv(self.input_csv, usecols=list(columns), chunksize=chunk_size)
+
+        logging.info(f"Streaming {self.input_csv} in chunks of {chunk_size} rows for {len(setups)} regressions.")
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                fits = streaming_ols(read_chunks, setups, executor=executor, max_pending=2 * self.workers)
+        else:
+            fits = streaming_ols(read_chunks, setups)
+
+        for setup, fit in zip(setups, fits):
+            if fit is None:
+                continue
+            results_file = self.results_folder / f"{setup['name'].replace(' ', '_')}_results.txt"
+            with open(results_file, 'w') as f:
+                if setup.get('fixed_effects'):
+                    f.write(f"Fixed effects included as dummies: {setup['fixed_effects']}\n\n")
+                f.write(format_fit(setup['name'], setup['y'], fit))
+            logging.info(f"Regression results saved to: {results_file}")
+        logging.info(f"Fitted {sum(fit is not None for fit in fits)} of {len(setups)} regressions.")
 
 if __name__ == "__main__":
     # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Filter GPS data for risk questions and perform regressions.")
+    parser = argparse.ArgumentParser(description="Filter GPS data by question battery and perform regressions.")
     parser.add_argument('--input_csv', type=str, required=True, help='Path to the concatenated and cleaned CSV file.')
     parser.add_argument('--config_file', type=str, required=True, help='Path to the regression config YAML file.')
     parser.add_argument('--results_folder', type=str, required=True, help='Path to the folder to save regression results.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to fit regressions (1 fits in this process).')
+    parser.add_argument('--streaming', action='store_true', help='Read the input in chunks and fit from streamed sufficient statistics (bounded memory).')
+    parser.add_argument('--chunk_size', type=int, default=STREAMING_CHUNK_SIZE, help='Rows per chunk in streaming mode.')
     parser.add_argument('--log_level', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).')
     args = parser.parse_args()
 
@@ -273,5 +603,8 @@ if __name__ == "__main__":
         logging.info(f"Created results folder: {results_folder}")
 
     # Create an instance of GPSDataRegressor and run
-    regressor = GPSDataRegressor(input_csv, config_file, results_folder)
-    regressor.run()
\ No newline at end of file
+    regressor = GPSDataRegressor(input_csv, config_file, results_folder, workers=args.workers)
+    if args.streaming:
+        regressor.run_streaming(args.chunk_size)
+    else:
+        regressor.run()
@@ -1,8 +1,17 @@
 import os
+import argparse
 import pandas as pd
 import statsmodels.formula.api as smf
 import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
+import sys
+if not __package__:
+    # Run as a script (python scripts/get_benchmark.py): make the scripts package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.inference import cluster_robust_covariance, bootstrap_ols, inference_table
+from scripts.benchmark_loader import load_benchmark, BENCHMARK_COLUMNS
+from scripts.diagnostics import build_interaction_design, variance_inflation_factors
+from scripts.preference_data import build_run_preferences, build_combined_dataset
+from scripts.utils import load_config
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -15,21 +24,25 @@ warnings.filterwarnings('ignore')
 # ---------------------------
 
 
-# File paths
-file_path = '/Users/chris/Documents/project_GPS_AI/benchmarks/individual_new.dta'
-file_path_run = '/Users/chris/Documents/project_GPS_AI/data/processed/cleaned_data.csv'
+# File paths (from config.yaml unless given on the command line)
+config = load_config()
+parser = argparse.ArgumentParser(description="Compare a run with the GPS individual benchmark data.")
+parser.add_argument('--benchmark_file', type=str, default=config['paths']['benchmark_file'], help='Path to the GPS individual Stata file.')
+parser.add_argument('--run_csv', type=str, default=config['paths']['cleaned_data_file'], help='Path to the concatenated and cleaned run CSV file.')
+parser.add_argument('--cache_folder', type=str, default=config['paths'].get('benchmark_cache_folder'), help='Folder for the benchmark data cache.')
+parser.add_argument('--countries', type=str, nargs='*', default=None, help='Restrict the benchmark data to these countries.')
+args = parser.parse_args()
 
-# Load the .dta file (without encoding argument)
+file_path = args.benchmark_file
+file_path_run = args.run_csv
+
+# Load the benchmark data through the memory-mapped cache, only with the columns used below
 try:
-    benchmark = pd.read_stata(file_path)
+    benchmark = load_benchmark(file_path, columns=BENCHMARK_COLUMNS, countries=args.countries, cache_dir=args.cache_folder)
 except Exception as e:
     print(f"Error reading Stata file: {e}")
     raise
 
-benchmark['category'] = 'Benchmark'
-columns_to_drop = ['isocode', 'region', 'date', 'id_gallup']
-benchmark = benchmark.drop(columns=columns_to_drop)
-
 # Load the run data
 try:
     run = pd.read_csv(file_path_run)
@@ -37,83 +50,11 @@ except Exception as e:
     print(f"Error reading CSV file: {e}")
     raise
 
-columns_to_drop_run = ['Participant Hash', 'Question']
-run = run.drop(columns=columns_to_drop_run)
-run.columns = run.columns.str.lower()
-
-# Remove numbers from 'short title'
-run['short title'] = run['short title'].str.replace(r'\d+', '', regex=True)
-
-# Mapping short titles
-title_mapping = {
-    "Will do revenge": "revenge_q",
-    "Will return favor": "favour_q",
-    "Willingness to delay consumption": "patience_q",
-    "Willingness to donate": "donate_q",
-    "Willingness to take risk": "risk_q",
-    "Retribution on others' behalf": "retribution_oth_q",
-    "Good at math": "subj_math_skills",
-    "Reciprocation ": "recip_perc",
-    "Donation .": "donate_perc",
-    "Delay .": "patience_e",
-    "Risk ": "risk_e",
-    "People have best intentions": "trust"
-}
-
-# Replace short titles
-run['short title'] = run['short title'].replace(title_mapping)
-
-# Pivot the dataframe
-pivoted_df = run.pivot_table(
-    index=['participant id', 'age', 'gender', 'country'],
-    columns='short title',
-    values='answer'
-).reset_index()
-
-# Create composite variables
-pivoted_df['patience'] = 0.7115185 * pivoted_df['patience_e'] + 0.2884815 * pivoted_df['patience_q']
-pivoted_df['risktaking'] = 0.4729985 * pivoted_df['risk_e'] + 0.5270015 * pivoted_df['risk_q']
-pivoted_df['posrecip'] = 0.4847038 * pivoted_df['favour_q'] + 0.5152962 * pivoted_df['recip_perc']
-pivoted_df['negrecip'] = (
-    0.3130969 * pivoted_df['revenge_q'] +
-    0.3130969 * pivoted_df['retribution_oth_q'] +
-    0.3738062 * pivoted_df['revenge_q']
-)
-pivoted_df['altruism'] = 0.6350048 * pivoted_df['donate_q'] + 0.3649952 * pivoted_df['donate_perc']
-
-# Flatten column index and add category
-pivoted_df.columns.name = None
-pivoted_df['category'] = 'run'
-
-# Replace gender strings with integers explicitly using map and astype
-pivoted_df['gender'] = pivoted_df['gender'].map({'male': 0, 'female': 1}).astype(int)
-
-# Concatenate run and benchmark dataframes
-combined_df = pd.concat([pivoted_df, benchmark], axis=0)
-
-# Replace any remaining spaces in column names with underscores
-combined_df.columns = combined_df.columns.str.replace(' ', '_', regex=True)
-
-# Ensure all 'gender' entries are numeric
-if combined_df['gender'].dtype == object:
-    combined_df['gender'] = combined_df['gender'].map({'male': 0, 'female': 1}).astype(int)
-
-# Convert 'country' into dummy variables
-combined_df = pd.get_dummies(combined_df, columns=['country'], drop_first=True)
-
-# Verify that dummy variables are created
-country_dummies = [col for col in combined_df.columns if col.startswith('country_')]
-
-# Ensure no spaces in dummy variable names (already handled, but double-check)
-combined_df.columns = combined_df.columns.str.replace(' ', '_', regex=True)
-
-# Update the list of country dummy variables after renaming
-country_dummies = [col for col in combined_df.columns if col.startswith('country_')]
-
-# Convert 'category' to binary: 1 for 'run', 0 for 'Benchmark'
-combined_df['category_binary'] = combined_df['category'].apply(
-    lambda x: 1 if x.lower() == 'run' else 0
-)
+# One row per run participant with the composite preference measures
+pivoted_df = build_run_preferences(run)
+
+# Concatenate run and benchmark dataframes, with country dummies and category_binary
+combined_df, country_dummies = build_combined_dataset(pivoted_df, benchmark)
 
 # Drop rows with missing values in relevant columns
 combined_df = combined_df.dropna(subset=['altruism', 'age', 'gender', 'category_binary'])
@@ -175,6 +116,15 @@ except Exception as e:
 print("\n--- Regression Summary ---\n")
 print(model.summary())
 
+# Answers of the same country are not independent: report country-clustered standard
+# errors and a cluster bootstrap alongside the default OLS errors
+country_clusters = combined_df.loc[model.resid.index, 'cluster_country'].to_numpy()
+exog = model.model.exog
+cluster_cov = cluster_robust_covariance(exog, model.resid, country_clusters)
+bootstrap_replicates = bootstrap_ols(exog, model.model.endog, groups=country_clusters, replicates=999, seed=0)
+print("\n--- Country-Clustered Inference ---\n")
+print(inference_table(model.params, model.model.exog_names, cluster_cov, bootstrap_replicates).to_string())
+
 # ---------------------------
 # 4. F-Test: Comparing Models
 # ---------------------------
@@ -208,21 +158,11 @@ else:
 
 # Check for Multicollinearity using Variance Inflation Factor (VIF)
 print("\n--- Variance Inflation Factor (VIF) ---\n")
-# Select predictor variables including interaction terms
-predictors = ['age', 'gender'] + country_dummies + ['category_binary']
-# Add interaction terms between category_binary and each predictor
-for var in ['age', 'gender'] + country_dummies:
-    interaction_term = f'{var}:category_binary'
-    predictors.append(interaction_term)
-
-# Create a DataFrame for VIF calculation
-X = combined_df[predictors]
-X = sm.add_constant(X)
-
-# Calculate VIF for each predictor
-vif_data = pd.DataFrame()
-vif_data['feature'] = X.columns
-vif_data['VIF'] = [variance_inflation_factor(X.values, i) for i in range(X.shape[1])]
+# Predictors, category_binary and the interactions of each predictor with category_binary
+X = build_interaction_design(combined_df, ['age', 'gender'] + country_dummies, 'category_binary')
+
+# Calculate all VIFs at once from the inverse of the predictor correlation matrix
+vif_data = variance_inflation_factors(X)
 
 print(vif_data)
 
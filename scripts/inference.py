@@ -0,0 +1,245 @@
+# scripts/inference.py
+
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Bootstrap replicates are drawn in fixed-size batches, each with its own random stream
+# spawned from the seed, so results do not depend on the number of workers.
+BOOTSTRAP_BATCH_SIZE = 100
+
+# Largest clusters x K x K array of per-cluster cross products kept in memory; above it,
+# replicates are computed from observation weights instead.
+MAX_CLUSTER_STATS_ELEMENTS = 50_000_000
+
+# Convergence settings for absorbing several fixed effects by alternating demeaning
+FE_DEMEAN_TOLERANCE = 1e-8
+FE_DEMEAN_MAX_ITERATIONS = 1000
+
+def demean_within(data, fe_codes, weights=None):
+    """
+    Remove the (weighted) group means of every fixed effect from the columns of data
+    (n x m, modified in place). With several fixed effects, group means are removed for
+    each in turn until the columns stop changing (alternating projections).
+
+    Parameters:
+    - data: Array of the variables (n x m).
+    - fe_codes: Integer group codes (n,) of each fixed effect.
+    - weights: Observation weights (n,), e.g. bootstrap draw counts; None weighs all equally.
+    """
+    totals = [np.bincount(codes, weights=weights) for codes in fe_codes]
+
+    def sweep(data):
+        for codes, total in zip(fe_codes, totals):
+            for j in range(data.shape[1]):
+                column = data[:, j] if weights is None else data[:, j] * weights
+                sums = np.bincount(codes, weights=column, minlength=len(total))
+                # Groups with no weight (not drawn in a replicate) do not enter the fit
+                means = np.divide(sums, total, out=np.zeros_like(sums), where=total > 0)
+                data[:, j] -= means[codes]
+        return data
+
+    data = sweep(data)
+    if len(fe_codes) > 1:
+        for iteration in range(FE_DEMEAN_MAX_ITERATIONS):
+            previous = data.copy()
+            data = sweep(data)
+            if np.max(np.abs(data - previous)) < FE_DEMEAN_TOLERANCE:
+                break
+        else:
+            logging.warning("Demeaning did not converge; fixed-effect estimates may be imprecise.")
+    return data
+
+def cluster_codes(groups):
+    """
+    Return integer cluster codes (0..G-1) for an array of cluster labels.
+    """
+    codes, _ = pd.factorize(pd.Series(np.asarray(groups)), sort=True)
+    if (codes < 0).any():
+        raise ValueError("Cluster labels contain missing values.")
+    return codes
+
+def cluster_boundaries(codes):
+    """
+    Return the order that sorts the observations by cluster and the start of each cluster
+    in that order.
+    """
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    return order, starts
+
+def cluster_robust_covariance(X, residuals, groups, n_params=None):
+    """
+    Cluster-robust (CR1) covariance matrix of OLS coefficients.
+
+    Parameters:
+    - X: Design matrix (n x k) the model was fitted on.
+    - residuals: OLS residuals (n,).
+    - groups: Cluster label of each observation (e.g. participant ID or country).
+    - n_params: Number of estimated parameters for the small-sample correction
+      (defaults to k; pass k plus absorbed fixed effects for within-transformed data).
+    """
+    X = np.asarray(X, dtype=float)
+    residuals = np.asarray(residuals, dtype=float)
+    n, k = X.shape
+    n_params = k if n_params is None else n_params
+
+    codes = cluster_codes(groups)
+    order, starts = cluster_boundaries(codes)
+    n_clusters = len(starts)
+    if n_clusters < 2:
+        raise ValueError("Cluster-robust covariance needs at least two clusters.")
+
+    # Sum the score contributions X_i * u_i within each cluster
+    scores = np.add.reduceat((X * residuals[:, None])[order], starts, axis=0)
+
+    # pinv keeps the computation defined for singular designs
+    bread = np.linalg.pinv(X.T @ X)
+    meat = scores.T @ scores
+    correction = n_clusters / (n_clusters - 1) * (n - 1) / (n - n_params)
+    return correction * bread @ meat @ bread
+
+def cluster_cross_products(X, y, codes):
+    """
+    Per-cluster sufficient statistics X_g'X_g (G x k x k) and X_g'y_g (G x k).
+    """
+    order, starts = cluster_boundaries(codes)
+    X_sorted = X[order]
+    y_sorted = y[order]
+    ends = np.r_[starts[1:], len(codes)]
+
+    xtx = np.empty((len(starts), X.shape[1], X.shape[1]))
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        block = X_sorted[start:end]
+        xtx[g] = block.T @ block
+    xty = np.add.reduceat(X_sorted * y_sorted[:, None], starts, axis=0)
+    return xtx, xty
+
+def solve_batch(xtx, xty):
+    """
+    Solve a stack of normal equations, falling back to the pseudo-inverse when a
+    resampled design is singular.
+    """
+    try:
+        return np.linalg.solve(xtx, xty[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(xtx) @ xty[..., None])[..., 0]
+
+# Bootstrap data shared with worker processes (set by init_bootstrap_worker)
+_bootstrap_data = None
+
+def init_bootstrap_worker(data):
+    global _bootstrap_data
+    _bootstrap_data = data
+
+def bootstrap_batch(seed_sequence, size):
+    """
+    Draw one batch of cluster bootstrap replicates and return their coefficients.
+    Resampling clusters with replacement is equivalent to weighting each cluster by
+    the number of times it is drawn, so each replicate only needs weighted sums.
+    Absorbed fixed effects are demeaned again with each replicate's weights.
+    """
+    data = _bootstrap_data
+    rng = np.random.default_rng(seed_sequence)
+    n_clusters = data['n_clusters']
+    weights = rng.multinomial(n_clusters, np.full(n_clusters, 1.0 / n_clusters), size=size).astype(float)
+
+    if 'xtx' in data:
+        xtx = np.tensordot(weights, data['xtx'], axes=1)
+        xty = weights @ data['xty']
+    elif 'fe_codes' in data:
+        X, y, codes = data['X'], data['y'], data['codes']
+        k = X.shape[1]
+        xtx = np.empty((size, k, k))
+        xty = np.empty((size, k))
+        for b in range(size):
+            row_weights = weights[b, codes]
+            within = demean_within(np.column_stack([y, X]), data['fe_codes'], row_weights)
+            weighted_X = within[:, 1:] * row_weights[:, None]
+            xtx[b] = weighted_X.T @ within[:, 1:]
+            xty[b] = weighted_X.T @ within[:, 0]
+    else:
+        X, y, codes = data['X'], data['y'], data['codes']
+        k = X.shape[1]
+        xtx = np.empty((size, k, k))
+        xty = np.empty((size, k))
+        for b in range(size):
+            row_weights = weights[b, codes]
+            weighted_X = X * row_weights[:, None]
+            xtx[b] = weighted_X.T @ X
+            xty[b] = weighted_X.T @ y
+    return solve_batch(xtx, xty)
+
+def bootstrap_ols(X, y, groups=None, replicates=999, seed=0, workers=1, fe_codes=None):
+    """
+    Pairs or cluster bootstrap of OLS coefficients.
+
+    Parameters:
+    - X: Design matrix (n x k).
+    - y: Dependent variable (n,).
+    - groups: Cluster labels; whole clusters are resampled. None resamples single
+      observations (pairs bootstrap).
+    - replicates: Number of bootstrap replicates.
+    - seed: Seed of the random streams; the same seed gives the same replicates.
+    - workers: Number of processes to spread the replicate batches over.
+    - fe_codes: Integer group codes of fixed effects to absorb (optional). X and y are
+      then the data before the within-transformation, which is redone in every replicate.
+
+    Returns:
+    - Array of replicate coefficients (replicates x k).
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    codes = np.arange(len(y)) if groups is None else cluster_codes(groups)
+    n_clusters = int(codes.max()) + 1
+
+    data = {'n_clusters': n_clusters}
+    if fe_codes:
+        data.update(X=X, y=y, codes=codes, fe_codes=[np.asarray(fe) for fe in fe_codes])
+    elif n_clusters * X.shape[1] ** 2 <= MAX_CLUSTER_STATS_ELEMENTS:
+        data['xtx'], data['xty'] = cluster_cross_products(X, y, codes)
+    else:
+        data.update(X=X, y=y, codes=codes)
+
+    sizes = [BOOTSTRAP_BATCH_SIZE] * (replicates // BOOTSTRAP_BATCH_SIZE)
+    if replicates % BOOTSTRAP_BATCH_SIZE:
+        sizes.append(replicates % BOOTSTRAP_BATCH_SIZE)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    logging.info(f"Running {replicates} bootstrap replicates over {n_clusters} clusters with {workers} worker(s).")
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(sizes)),
+            initializer=init_bootstrap_worker, initargs=(data,)
+        ) as executor:
+            batches = list(executor.map(bootstrap_batch, seed_sequences, sizes))
+    else:
+        init_bootstrap_worker(data)
+        batches = [bootstrap_batch(seed_sequence, size) for seed_sequence, size in zip(seed_sequences, sizes)]
+        init_bootstrap_worker(None)
+
+    return np.vstack(batches)
+
+def inference_table(params, names, covariance=None, replicates=None, level=0.95):
+    """
+    Combine point estimates with cluster-robust standard errors and/or bootstrap
+    standard errors and percentile confidence intervals.
+
+    Parameters:
+    - params: Estimated coefficients (k,).
+    - names: Coefficient names.
+    - covariance: Cluster-robust covariance matrix (optional).
+    - replicates: Bootstrap replicate coefficients (optional).
+    - level: Confidence level of the bootstrap intervals.
+    """
+    table = pd.DataFrame({'coef': np.asarray(params, dtype=float)}, index=list(names))
+    if covariance is not None:
+        table['cluster se'] = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        table['cluster t'] = table['coef'] / table['cluster se']
+    if replicates is not None:
+        alpha = (1 - level) / 2
+        table['boot se'] = replicates.std(axis=0, ddof=1)
+        table[f'boot {alpha:.3f}'] = np.quantile(replicates, alpha, axis=0)
+        table[f'boot {1 - alpha:.3f}'] = np.quantile(replicates, 1 - alpha, axis=0)
+    return table
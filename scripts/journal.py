@@ -0,0 +1,119 @@
+# scripts/journal.py
+
+import json
+import logging
+import os
+import time
+
+from .answer_parser import API_ERROR_PREFIXES
+
+# Journal file written to each run folder
+JOURNAL_FILE = "journal.jsonl"
+
+class AnswerJournal:
+    """
+    Write-ahead journal of a run's answers, one JSON line per event, keyed by participant
+    ID (participants with the same prompt can be in flight at the same time):
+    - start: a participant was started (participant hash, design fields and API target),
+    - answer: an API answer to one of the participant's questions (failed requests are not
+      journaled, so they are asked again on resume),
+    - complete: the participant's results were saved to the results tables.
+
+    Every event is written to the operating system immediately, so a crash of the
+    runner loses nothing; fsync calls are batched (every `fsync_batch` events or
+    `fsync_interval` seconds) to protect against power loss without syncing per answer.
+    On restart, `pending` holds the participants that were started but not completed,
+    with their answers in the order they were given; each is resumed once (see claim).
+    """
+
+    def __init__(self, run_folder, fsync_batch=100, fsync_interval=1.0):
+        self.journal_file = os.path.join(run_folder, JOURNAL_FILE)
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.pending = self.replay(self.journal_file)
+        self.file = open(self.journal_file, 'a', encoding='utf-8')
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    @staticmethod
+    def replay(journal_file):
+        """
+        Read a journal and return the participants started but not completed, keyed by
+        participant ID: {'hash', 'participant', 'model', 'answers': [(question, answer), ...]}.
+        """
+        pending = {}
+        if not os.path.exists(journal_file):
+            return pending
+        # Journals written before events were keyed by participant ID name the participant
+        # by hash after its start event
+        started_by_hash = {}
+
+        with open(journal_file, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be cut off by a crash
+                    logging.warning(f"Skipping incomplete journal line {line_number} in {journal_file}")
+                    continue
+                if event['event'] == 'start':
+                    started_by_hash[event['hash']] = event['participant_id']
+                    pending[event['participant_id']] = {
+                        'hash': event['hash'],
+                        'participant': event['participant'],
+                        'model': event.get('model'),
+                        'answers': []
+                    }
+                    continue
+                participant_id = event['participant_id'] if 'participant_id' in event else started_by_hash.get(event['hash'])
+                if event['event'] == 'answer' and participant_id in pending:
+                    if event['answer'] is None or event['answer'].startswith(API_ERROR_PREFIXES):
+                        # Journals written before failed requests were left out
+                        continue
+                    pending[participant_id]['answers'].append((event['question'], event['answer']))
+                elif event['event'] == 'complete':
+                    pending.pop(participant_id, None)
+
+        if pending:
+            answers = sum(len(entry['answers']) for entry in pending.values())
+            logging.info(f"Journal {journal_file}: {len(pending)} in-flight participants with {answers} answers to resume.")
+        return pending
+
+    def write(self, event):
+        self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_batch or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def start_participant(self, participant_id, participant_hash, participant, model=None):
+        self.write({
+            'event': 'start', 'participant_id': participant_id, 'hash': participant_hash,
+            'participant': participant, 'model': model
+        })
+
+    def claim(self, participant_id):
+        """
+        Take an in-flight participant of the journal to resume it: its pending entry, or None
+        if it is not pending (or was claimed already).
+        """
+        return self.pending.pop(participant_id, None)
+
+    def record_answer(self, participant_id, question, answer):
+        self.write({'event': 'answer', 'participant_id': participant_id, 'question': question, 'answer': answer})
+
+    def complete_participant(self, participant_id):
+        self.pending.pop(participant_id, None)
+        self.write({'event': 'complete', 'participant_id': participant_id})
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
@@ -0,0 +1,72 @@
+# scripts/online_stats.py
+
+import math
+import numpy as np
+from scipy import stats
+
+class RunningMoments:
+    """
+    Running count, mean and variance of a stream of values (Welford's algorithm), updated
+    one value or one batch at a time without keeping the values. Batches and partial
+    results are combined with the parallel update of Chan et al., so the result does not
+    depend on how the stream is split.
+    """
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def add_batch(self, values):
+        """
+        Add an array of values; missing (NaN) values are ignored.
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.merge(RunningMoments(len(values), float(values.mean()), float(((values - values.mean()) ** 2).sum())))
+
+    def merge(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        """
+        Sample variance (NaN for fewer than two values).
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def ci_width(self, confidence=0.95):
+        """
+        Width of the t confidence interval of the mean (infinite for fewer than two values).
+        """
+        if self.count < 2:
+            return math.inf
+        return 2 * stats.t.ppf((1 + confidence) / 2, self.count - 1) * self.std / math.sqrt(self.count)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['count'], state['mean'], state['m2'])
+
+    def __repr__(self):
+        return f"RunningMoments(count={self.count}, mean={self.mean:.4g}, variance={self.variance:.4g})"
@@ -0,0 +1,67 @@
+# scripts/participant.py
+
+class Participant:
+    """
+    Compact record of one simulated participant, carried from the design generator
+    through the API calls to the results writer.
+
+    Attributes:
+    - country, gender, age: The participant's design fields.
+    - covariates: Extra demographic covariates of the design ({name: level}).
+    - model: Name of the API target the participant is asked to (None for the 'api' section).
+    - participant_id, participant_hash: Set when the participant is processed.
+    """
+    __slots__ = ('country', 'gender', 'age', 'covariates', 'model', 'participant_id', 'participant_hash')
+
+    def __init__(self, country, gender, age, covariates=None, model=None):
+        self.country = country
+        self.gender = gender
+        self.age = age
+        self.covariates = covariates or {}
+        self.model = model
+        self.participant_id = None
+        self.participant_hash = None
+
+    @classmethod
+    def from_fields(cls, fields):
+        """
+        Build a participant from its fields as returned by fields() (e.g. from the journal).
+        """
+        fields = dict(fields)
+        return cls(fields.pop('country'), fields.pop('gender'), fields.pop('age'), fields)
+
+    def fields(self):
+        """
+        The participant's design fields as a dict (used to render the prompt template).
+        """
+        return {'country': self.country, 'gender': self.gender, 'age': self.age, **self.covariates}
+
+    def __repr__(self):
+        return f"Participant({self.fields()})"
+
+class AnswerBuffer:
+    """
+    A participant's answers as parallel lists, one entry per question asked, handed to
+    the results writer as columns: the raw responses with their parsed values and parse
+    statuses (see answer_parser).
+    """
+    __slots__ = ('question_ids', 'questions', 'short_titles', 'answers', 'values', 'parse_statuses')
+
+    def __init__(self):
+        self.question_ids = []
+        self.questions = []
+        self.short_titles = []
+        self.answers = []
+        self.values = []
+        self.parse_statuses = []
+
+    def append(self, question_id, question, short_title, answer, value, parse_status):
+        self.question_ids.append(question_id)
+        self.questions.append(question)
+        self.short_titles.append(short_title)
+        self.answers.append(answer)
+        self.values.append(value)
+        self.parse_statuses.append(parse_status)
+
+    def __len__(self):
+        return len(self.answers)
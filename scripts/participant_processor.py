@@ -3,12 +3,15 @@
 import asyncio
 import logging
 import uuid
+from collections import deque
 import pandas as pd
 
 from aiohttp import ClientSession
 from .utils import compute_hash
-from .prompt_generator import extract_age_gender_country
-from .api_client import ask_economic_question
+from .participant import AnswerBuffer
+from .prompt_generator import SYSTEM_PROMPT_TEMPLATE, render_system_prompt
+from .api_client import ask_economic_question, request_completions
+from .answer_parser import CHOICE_BATTERIES, PARSE_ERROR, answer_kind, parse_answer
 from .data_saver import save_results_for_participant
 from .question_generator import (
     generate_risk_questions_for_country,
@@ -20,11 +23,82 @@ from .question_generator import (
 # Initialize locks and counts
 country_locks = {}
 processed_counts_per_country = {}
+# Question text -> Question ID of the current run's question table
+question_ids = {}
+# Country -> questions asked to its participants, built once per country
+country_question_plans = {}
+
+def get_question_plan(country, stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df, questions1, short_titles1):
+    """
+    Return the questions of a country's participants as (question, short title, question ID,
+    battery, answer kind) tuples. The plan is generated on first use and shared by all
+    participants of the country.
+    """
+    plan = country_question_plans.get(country)
+    if plan is None:
+        risk_questions, risk_short_titles = generate_risk_questions_for_country(country, stakes_df)
+        time_questions, time_short_titles = generate_time_questions_for_country(country, time_stakes_df)
+        recip_questions, recip_short_titles = generate_recip_questions_for_country(country, recip_stakes_df)
+        donation_questions, donation_short_titles = generate_donation_questions_for_country(country, donation_stakes_df)
+
+        plan = []
+        for battery, questions, short_titles in (
+            ('general', questions1, short_titles1),
+            ('risk', risk_questions, risk_short_titles),
+            ('time', time_questions, time_short_titles),
+            ('recip', recip_questions, recip_short_titles),
+            ('donation', donation_questions, donation_short_titles)
+        ):
+            plan.extend(
+                (question, short_title, question_ids.get(question), battery, answer_kind(battery))
+                for question, short_title in zip(questions, short_titles)
+            )
+        country_question_plans[country] = plan
+    return plan
+
+def record_answer(answers, stopped_batteries, question, short_title, question_id, battery, kind, answer):
+    """
+    Parse an answer into the participant's answer buffer and stop the participant's
+    staircase battery when the answer ends it. Returns the answer's parse status.
+    """
+    # Typed value and parse status are stored next to the raw response
+    value, parse_status = parse_answer(answer, kind)
+
+    # Logic to stop asking further risk or time preference questions based on the participant's answer
+    if battery in CHOICE_BATTERIES and value == 2:
+        stopped_batteries.add(battery)
+
+    answers.append(question_id, question, short_title, answer, value, parse_status)
+    return parse_status
+
+async def finish_participant(
+    participant, answers, existing_hashes_per_country, gps_folder_path, gps_proc_folder_path, journal, statistics
+):
+    """
+    Save a participant's answers, mark the participant complete in the journal and add
+    the answers to the run's live statistics.
+    """
+    logging.info(f"Participant {participant.participant_id} processed.")
+
+    # Update processed counts per country
+    country = participant.country
+    processed_counts_per_country[country] = processed_counts_per_country.get(country, 0) + 1
+
+    # Save results
+    saved = await save_results_for_participant(
+        participant, answers, existing_hashes_per_country, country_locks, processed_counts_per_country,
+        gps_folder_path, gps_proc_folder_path
+    )
+    if saved and journal is not None:
+        journal.complete_participant(participant.participant_id)
+    if saved and statistics is not None:
+        statistics.update(participant, answers)
 
 async def process_participant(
-    session, system_prompt, semaphore, existing_hashes_per_country,
+    session, participant, dispatcher, existing_hashes_per_country,
     stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df,
-    questions1, short_titles1, gps_folder_path
+    questions1, short_titles1, gps_folder_path, gps_proc_folder_path=None, journal=None,
+    prompt_template=SYSTEM_PROMPT_TEMPLATE, target=None, statistics=None
 ):
     """
     Process a single participant by generating questions, making API calls,
@@ -32,79 +106,136 @@ async def process_participant(
 
     Parameters:
     - session: The aiohttp ClientSession for making API calls.
-    - system_prompt: The system prompt describing the participant.
-    - semaphore: An asyncio.Semaphore to limit concurrent API calls.
+    - participant: The Participant record (country, gender, age and any covariates),
+      as generated by prompt_generator.iter_participants.
+    - dispatcher: A RequestDispatcher limiting concurrent API calls; the participant's requests
+      are prioritized by the number of questions it has answered.
     - existing_hashes_per_country: A dictionary of existing participant hashes per country.
     - stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df: DataFrames with stakes data.
     - questions1, short_titles1: Lists of additional general questions and their short titles.
     - gps_folder_path: Path to the current run's GPS folder.
+    - gps_proc_folder_path: Path to the current run's processed GPS folder (optional).
+    - journal: AnswerJournal of the run (optional). Every answer is journaled as it arrives,
+      and an in-flight participant of the journal (resumed with its participant ID set)
+      continues after its journaled answers.
+    - prompt_template: Template the participant's system prompt is rendered from.
+    - target: ApiTarget the participant is asked to (optional, default: the 'api' section of
+      config.yaml); session and dispatcher are then the target's own.
+    - statistics: RunStatistics of the run (optional), updated when the participant is saved.
+
+    Returns:
+    - AnswerBuffer: The participant's answers, or None if the participant was already processed.
     """
-    participant_id = str(uuid.uuid4())  # Generate a unique UUID for participant
-    participant_hash = compute_hash(system_prompt)
-    age, gender, country = extract_age_gender_country(system_prompt)
-
-    if country is None:
-        logging.warning(f"Could not extract country for participant {participant_id}. Skipping.")
-        return
-
-    if participant_hash in existing_hashes_per_country.get(country, set()):
-        logging.info(f"Participant {participant_id} from {country} already processed. Skipping.")
+    country = participant.country
+    system_prompt = render_system_prompt(participant, prompt_template)
+    if participant.participant_id is None:
+        # Set beforehand for an in-flight participant of a resumed run
+        participant.participant_id = str(uuid.uuid4())  # Generate a unique UUID for participant
+    if participant.participant_hash is None:
+        # Set beforehand for an in-flight participant of a resumed run. Participants drawn with
+        # the same prompt are distinct samples of their cell, so the hash includes the participant ID
+        participant.participant_hash = compute_hash(f"{system_prompt}\n{participant.participant_id}")
+
+    if participant.participant_hash in existing_hashes_per_country.get(country, set()):
+        logging.info(f"Participant {participant.participant_id} from {country} already processed. Skipping.")
         return
 
-    logging.info(f"Processing participant {participant_id} from {country}")
-
-    results = []
-
-    # Generate questions based on country
-    risk_questions, risk_short_titles = generate_risk_questions_for_country(country, stakes_df)
-    time_questions, time_short_titles = generate_time_questions_for_country(country, time_stakes_df)
-    recip_questions, recip_short_titles = generate_recip_questions_for_country(country, recip_stakes_df)
-    donation_questions, donation_short_titles = generate_donation_questions_for_country(country, donation_stakes_df)
-
-    # Combine all questions and short titles
-    questions = questions1 + risk_questions + time_questions + recip_questions + donation_questions
-    short_titles = short_titles1 + risk_short_titles + time_short_titles + recip_short_titles + donation_short_titles
-    question_to_short_title = dict(zip(questions, short_titles))
-
-    # Flags to stop asking certain questions based on responses
-    stop_asking_risk_questions = False
-    stop_asking_time_questions = False
+    # Answers journaled before a restart are replayed instead of asked again
+    resumed = journal.claim(participant.participant_id) if journal is not None else None
+    if resumed is not None:
+        replayed_answers = deque(resumed['answers'])
+        logging.info(f"Resuming participant {participant.participant_id} from {country} after {len(replayed_answers)} journaled answers")
+    else:
+        replayed_answers = deque()
+        if journal is not None:
+            journal.start_participant(participant.participant_id, participant.participant_hash, participant.fields(), participant.model)
+        logging.info(f"Processing participant {participant.participant_id} from {country}")
+
+    answers = AnswerBuffer()
+    question_plan = get_question_plan(
+        country, stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df, questions1, short_titles1
+    )
+
+    # Staircase batteries to stop asking based on responses
+    stopped_batteries = set()
+
+    for question, short_title, question_id, battery, kind in question_plan:
+        if battery in stopped_batteries:
+            continue
 
-    for question in questions:
-        if stop_asking_risk_questions and question in risk_questions:
+        if replayed_answers and replayed_answers[0][0] == question:
+            answer = replayed_answers.popleft()[1]
+            record_answer(answers, stopped_batteries, question, short_title, question_id, battery, kind, answer)
             continue
-        if stop_asking_time_questions and question in time_questions:
+
+        if replayed_answers:
+            # e.g. a failed request, which is not journaled: later answers may depend on this one
+            logging.warning(f"Journal of participant {participant.participant_id} does not match the questions; asking again.")
+            replayed_answers.clear()
+        async with dispatcher.slot(country, len(answers)):
+            answer = await ask_economic_question(session, question, system_prompt, kind, target=target)
+        parse_status = record_answer(answers, stopped_batteries, question, short_title, question_id, battery, kind, answer)
+        # Failed requests are asked again on resume instead of replayed
+        if journal is not None and parse_status != PARSE_ERROR:
+            journal.record_answer(participant.participant_id, question, answer)
+
+    await finish_participant(
+        participant, answers, existing_hashes_per_country, gps_folder_path, gps_proc_folder_path, journal, statistics
+    )
+    return answers
+
+async def process_participant_group(
+    session, participants, dispatcher, existing_hashes_per_country,
+    stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df,
+    questions1, short_titles1, gps_folder_path, gps_proc_folder_path=None, journal=None,
+    prompt_template=SYSTEM_PROMPT_TEMPLATE, target=None, statistics=None
+):
+    """
+    Process a group of participants sharing one system prompt (see
+    prompt_generator.iter_participant_groups): each question is asked once with one
+    completion per participant still answering it, and every completion is one logical
+    participant's answer.
+
+    Staircase batteries branch per participant: once a participant's answer stops a
+    battery, its remaining questions are asked with fewer completions. Each participant
+    gets its own ID, journal entries and result rows, exactly as from process_participant;
+    a participant interrupted by a crash is resumed alone by process_participant.
+
+    Parameters are those of process_participant, with the list of Participant records
+    of the group in place of a single participant; returns the list of their AnswerBuffers.
+    """
+    country = participants[0].country
+    system_prompt = render_system_prompt(participants[0], prompt_template)
+    for participant in participants:
+        participant.participant_id = str(uuid.uuid4())
+        # Completions of one prompt are distinct samples, so the hash includes the participant ID
+        participant.participant_hash = compute_hash(f"{system_prompt}\n{participant.participant_id}")
+        if journal is not None:
+            journal.start_participant(participant.participant_id, participant.participant_hash, participant.fields(), participant.model)
+    logging.info(f"Processing {len(participants)} participants from {country} sharing one prompt")
+
+    answers = [AnswerBuffer() for _ in participants]
+    stopped_batteries = [set() for _ in participants]
+    question_plan = get_question_plan(
+        country, stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df, questions1, short_titles1
+    )
+
+    for question, short_title, question_id, battery, kind in question_plan:
+        answering = [i for i, stopped in enumerate(stopped_batteries) if battery not in stopped]
+        if not answering:
             continue
 
-        async with semaphore:
-            answer = await ask_economic_question(session, question, system_prompt)
-
-        # Logic to stop asking further risk or time preference questions based on the participant's answer
-        if "Option 2" in answer:
-            if question in risk_questions:
-                stop_asking_risk_questions = True
-            elif question in time_questions:
-                stop_asking_time_questions = True
-
-        # Append the result to the list
-        results.append({
-            'Participant ID': participant_id,
-            'Participant Hash': participant_hash,
-            'Question': question,
-            'Answer': answer,
-            'Short Title': question_to_short_title[question],
-            'Age': age,
-            'Gender': gender,
-            'Country': country
-        })
-
-    logging.info(f"Participant {participant_id} processed.")
+        async with dispatcher.slot(country, max(len(buffer) for buffer in answers)):
+            completions = await request_completions(session, question, system_prompt, kind, n=len(answering), target=target)
 
-    # Update processed counts per country
-    processed_counts_per_country[country] = processed_counts_per_country.get(country, 0) + 1
+        for i, answer in zip(answering, completions):
+            parse_status = record_answer(answers[i], stopped_batteries[i], question, short_title, question_id, battery, kind, answer)
+            if journal is not None and parse_status != PARSE_ERROR:
+                journal.record_answer(participants[i].participant_id, question, answer)
 
-    # Save results
-    await save_results_for_participant(
-        results, country, existing_hashes_per_country, country_locks, processed_counts_per_country,
-        gps_folder_path
-    )
\ No newline at end of file
+    for participant, participant_answers in zip(participants, answers):
+        await finish_participant(
+            participant, participant_answers, existing_hashes_per_country, gps_folder_path, gps_proc_folder_path,
+            journal, statistics
+        )
+    return answers
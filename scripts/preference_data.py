@@ -0,0 +1,116 @@
+# scripts/preference_data.py
+
+import pandas as pd
+
+# GPS preference measures available for both the run and the benchmark data
+PREFERENCE_MEASURES = ['patience', 'risktaking', 'posrecip', 'negrecip', 'altruism', 'trust']
+
+# Mapping of short titles (with numbers removed) to GPS survey items
+RUN_TITLE_MAPPING = {
+    "Will do revenge": "revenge_q",
+    "Will return favor": "favour_q",
+    "Willingness to delay consumption": "patience_q",
+    "Willingness to donate": "donate_q",
+    "Willingness to take risk": "risk_q",
+    "Retribution on others' behalf": "retribution_oth_q",
+    "Good at math": "subj_math_skills",
+    "Reciprocation ": "recip_perc",
+    "Donation .": "donate_perc",
+    "Delay .": "patience_e",
+    "Risk ": "risk_e",
+    "People have best intentions": "trust"
+}
+
+def build_run_preferences(run):
+    """
+    Turn cleaned run rows (one row per answer) into one row per participant with the
+    GPS survey items and the composite preference measures.
+
+    Parameters:
+    - run: DataFrame of the concatenated and cleaned run data.
+    """
+    columns_to_drop_run = ['Participant Hash', 'Question']
+    run = run.drop(columns=[col for col in columns_to_drop_run if col in run.columns])
+    run.columns = run.columns.str.lower()
+
+    # Remove numbers from 'short title'
+    run['short title'] = run['short title'].astype(str).str.replace(r'\d+', '', regex=True)
+
+    # Replace short titles
+    run['short title'] = run['short title'].replace(RUN_TITLE_MAPPING)
+
+    # Pivot the dataframe
+    pivoted_df = run.pivot_table(
+        index=['participant id', 'age', 'gender', 'country'],
+        columns='short title',
+        values='answer',
+        observed=True
+    ).reset_index()
+
+    # Items nobody answered (e.g. no risk switch point in a small sample) are missing, not absent
+    for item in RUN_TITLE_MAPPING.values():
+        if item not in pivoted_df.columns:
+            pivoted_df[item] = float('nan')
+
+    # Create composite variables
+    pivoted_df['patience'] = 0.7115185 * pivoted_df['patience_e'] + 0.2884815 * pivoted_df['patience_q']
+    pivoted_df['risktaking'] = 0.4729985 * pivoted_df['risk_e'] + 0.5270015 * pivoted_df['risk_q']
+    pivoted_df['posrecip'] = 0.4847038 * pivoted_df['favour_q'] + 0.5152962 * pivoted_df['recip_perc']
+    pivoted_df['negrecip'] = (
+        0.3130969 * pivoted_df['revenge_q'] +
+        0.3130969 * pivoted_df['retribution_oth_q'] +
+        0.3738062 * pivoted_df['revenge_q']
+    )
+    pivoted_df['altruism'] = 0.6350048 * pivoted_df['donate_q'] + 0.3649952 * pivoted_df['donate_perc']
+
+    # Flatten column index and add category
+    pivoted_df.columns.name = None
+    pivoted_df['category'] = 'run'
+
+    # Replace gender strings with integers explicitly using map and astype
+    pivoted_df['gender'] = pivoted_df['gender'].astype(str).map({'male': 0, 'female': 1}).astype(int)
+
+    return pivoted_df
+
+def build_combined_dataset(run_preferences, benchmark):
+    """
+    Stack run participants and benchmark respondents, add country dummies and the
+    'category_binary' indicator (1 for the run, 0 for the benchmark).
+
+    Parameters:
+    - run_preferences: DataFrame from build_run_preferences.
+    - benchmark: GPS individual benchmark data (see benchmark_loader.load_benchmark).
+
+    Returns:
+    - tuple: The combined DataFrame and the list of country dummy columns.
+    """
+    benchmark = benchmark.copy()
+    benchmark['category'] = 'Benchmark'
+
+    # Concatenate run and benchmark dataframes
+    combined_df = pd.concat([run_preferences, benchmark], axis=0, ignore_index=True)
+
+    # Replace any remaining spaces in column names with underscores
+    combined_df.columns = combined_df.columns.str.replace(' ', '_', regex=True)
+
+    # Ensure all 'gender' entries are numeric
+    if combined_df['gender'].dtype == object:
+        combined_df['gender'] = combined_df['gender'].map({'male': 0, 'female': 1}).astype(int)
+
+    # Keep the country labels for clustering before they are turned into dummies
+    combined_df['country'] = combined_df['country'].astype(str)
+    combined_df['cluster_country'] = combined_df['country']
+
+    # Convert 'country' into dummy variables
+    combined_df = pd.get_dummies(combined_df, columns=['country'], drop_first=True)
+
+    # Ensure no spaces in dummy variable names
+    combined_df.columns = combined_df.columns.str.replace(' ', '_', regex=True)
+    country_dummies = [col for col in combined_df.columns if col.startswith('country_')]
+
+    # Convert 'category' to binary: 1 for 'run', 0 for 'Benchmark'
+    combined_df['category_binary'] = combined_df['category'].apply(
+        lambda x: 1 if x.lower() == 'run' else 0
+    )
+
+    return combined_df, country_dummies
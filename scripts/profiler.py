@@ -0,0 +1,207 @@
+# scripts/profiler.py
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+import numpy as np
+
+# Sampling intervals (seconds) of the profiling mode
+STACK_SAMPLE_INTERVAL = 0.01
+TASK_SAMPLE_INTERVAL = 1.0
+LAG_SAMPLE_INTERVAL = 0.1
+
+# A callback running longer than this (seconds) without returning to the loop is reported
+SLOW_CALLBACK_DURATION = 0.1
+
+# Every callback of the event loop runs inside Handle._run
+HANDLE_RUN_CODE = asyncio.events.Handle._run.__code__
+
+def frame_label(frame):
+    """
+    Label of a stack frame in the collapsed (flame graph) stacks: 'function (file)'.
+    """
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})"
+
+def collapse_stack(frame):
+    """
+    Collapse a thread's stack into 'outermost;...;innermost' frame labels.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+def await_chain(task):
+    """
+    Collapse the chain of coroutines a suspended task is waiting in, outermost first,
+    e.g. 'process_participant;ask_economic_question;ClientSession._request'.
+    """
+    labels = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            break
+        labels.append(frame_label(frame))
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return ';'.join(labels)
+
+class LoopProfiler:
+    """
+    Low-overhead profiler of the runner's event loop, writing to a folder of the run:
+    - loop_lag.csv: how late the loop wakes up a sleeping coroutine (the time it was blocked),
+    - loop_cpu.folded: sampled stacks of the loop thread (where the loop spends its time),
+    - tasks_wall.folded: sampled await chains of all tasks (where participants are waiting:
+      API calls, the request dispatcher, country locks, ...),
+    - slow_callbacks.log: callbacks that held the loop longer than the threshold, with
+      the stack they were running when detected,
+    - summary.txt: lag percentiles and the top stacks of both profiles.
+
+    The folded files use the collapsed stack format read by flamegraph.pl and speedscope.
+    Sampling runs in a separate thread and only reads the loop thread's frames, so the
+    overhead is a few stack walks per second and the profiler can stay on for long runs.
+    """
+
+    def __init__(self, profile_folder, stack_interval=STACK_SAMPLE_INTERVAL, task_interval=TASK_SAMPLE_INTERVAL,
+                 lag_interval=LAG_SAMPLE_INTERVAL, slow_callback_duration=SLOW_CALLBACK_DURATION):
+        self.profile_folder = profile_folder
+        self.stack_interval = stack_interval
+        self.task_interval = task_interval
+        self.lag_interval = lag_interval
+        self.slow_callback_duration = slow_callback_duration
+
+        self.loop_stacks = Counter()
+        self.task_stacks = Counter()
+        self.lags = []
+        self.slow_callbacks = []
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """
+        Start profiling the running event loop (call from a coroutine on that loop).
+        """
+        os.makedirs(self.profile_folder, exist_ok=True)
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.start_time = time.perf_counter()
+        self.lag_task = self.loop.create_task(self.sample_lag())
+        self.sampler = threading.Thread(target=self.sample_stacks, name="loop-profiler", daemon=True)
+        self.sampler.start()
+        logging.info(f"Profiling the event loop into {self.profile_folder}")
+
+    async def stop(self):
+        """
+        Stop profiling and write the profile files.
+        """
+        self.lag_task.cancel()
+        try:
+            await self.lag_task
+        except asyncio.CancelledError:
+            pass
+        self.stop_event.set()
+        self.sampler.join()
+        self.save()
+
+    async def sample_lag(self):
+        # The loop is late by however long other callbacks kept it busy
+        while True:
+            scheduled = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            self.lags.append((scheduled - self.start_time, time.perf_counter() - scheduled - self.lag_interval))
+
+    def sample_stacks(self):
+        running_callback = None
+        callback_start = None
+        reported_callback = None
+        next_task_sample = time.perf_counter()
+
+        while not self.stop_event.wait(self.stack_interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            self.loop_stacks[collapse_stack(frame)] += 1
+
+            # The outermost Handle._run frame identifies the callback running right now
+            callback_frame = None
+            current = frame
+            while current is not None:
+                if current.f_code is HANDLE_RUN_CODE:
+                    callback_frame = current
+                current = current.f_back
+
+            if callback_frame is not running_callback:
+                if reported_callback is not None:
+                    reported_callback['duration'] = now - callback_start
+                running_callback, callback_start, reported_callback = callback_frame, now, None
+            elif callback_frame is not None and reported_callback is None \
+                    and now - callback_start >= self.slow_callback_duration:
+                reported_callback = {
+                    'time': callback_start - self.start_time,
+                    'duration': now - callback_start,
+                    'stack': collapse_stack(frame)
+                }
+                self.slow_callbacks.append(reported_callback)
+            elif reported_callback is not None:
+                reported_callback['duration'] = now - callback_start
+
+            if now >= next_task_sample:
+                next_task_sample = now + self.task_interval
+                try:
+                    tasks = asyncio.all_tasks(self.loop)
+                except RuntimeError:
+                    continue
+                for task in tasks:
+                    chain = await_chain(task)
+                    if chain:
+                        self.task_stacks[chain] += 1
+
+    def save(self):
+        def write_folded(stacks, file_name):
+            with open(os.path.join(self.profile_folder, file_name), 'w') as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+
+        write_folded(self.loop_stacks, "loop_cpu.folded")
+        write_folded(self.task_stacks, "tasks_wall.folded")
+
+        with open(os.path.join(self.profile_folder, "loop_lag.csv"), 'w') as file:
+            file.write("elapsed_s,lag_ms\n")
+            for elapsed, lag in self.lags:
+                file.write(f"{elapsed:.3f},{lag * 1000:.3f}\n")
+
+        with open(os.path.join(self.profile_folder, "slow_callbacks.log"), 'w') as file:
+            for callback in self.slow_callbacks:
+                file.write(f"{callback['time']:.3f}s: callback held the loop for at least {callback['duration'] * 1000:.0f} ms\n")
+                file.write(f"    {callback['stack'].replace(';', chr(10) + '    ')}\n")
+
+        lags = np.array([lag for _, lag in self.lags]) * 1000
+        loop_leaves = Counter()
+        for stack, count in self.loop_stacks.items():
+            loop_leaves[stack.rsplit(';', 1)[-1]] += count
+        task_sites = Counter()
+        for stack, count in self.task_stacks.items():
+            task_sites[stack.rsplit(';', 1)[-1]] += count
+
+        lines = [f"Profiled {time.perf_counter() - self.start_time:.1f} s"]
+        if len(lags):
+            p50, p95, p99 = np.percentile(lags, [50, 95, 99])
+            lines.append(f"Loop lag (ms): p50 {p50:.1f}, p95 {p95:.1f}, p99 {p99:.1f}, max {lags.max():.1f} over {len(lags)} samples")
+        lines.append(f"Slow callbacks (>= {self.slow_callback_duration * 1000:.0f} ms): {len(self.slow_callbacks)}")
+        lines.append("\nLoop thread, innermost frames (share of samples):")
+        total = sum(loop_leaves.values()) or 1
+        lines += [f"  {count / total:6.1%}  {leaf}" for leaf, count in loop_leaves.most_common(15)]
+        lines.append("\nTasks, where they are waiting (share of task samples):")
+        total = sum(task_sites.values()) or 1
+        lines += [f"  {count / total:6.1%}  {site}" for site, count in task_sites.most_common(15)]
+        summary = "\n".join(lines)
+
+        with open(os.path.join(self.profile_folder, "summary.txt"), 'w') as file:
+            file.write(summary + "\n")
+        logging.info(f"Profile saved to {self.profile_folder}\n{summary}")
@@ -1,26 +1,124 @@
 # scripts/prompt_generator.py
 
-import random
-from .utils import load_config
-
-def generate_system_prompts(countries, num_samples):
-    system_prompts = []
-    for country in countries:
-        for gender in ["male", "female"]:
-            for _ in range(num_samples):
-                age = random.randint(18, 80)
-                system_prompt = f"You are a {age}-year-old {gender} from {country} participating in an economics experiment."
-                system_prompts.append(system_prompt)
-    return system_prompts
-
-def extract_age_gender_country(system_prompt):
-    import re
-    pattern = r"You are a (\d+)-year-old (\w+) from ([\w\s_]+?) participating in an economics experiment\."
-    match = re.match(pattern, system_prompt)
-    if match:
-        age = int(match.group(1))
-        gender = match.group(2)
-        country = match.group(3).strip().replace('_', ' ')
-        return age, gender, country
-    else:
-        return None, None, None
\ No newline at end of file
+import numpy as np
+import pandas as pd
+from .participant import Participant
+
+# System prompt describing a participant; rendered from the participant's fields when it is sent
+SYSTEM_PROMPT_TEMPLATE = "You are a {age}-year-old {gender} from {country} participating in an economics experiment."
+
+GENDERS = ["male", "female"]
+AGE_RANGE = (18, 80)
+
+# Number of participants generated at a time
+DESIGN_CHUNK_SIZE = 10000
+
+def design_cell_counts(countries, num_samples, quotas=None):
+    """
+    Number of participants per (country, gender) cell of the design.
+
+    Parameters:
+    - countries: List of countries.
+    - num_samples: Participants per country and gender.
+    - quotas: Optional {country: {gender: n}} overriding num_samples for some cells.
+    """
+    quotas = quotas or {}
+    return {
+        (country, gender): quotas.get(country, {}).get(gender, num_samples)
+        for country in countries
+        for gender in GENDERS
+    }
+
+def generate_design(cell_counts, age_range=AGE_RANGE, covariates=None, chunk_size=DESIGN_CHUNK_SIZE, seed=None):
+    """
+    Lazily generate the participants of a stratified design in chunks.
+
+    Each chunk is a DataFrame with one row per participant: 'country' and 'gender'
+    (categoricals), 'age' drawn uniformly from age_range, and one categorical column per
+    covariate. Participants come in cell order (countries, then genders), as in
+    cell_counts; prompts are not rendered here (see render_system_prompt).
+
+    Parameters:
+    - cell_counts: {(country, gender): n} from design_cell_counts.
+    - age_range: Inclusive (min, max) age.
+    - covariates: Optional extra demographic dimensions, {name: {'levels': [...], 'weights': [...]}};
+      levels are drawn independently per participant with the given (or equal) weights.
+    - chunk_size: Participants per chunk.
+    - seed: Seed of the random generator; the same seed and chunk size give the same design.
+    """
+    covariates = covariates or {}
+    cells = [cell for cell, count in cell_counts.items() if count > 0]
+    counts = np.array([cell_counts[cell] for cell in cells], dtype=np.int64)
+    cell_ends = np.cumsum(counts)
+    total = int(cell_ends[-1]) if len(cell_ends) else 0
+
+    country_codes, country_levels = pd.factorize(pd.Series([country for country, _ in cells], dtype=object))
+    gender_codes, gender_levels = pd.factorize(pd.Series([gender for _, gender in cells], dtype=object))
+
+    covariate_probabilities = {}
+    for name, spec in covariates.items():
+        weights = np.asarray(spec.get('weights', np.ones(len(spec['levels']))), dtype=float)
+        covariate_probabilities[name] = weights / weights.sum()
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        cell = np.searchsorted(cell_ends, np.arange(start, stop), side='right')
+        chunk = pd.DataFrame({
+            'country': pd.Categorical.from_codes(country_codes[cell], country_levels),
+            'gender': pd.Categorical.from_codes(gender_codes[cell], gender_levels),
+            'age': rng.integers(age_range[0], age_range[1] + 1, size=stop - start, dtype=np.int16)
+        })
+        for name, spec in covariates.items():
+            codes = rng.choice(len(spec['levels']), size=stop - start, p=covariate_probabilities[name])
+            chunk[name] = pd.Categorical.from_codes(codes, spec['levels'])
+        yield chunk
+
+def iter_participants(chunks, model=None):
+    """
+    Iterate over the participants of design chunks as Participant records, asked to the
+    given API target (model).
+    """
+    for chunk in chunks:
+        covariate_names = [col for col in chunk.columns if col not in ('country', 'gender', 'age')]
+        columns = [chunk[col].tolist() for col in ['country', 'gender', 'age'] + covariate_names]
+        for country, gender, age, *covariates in zip(*columns):
+            yield Participant(country, gender, age, dict(zip(covariate_names, covariates)) if covariate_names else None, model)
+
+def group_cell_counts(cell_counts, group_size):
+    """
+    Number of prompt groups per design cell when each prompt is sampled group_size times
+    (see iter_participant_groups): the cell's participants rounded up to whole groups.
+    """
+    return {cell: -(-count // group_size) for cell, count in cell_counts.items()}
+
+def iter_participant_groups(chunks, cell_counts, group_size, model=None):
+    """
+    Iterate over groups of participants sharing one system prompt, for the sampling mode
+    that asks each prompt once with group_size completions.
+
+    The design chunks hold one row per group (generated from group_cell_counts); each
+    row is fanned out into group_size logical participants with the same fields. The
+    last group of a cell is smaller if the cell's count is not a multiple of group_size.
+
+    Parameters:
+    - chunks: Design chunks from generate_design(group_cell_counts(cell_counts, group_size)).
+    - cell_counts: {(country, gender): n} participants per cell.
+    - group_size: Completions per prompt.
+    - model: API target the participants are asked to.
+    """
+    remaining = dict(cell_counts)
+    for prototype in iter_participants(chunks, model):
+        cell = (prototype.country, prototype.gender)
+        size = min(group_size, remaining[cell])
+        remaining[cell] -= size
+        yield [prototype] + [
+            Participant(prototype.country, prototype.gender, prototype.age, dict(prototype.covariates), prototype.model)
+            for _ in range(size - 1)
+        ]
+
+def render_system_prompt(participant, template=SYSTEM_PROMPT_TEMPLATE):
+    """
+    Render a participant's system prompt from its fields.
+    """
+    return template.format(**participant.fields())
@@ -1,50 +1,14 @@
 # scripts/question_generator.py
 
-import random
-import re
 import logging
+import pandas as pd
 from .utils import load_config
+from .data_loader import QUESTION_COLUMNS
 
 # Load configurations
 config = load_config()
 country_currency_dict = config['country_currency_dict']
 
-import random
-
-def generate_system_prompts(countries, num_samples=50):
-    """
-    Generate system prompts for participants based on country, age, and gender.
-    If the country is 'None', generate two times num_samples of a simplified prompt.
-    """
-    system_prompts = []
-    for country in countries:
-        if country == "None":
-            for _ in range(2 * num_samples):
-                system_prompt = "You are participating in an economics experiment."
-                system_prompts.append(system_prompt)
-        else:
-            for gender in ["male", "female"]:
-                for _ in range(num_samples):
-                    age = random.randint(18, 80)
-                    system_prompt = f"You are a {age}-year-old {gender} from {country} participating in an economics experiment."
-                    system_prompts.append(system_prompt)
-    return system_prompts
-
-def extract_age_gender_country(system_prompt):
-    """
-    Extract age, gender, and country from a system prompt.
-    """
-    pattern = r"You are a (\d+)-year-old (\w+) from ([\w\s\-']+?) participating in an economics experiment\."
-    match = re.match(pattern, system_prompt)
-    if match:
-        age = int(match.group(1))
-        gender = match.group(2)
-        country = match.group(3).strip()
-        return age, gender, country
-    else:
-        logging.warning(f"Could not extract age, gender, country from system prompt: {system_prompt}")
-        return None, None, None
-
 def generate_risk_questions_for_country(country, stakes_df):
     """
     Generate risk-related questions for a specific country based on the stakes data.
@@ -158,4 +122,42 @@ def generate_donation_questions_for_country(country, donation_stakes_df):
         return questions, short_titles
     else:
         logging.warning(f"Stakes not found for country: {country} in donation stakes")
-        return [], []
\ No newline at end of file
+        return [], []
+
+def build_questions_table(
+    countries, stakes_df, time_stakes_df, recip_stakes_df, donation_stakes_df,
+    questions1, short_titles1
+):
+    """
+    Build the question dictionary of a run: one row per distinct question text
+    with its battery, stake and currency. Countries sharing a currency and stakes
+    share the same question rows.
+    """
+    rows = []
+    seen_questions = set()
+
+    def add_questions(questions, short_titles, battery, currency):
+        for question, short_title in zip(questions, short_titles):
+            if question in seen_questions:
+                continue
+            seen_questions.add(question)
+            # Battery short titles are built as "<prefix> <stake>"
+            stake = short_title.split(' ', 1)[1] if battery != "general" else ""
+            rows.append({
+                'Question ID': len(rows) + 1,
+                'Battery': battery,
+                'Stake': stake,
+                'Currency': currency,
+                'Short Title': short_title,
+                'Question': question
+            })
+
+    add_questions(questions1, short_titles1, "general", "")
+    for country in countries:
+        currency = country_currency_dict.get(country, "")
+        add_questions(*generate_risk_questions_for_country(country, stakes_df), "risk", currency)
+        add_questions(*generate_time_questions_for_country(country, time_stakes_df), "time", currency)
+        add_questions(*generate_recip_questions_for_country(country, recip_stakes_df), "recip", currency)
+        add_questions(*generate_donation_questions_for_country(country, donation_stakes_df), "donation", currency)
+
+    return pd.DataFrame(rows, columns=QUESTION_COLUMNS)
@@ -0,0 +1,175 @@
+# scripts/run_monitor.py
+
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+from .online_stats import RunningMoments
+from .answer_parser import PARSE_INVALID, PARSE_AMBIGUOUS, PARSE_ERROR
+from .preference_data import RUN_TITLE_MAPPING
+
+# Live statistics snapshot written to each run folder
+RUN_STATS_FILE = "run_stats.json"
+
+# Staircase items measured by their switch point, and items answered as amounts of a stake
+SWITCH_POINT_ITEMS = {'risk_e', 'patience_e'}
+PERCENT_OF_STAKE_ITEMS = {'recip_perc', 'donate_perc'}
+
+STAKE_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+def measure_name(short_title):
+    """
+    Measure an answer counts towards: the GPS item of its short title (see
+    preference_data.RUN_TITLE_MAPPING), or the short title itself.
+    """
+    return RUN_TITLE_MAPPING.get(re.sub(r'\d+', '', short_title), short_title)
+
+def participant_measures(short_titles, values, parse_statuses):
+    """
+    A participant's value of each measure from its parsed answers, and the number of
+    answers and parse failures per measure.
+
+    Staircase items are the switch point, by the rule of data_processor.process_risk_delay:
+    every "Option 2" answer counts the "Option 1" answers since the previous one (across
+    both staircases, in the order asked), and the item is the mean of these counts, missing
+    if the participant never chose "Option 2". Reciprocation and donation are the mean
+    percentage of the stake; all other items are the answer itself.
+
+    Returns:
+    - tuple: {measure: value}, {measure: answers}, {measure: parse failures}
+    """
+    answers = Counter()
+    failures = Counter()
+    sums = Counter()
+    counts = Counter()
+    option_1_answers = 0
+    for short_title, value, parse_status in zip(short_titles, values, parse_statuses):
+        measure = measure_name(short_title)
+        answers[measure] += 1
+        if parse_status in (PARSE_INVALID, PARSE_AMBIGUOUS, PARSE_ERROR):
+            failures[measure] += 1
+        if value is None or value != value:
+            continue
+        if measure in SWITCH_POINT_ITEMS:
+            if value == 1:
+                option_1_answers += 1
+            elif value == 2:
+                sums[measure] += option_1_answers
+                counts[measure] += 1
+                option_1_answers = 0
+        elif measure in PERCENT_OF_STAKE_ITEMS:
+            stake = STAKE_PATTERN.search(short_title)
+            if stake and float(stake.group(0)) > 0:
+                sums[measure] += value / float(stake.group(0)) * 100
+                counts[measure] += 1
+        else:
+            sums[measure] += value
+            counts[measure] += 1
+    measures = {measure: sums[measure] / counts[measure] for measure in counts}
+    return measures, answers, failures
+
+class RunStatistics:
+    """
+    Online per-model x country x measure statistics of a running survey, updated as each
+    participant is saved: running mean and variance (Welford), number of participants and
+    answers, and the share of answers that could not be parsed. Each update costs the
+    participant's answers only, independent of how many participants came before, and
+    no result file is ever reread.
+
+    The statistics are written to a small JSON snapshot in the run folder at most every
+    `snapshot_interval` seconds (and by snapshot()), so a run can be watched while it goes,
+    together with the telemetry of the run's API targets (see ApiTarget.telemetry).
+    """
+
+    def __init__(self, run_folder, snapshot_interval=30.0, targets=()):
+        self.stats_file = os.path.join(run_folder, RUN_STATS_FILE)
+        self.snapshot_interval = snapshot_interval
+        self.targets = list(targets)
+        self.moments = {}
+        self.answers = Counter()
+        self.failures = Counter()
+        self.participants = Counter()
+        self.last_snapshot = time.monotonic()
+
+    def update(self, participant, answers):
+        """
+        Add a saved participant's answers (an AnswerBuffer).
+        """
+        self.add(participant.model, participant.country, answers.short_titles, answers.values, answers.parse_statuses)
+        if time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+            self.snapshot()
+
+    def add(self, model, country, short_titles, values, parse_statuses):
+        measures, answer_counts, failure_counts = participant_measures(short_titles, values, parse_statuses)
+        self.participants[(model, country)] += 1
+        for measure, value in measures.items():
+            key = (model, country, measure)
+            if key not in self.moments:
+                self.moments[key] = RunningMoments()
+            self.moments[key].add(value)
+        for measure, count in answer_counts.items():
+            self.answers[(model, country, measure)] += count
+        for measure, count in failure_counts.items():
+            self.failures[(model, country, measure)] += count
+
+    def add_results(self, wide_df):
+        """
+        Add the participants of wide results rows with parsed answers (e.g. the completed
+        participants of a resumed run).
+        """
+        if 'Value' not in wide_df.columns:
+            return
+        models = wide_df['Model'] if 'Model' in wide_df.columns else [None] * len(wide_df)
+        wide_df = wide_df.assign(Model=models)
+        for (_, model, country), rows in wide_df.groupby(['Participant ID', 'Model', 'Country'], sort=False, dropna=False):
+            self.add(
+                None if model != model else model, country,
+                rows['Short Title'].astype(str).tolist(), rows['Value'].tolist(), rows['Parse Status'].tolist()
+            )
+
+    def rows(self):
+        """
+        One row per model, country and measure.
+        """
+        rows = []
+        for key in sorted(set(self.answers) | set(self.moments), key=lambda key: tuple(str(part) for part in key)):
+            model, country, measure = key
+            moments = self.moments.get(key, RunningMoments())
+            answers = self.answers.get(key, 0)
+            rows.append({
+                'model': model,
+                'country': country,
+                'measure': measure,
+                'participants': self.participants.get((model, country), 0),
+                'n': moments.count,
+                'mean': moments.mean if moments.count else None,
+                'sd': moments.std if moments.count > 1 else None,
+                'answers': answers,
+                'parse_failures': self.failures.get(key, 0),
+                'parse_failure_rate': self.failures.get(key, 0) / answers if answers else None
+            })
+        return rows
+
+    def snapshot(self):
+        """
+        Write the current statistics to the run folder (atomically, so readers never see
+        a partial file).
+        """
+        snapshot = {
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'participants': sum(self.participants.values()),
+            'targets': {target.name: target.telemetry() for target in self.targets},
+            'statistics': self.rows()
+        }
+        temporary_file = self.stats_file + ".tmp"
+        try:
+            with open(temporary_file, 'w', encoding='utf-8') as file:
+                json.dump(snapshot, file, ensure_ascii=False, indent=1)
+            os.replace(temporary_file, self.stats_file)
+        except OSError as e:
+            logging.error(f"Error writing run statistics to {self.stats_file}: {e}")
+        self.last_snapshot = time.monotonic()
@@ -0,0 +1,142 @@
+# scripts/sequential_sampling.py
+
+import logging
+import math
+import os
+import pandas as pd
+
+from .online_stats import RunningMoments
+from .data_processor import process_participant_results
+from .data_saver import wide_result_rows
+from .preference_data import PREFERENCE_MEASURES, build_run_preferences
+
+# Precision report written to the run folder
+PRECISION_REPORT_FILE = "precision_report.csv"
+
+# Why a cell stopped sampling
+STOPPED_PRECISION = "precision"
+STOPPED_CAP = "cap"
+STOPPED_NO_PARTICIPANTS = "no new participants"
+
+class SequentialSampler:
+    """
+    Adaptive sample sizes per design cell: participants are drawn in waves, the running
+    mean and variance of every GPS preference measure are updated after each wave, and
+    a cell stops once the confidence intervals of all targeted measures are narrower than
+    their targets (after a minimum number of participants) or it reaches the hard cap.
+
+    Cells are (model, country, gender). Measures are the composite preference measures of
+    preference_data, computed from the participants' processed answers.
+
+    Parameters:
+    - ci_widths: {measure: maximum confidence interval width}.
+    - wave_size: Participants drawn per cell and wave.
+    - min_participants: Participants per cell before precision can stop the cell.
+    - max_participants: Hard cap of participants per cell.
+    - confidence: Confidence level of the intervals.
+    """
+
+    def __init__(self, ci_widths, wave_size=10, min_participants=20, max_participants=200, confidence=0.95):
+        unknown = set(ci_widths) - set(PREFERENCE_MEASURES)
+        if unknown:
+            raise ValueError(f"Unknown preference measures in sequential.ci_widths: {sorted(unknown)}")
+        self.ci_widths = ci_widths
+        self.wave_size = wave_size
+        self.min_participants = min_participants
+        self.max_participants = max_participants
+        self.confidence = confidence
+        self.participants = {}
+        self.moments = {}
+        self.stopped = {}
+
+    def cell_moments(self, cell):
+        return self.moments.setdefault(cell, {measure: RunningMoments() for measure in PREFERENCE_MEASURES})
+
+    def add_results(self, cell, wide_df):
+        """
+        Update a cell with the wide results rows of newly completed participants.
+        """
+        if wide_df.empty:
+            return
+        self.participants[cell] = self.participants.get(cell, 0) + wide_df['Participant ID'].nunique()
+        preferences = build_run_preferences(process_participant_results(wide_df.copy()))
+        moments = self.cell_moments(cell)
+        for measure in PREFERENCE_MEASURES:
+            moments[measure].add_batch(preferences[measure].to_numpy(dtype=float))
+
+    def add_wave(self, cell, participants, answers):
+        """
+        Update a cell with a finished wave: its Participant records and their answer
+        buffers (None for participants that were skipped).
+        """
+        rows = [wide_result_rows(participant, buffer) for participant, buffer in zip(participants, answers) if buffer]
+        if rows:
+            self.add_results(cell, pd.concat(rows, ignore_index=True))
+        elif participants:
+            # More waves of a cell that gains no participants would never reach its cap
+            logging.warning(f"No participant of the last wave of {cell} was saved; the cell stops sampling.")
+            self.stopped[cell] = STOPPED_NO_PARTICIPANTS
+
+    def precise(self, cell):
+        moments = self.cell_moments(cell)
+        return all(moments[measure].ci_width(self.confidence) <= width for measure, width in self.ci_widths.items())
+
+    def next_wave_size(self, cell):
+        """
+        Participants to draw next in a cell, or 0 once the cell has stopped.
+        """
+        if cell in self.stopped:
+            return 0
+        participants = self.participants.get(cell, 0)
+        if participants >= self.min_participants and self.precise(cell):
+            self.stopped[cell] = STOPPED_PRECISION
+            return 0
+        if participants >= self.max_participants:
+            self.stopped[cell] = STOPPED_CAP
+            return 0
+        return min(self.wave_size, self.max_participants - participants)
+
+    def report(self):
+        """
+        Achieved precision per cell and measure: participants, mean, standard deviation,
+        confidence interval width and its target.
+        """
+        rows = []
+        for cell in sorted(self.moments):
+            model, country, gender = cell
+            for measure, moments in self.moments[cell].items():
+                rows.append({
+                    'Model': model,
+                    'Country': country,
+                    'Gender': gender,
+                    'Participants': self.participants.get(cell, 0),
+                    'Stopped': self.stopped.get(cell),
+                    'Measure': measure,
+                    'N': moments.count,
+                    'Mean': moments.mean if moments.count else math.nan,
+                    'SD': moments.std if moments.count > 1 else math.nan,
+                    'CI Width': moments.ci_width(self.confidence),
+                    'Target Width': self.ci_widths.get(measure, math.nan)
+                })
+        return pd.DataFrame(rows)
+
+    def save_report(self, run_folder):
+        """
+        Write the precision report to the run folder and log a summary.
+        """
+        report = self.report()
+        report_file = os.path.join(run_folder, PRECISION_REPORT_FILE)
+        report.to_csv(report_file, index=False)
+
+        stopped = pd.Series(self.stopped).value_counts()
+        logging.info(
+            f"Sequential sampling: {sum(self.participants.values())} participants in {len(self.participants)} cells "
+            f"(cap {self.max_participants * len(self.participants)}); "
+            f"{stopped.get(STOPPED_PRECISION, 0)} cells stopped at the target precision, {stopped.get(STOPPED_CAP, 0)} at the cap, "
+            f"{stopped.get(STOPPED_NO_PARTICIPANTS, 0)} without new participants."
+        )
+        targeted = report[report['Measure'].isin(list(self.ci_widths))]
+        if not targeted.empty:
+            summary = targeted.groupby('Measure')[['CI Width', 'Target Width']].median()
+            logging.info(f"Median confidence interval widths:\n{summary.to_string()}")
+        logging.info(f"Precision report saved to {report_file}")
@@ -0,0 +1,333 @@
+# scripts/streaming_ols.py
+
+import logging
+from collections import deque
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Rows read per chunk in streaming mode
+STREAMING_CHUNK_SIZE = 200_000
+
+# Name of the constant column
+CONSTANT = 'const'
+
+class OLSAccumulator:
+    """
+    Sufficient statistics of an OLS regression accumulated over chunks of rows:
+    X'X, X'y, y'y and the number of observations, plus the score moments
+    sum(u_i^2 x_i x_i') of the robust covariance once coefficients are known.
+
+    Categorical regressors are accumulated as full sets of dummies, one per level seen
+    so far. A level first seen in a later chunk adds a column that is zero for all
+    earlier rows, so the statistics grow without revisiting data, and chunks or
+    partial results from different workers merge by aligning columns by name. The
+    reference level (the first in sorted order, as pd.get_dummies(drop_first=True)) is
+    dropped when the regression is solved.
+
+    Memory is O(k^2) in the number of regressors k, independent of the number of rows.
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.levels = {}
+        self.xtx = np.zeros((0, 0))
+        self.xty = np.zeros(0)
+        self.yty = 0.0
+        self.n = 0
+        self.meat = None
+
+    def align(self, columns):
+        """
+        Extend the statistics with columns not seen before (zero for all rows so far).
+        """
+        new_columns = [col for col in columns if col not in self.columns]
+        if new_columns:
+            k = len(self.columns) + len(new_columns)
+            xtx = np.zeros((k, k))
+            xtx[:len(self.columns), :len(self.columns)] = self.xtx
+            self.xtx = xtx
+            self.xty = np.r_[self.xty, np.zeros(len(new_columns))]
+            self.columns = self.columns + new_columns
+        return [self.columns.index(col) for col in columns]
+
+    def add(self, X, y, levels):
+        """
+        Add a chunk: X (DataFrame of regressors, dummies for every level present),
+        y (array) and the levels of each categorical regressor present in the chunk.
+        """
+        index = self.align(list(X.columns))
+        values = X.to_numpy(dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.xtx[np.ix_(index, index)] += values.T @ values
+        self.xty[index] += values.T @ y
+        self.yty += float(y @ y)
+        self.n += len(y)
+        for col, col_levels in levels.items():
+            self.levels.setdefault(col, set()).update(col_levels)
+
+    def merge(self, other):
+        """
+        Add the statistics of another accumulator (e.g. from another worker).
+        """
+        index = self.align(other.columns)
+        self.xtx[np.ix_(index, index)] += other.xtx
+        self.xty[index] += other.xty
+        self.yty += other.yty
+        self.n += other.n
+        for col, col_levels in other.levels.items():
+            self.levels.setdefault(col, set()).update(col_levels)
+        if other.meat is not None:
+            self.add_meat_matrix(other.meat, other.meat_columns)
+
+    def add_meat_matrix(self, meat, columns):
+        if self.meat is None:
+            self.meat_columns = list(columns)
+            self.meat = np.zeros((len(columns), len(columns)))
+        index = [self.meat_columns.index(col) for col in columns]
+        self.meat[np.ix_(index, index)] += meat
+
+    def add_residuals(self, X, y, fit):
+        """
+        Second pass for robust standard errors: add sum(u_i^2 x_i x_i') of a chunk,
+        with the residuals of the solved regression.
+        """
+        values = X.reindex(columns=fit['columns'], fill_value=0).to_numpy(dtype=float)
+        residuals = np.asarray(y, dtype=float) - values @ fit['params']
+        weighted = values * residuals[:, None] ** 2
+        self.add_meat_matrix(weighted.T @ values, fit['columns'])
+
+    def solve(self):
+        """
+        Solve the normal equations for the coefficients, classical standard errors and R².
+
+        Returns:
+        - dict: columns, params, classical covariance, n, k, residual sum of squares,
+          R², adjusted R² and the inverse of X'X (for the robust covariance).
+        """
+        # Drop reference levels and dummies of levels without observations
+        dropped = {f"{col}_{min(col_levels)}" for col, col_levels in self.levels.items() if col_levels}
+        keep = [i for i, col in enumerate(self.columns) if col not in dropped and self.xtx[i, i] > 0]
+        columns = [self.columns[i] for i in keep]
+        xtx = self.xtx[np.ix_(keep, keep)]
+        xty = self.xty[keep]
+
+        n, k = self.n, len(columns)
+        if n <= k:
+            raise ValueError(f"Not enough observations ({n}) for {k} regressors.")
+        xtx_inv = np.linalg.pinv(xtx)
+        params = xtx_inv @ xty
+        ssr = max(self.yty - float(params @ xty), 0.0)
+        df_resid = n - k
+        sigma2 = ssr / df_resid
+
+        # Centered R² needs sum(y), which is X'y of the constant
+        if CONSTANT in self.columns:
+            sum_y = self.xty[self.columns.index(CONSTANT)]
+            tss = self.yty - sum_y ** 2 / n
+            rsquared = 1 - ssr / tss if tss > 0 else np.nan
+            rsquared_adj = 1 - (1 - rsquared) * (n - 1) / df_resid
+        else:
+            rsquared = rsquared_adj = np.nan
+
+        return {
+            'columns': columns,
+            'params': params,
+            'cov': sigma2 * xtx_inv,
+            'xtx_inv': xtx_inv,
+            'n': n,
+            'k': k,
+            'df_resid': df_resid,
+            'ssr': ssr,
+            'rsquared': rsquared,
+            'rsquared_adj': rsquared_adj
+        }
+
+    def robust_covariance(self, fit):
+        """
+        HC1 heteroskedasticity-robust covariance from the second-pass score moments.
+        """
+        index = [self.meat_columns.index(col) for col in fit['columns']]
+        meat = self.meat[np.ix_(index, index)]
+        return fit['n'] / fit['df_resid'] * fit['xtx_inv'] @ meat @ fit['xtx_inv']
+
+def encode_chunk(chunk, setup):
+    """
+    Encode a chunk of rows for a streaming regression: the battery's rows with complete
+    data, the dependent variable and the regressors (constant, numeric columns and one
+    dummy per level of each categorical column, including fixed effects and, if
+    configured, country dummies).
+
+    Returns:
+    - tuple: X (DataFrame), y (array) and {categorical column: levels in the chunk},
+      or None if no rows of the chunk enter the regression.
+    """
+    battery = setup.get('battery', 'Risk')
+    chunk = chunk[chunk['Short Title'].astype(str).str.strip().str.startswith(battery)]
+
+    numeric_cols = [col['name'] for col in setup['x'] if col['type'] == 'numeric']
+    categorical_cols = [col['name'] for col in setup['x'] if col['type'] == 'categorical']
+    for fixed_effect in setup.get('fixed_effects', []):
+        if not isinstance(fixed_effect, str):
+            raise ValueError("Interacted fixed effects are not supported in streaming mode.")
+        if fixed_effect not in categorical_cols:
+            categorical_cols.append(fixed_effect)
+    if setup.get('include_country_dummies', False) and 'Country' not in categorical_cols:
+        categorical_cols.append('Country')
+
+    y = chunk[setup['y']]
+    if not pd.api.types.is_numeric_dtype(y):
+        y = y.where(y.isna(), y.astype(str).str.strip())
+        y = y.map({'No': 0, 'Yes': 1}) if set(y.dropna().unique()) <= {'No', 'Yes'} else pd.to_numeric(y, errors='coerce')
+    numeric = chunk[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    categorical = chunk[categorical_cols].apply(lambda col: col.astype(str).str.strip().where(col.notna()))
+
+    mask = (
+        y.notna() & np.isfinite(y.astype(float)) & np.isfinite(numeric).all(axis=1)
+        & categorical.notna().all(axis=1)
+    )
+    if not mask.any():
+        return None
+
+    parts = [pd.DataFrame({CONSTANT: 1.0}, index=chunk.index[mask]), numeric[mask].astype(float)]
+    levels = {}
+    for col in categorical_cols:
+        dummies = pd.get_dummies(categorical.loc[mask, col], prefix=col, dtype=float)
+        parts.append(dummies)
+        levels[col] = set(categorical.loc[mask, col].unique())
+    return pd.concat(parts, axis=1), y[mask].to_numpy(dtype=float), levels
+
+def accumulate_chunk(chunk, setups):
+    """
+    Accumulate one chunk into a fresh accumulator per regression (None where the chunk
+    has no rows for it). Only uses its arguments, so it can run in a worker process.
+    """
+    accumulators = []
+    for setup in setups:
+        encoded = encode_chunk(chunk, setup)
+        if encoded is None:
+            accumulators.append(None)
+            continue
+        accumulator = OLSAccumulator()
+        accumulator.add(*encoded)
+        accumulators.append(accumulator)
+    return accumulators
+
+def accumulate_residual_chunk(chunk, setups, fits):
+    """
+    Second pass over one chunk: score moments of every solved regression.
+    """
+    accumulators = []
+    for setup, fit in zip(setups, fits):
+        encoded = None if fit is None else encode_chunk(chunk, setup)
+        if encoded is None:
+            accumulators.append(None)
+            continue
+        X, y, _ = encoded
+        accumulator = OLSAccumulator()
+        accumulator.add_residuals(X, y, fit)
+        accumulators.append(accumulator)
+    return accumulators
+
+def map_chunks(function, chunks, args, executor=None, max_pending=8):
+    """
+    Apply function(chunk, *args) to every chunk, in the executor if given. At most
+    max_pending chunks are in flight, so memory stays bounded by the chunk size.
+    Results are returned in chunk order.
+    """
+    if executor is None:
+        for chunk in chunks:
+            yield function(chunk, *args)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(function, chunk, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def merge_partials(totals, partials):
+    for i, partial in enumerate(partials):
+        if partial is None:
+            continue
+        if totals[i] is None:
+            totals[i] = partial
+        else:
+            totals[i].merge(partial)
+
+def streaming_ols(read_chunks, setups, robust=True, executor=None, max_pending=8):
+    """
+    Fit several regressions over data read in chunks, with memory bounded by the
+    number of regressors: one pass accumulates X'X, X'y and y'y for every regression
+    at once, and a second pass (only for robust standard errors) the score moments.
+
+    Parameters:
+    - read_chunks: Function returning a fresh iterator of DataFrame chunks of the input.
+    - setups: Regression configurations (as in regression_configs.yaml).
+    - robust: Compute HC1 robust standard errors (requires the second pass).
+    - executor: Optional process pool; chunks are spread over its workers and the
+      partial statistics merged.
+    - max_pending: Chunks in flight in the executor.
+
+    Returns:
+    - list: Per regression, the fit (see OLSAccumulator.solve, plus 'robust_cov' if
+      robust) or None if it had no data.
+    """
+    totals = [None] * len(setups)
+    for partials in map_chunks(accumulate_chunk, read_chunks(), (setups,), executor, max_pending):
+        merge_partials(totals, partials)
+
+    fits = []
+    for setup, total in zip(setups, totals):
+        fit = None
+        if total is None:
+            logging.error(f"No valid data for regression: {setup['name']}")
+        else:
+            try:
+                fit = total.solve()
+            except ValueError as e:
+                logging.error(f"Error performing regression {setup['name']}: {e}")
+        fits.append(fit)
+
+    if robust and any(fit is not None for fit in fits):
+        meats = [None] * len(setups)
+        for partials in map_chunks(accumulate_residual_chunk, read_chunks(), (setups, fits), executor, max_pending):
+            merge_partials(meats, partials)
+        for fit, meat in zip(fits, meats):
+            if fit is not None and meat is not None:
+                fit['robust_cov'] = meat.robust_covariance(fit)
+    return fits
+
+def coefficient_table(fit):
+    """
+    Coefficients with classical and (if computed) robust standard errors, t statistics
+    and p-values.
+    """
+    table = pd.DataFrame({'coef': fit['params']}, index=fit['columns'])
+    covariances = [('', fit['cov'])]
+    if 'robust_cov' in fit:
+        covariances.append(('robust ', fit['robust_cov']))
+    for prefix, covariance in covariances:
+        se = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        table[f'{prefix}se'] = se
+        table[f'{prefix}t'] = table['coef'] / se
+        table[f'{prefix}P>|t|'] = 2 * stats.t.sf(np.abs(table[f'{prefix}t']), fit['df_resid'])
+    return table
+
+def format_fit(name, y_col, fit):
+    """
+    Text summary of a streaming regression, in place of the statsmodels summary.
+    """
+    lines = [
+        f"Streaming OLS: {name}",
+        f"Dep. variable: {y_col}",
+        f"Observations: {fit['n']}    Regressors: {fit['k']}    Df residuals: {fit['df_resid']}",
+        f"R-squared: {fit['rsquared']:.4f}    Adj. R-squared: {fit['rsquared_adj']:.4f}",
+        f"Residual sum of squares: {fit['ssr']:.6g}",
+        "",
+        coefficient_table(fit).to_string(float_format=lambda value: f"{value:.6g}")
+    ]
+    if 'robust_cov' in fit:
+        lines.append("\nRobust standard errors are heteroskedasticity-robust (HC1).")
+    return "\n".join(lines) + "\n"
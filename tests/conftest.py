@@ -0,0 +1,4 @@
+import os
+
+# Modules load config.yaml and data files relative to the repository root
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
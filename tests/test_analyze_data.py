@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from scripts.analyze_data import compare_f_tests, factorize_design, solve_outcomes
+
+
+def test_shared_design_matches_statsmodels_per_outcome():
+    rng = np.random.default_rng(12)
+    X = sm.add_constant(pd.DataFrame(rng.normal(size=(150, 3)), columns=['a', 'b', 'c']))
+    Y = pd.DataFrame({'patience': X @ [1, 2, 0, 0] + rng.normal(size=150), 'trust': X @ [0, 0, 1, 0.2] + rng.normal(size=150)})
+    full = solve_outcomes(factorize_design(X), Y)
+    restricted = solve_outcomes(factorize_design(X[['const', 'a']]), Y)
+    f_tests = compare_f_tests(full, restricted)
+
+    for outcome in Y.columns:
+        reference = sm.OLS(Y[outcome], X).fit()
+        assert np.allclose(full['tables'][outcome]['coef'], reference.params)
+        assert np.allclose(full['tables'][outcome]['std err'], reference.bse)
+        assert np.isclose(full['r_squared'][outcome], reference.rsquared)
+        f_value, p_value, _ = reference.compare_f_test(sm.OLS(Y[outcome], X[['const', 'a']]).fit())
+        assert np.isclose(f_tests.loc[outcome, 'F'], f_value) and np.isclose(f_tests.loc[outcome, 'p-value'], p_value)
+
+
+def test_redundant_columns_are_not_estimated():
+    rng = np.random.default_rng(13)
+    X = sm.add_constant(pd.DataFrame({'a': rng.normal(size=50)}))
+    X['a_again'] = X['a']
+    y = pd.DataFrame({'y': X['a'] + rng.normal(size=50)})
+    fit = solve_outcomes(factorize_design(X), y)
+    table = fit['tables']['y']
+    assert table['coef'].isna().sum() == 1
+    reference = sm.OLS(y['y'], X[['const', 'a']]).fit()
+    assert np.isclose(table['coef'][['a', 'a_again']].dropna().item(), reference.params['a'])
+    assert fit['df_resid'] == reference.df_resid
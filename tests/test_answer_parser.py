@@ -0,0 +1,33 @@
+import pytest
+
+from scripts.answer_parser import (
+    CHOICE_ANSWER, NUMBER_ANSWER, PARSE_OK, PARSE_EXTRACTED, PARSE_INVALID, PARSE_AMBIGUOUS, PARSE_ERROR,
+    parse_answer
+)
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ('{"answer": "Option 2"}', (2.0, PARSE_OK)),
+    ('I would take Option 1.', (1.0, PARSE_EXTRACTED)),
+    ('Option 1, definitely Option 1', (1.0, PARSE_EXTRACTED)),
+    ('not Option 1 but Option 2', (None, PARSE_AMBIGUOUS)),
+    ('The sure payment', (None, PARSE_INVALID)),
+])
+def test_parse_choice(answer, expected):
+    assert parse_answer(answer, CHOICE_ANSWER) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ('{"answer": 7}', (7.0, PARSE_OK)),
+    ('{"answer": true}', (None, PARSE_INVALID)),
+    ('I would donate 1,600 dollars', (1600.0, PARSE_EXTRACTED)),
+    ('1,234,567.5', (1234567.5, PARSE_EXTRACTED)),
+    ('10,20', (10.0, PARSE_EXTRACTED)),
+    ('between 5,10', (5.0, PARSE_EXTRACTED)),
+    ('1,6000', (1.0, PARSE_EXTRACTED)),
+    ('-3.5', (-3.5, PARSE_EXTRACTED)),
+    ('no idea', (None, PARSE_INVALID)),
+    ('API request failed: Internal server error', (None, PARSE_ERROR)),
+])
+def test_parse_number(answer, expected):
+    assert parse_answer(answer, NUMBER_ANSWER) == expected
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from scripts.api_client import (HedgePolicy, REQUEST_PROFILES, STRUCTURED_REQUEST_PROFILES, load_targets,
+                                resolve_request_profiles)
+from scripts.dispatcher import RequestDispatcher
+
+
+def warmed_up_policy(delay=0.01):
+    policy = HedgePolicy(max_hedge_rate=1.0, min_samples=1)
+    policy.delay = delay
+    policy.completions = 100
+    return policy
+
+
+def responses(*responses):
+    """
+    A request function returning the given (delay, completions) pairs in turn.
+    """
+    calls = iter(responses)
+    started = []
+
+    async def request():
+        delay, completions = next(calls)
+        started.append(delay)
+        await asyncio.sleep(delay)
+        return completions
+    return request, started
+
+
+def test_slow_request_is_hedged_in_its_own_dispatcher_slot():
+    async def run():
+        policy = warmed_up_policy()
+        dispatcher = RequestDispatcher(2)
+        request, started = responses((1.0, ["slow"]), (0.1, ["fast"]))
+        async with dispatcher.slot('Germany'):
+            task = asyncio.ensure_future(policy.run(request, dispatcher))
+            await asyncio.sleep(0.05)
+            assert dispatcher.active == 2
+            result = await task
+        assert result == ["fast"]
+        assert dispatcher.active == 0
+        assert policy.hedges == 1 and policy.hedge_wins == 1
+    asyncio.run(run())
+
+
+def test_no_hedge_without_a_free_dispatcher_slot():
+    async def run():
+        policy = warmed_up_policy()
+        dispatcher = RequestDispatcher(1)
+        request, started = responses((0.05, ["slow"]), (0.0, ["fast"]))
+        async with dispatcher.slot('Germany'):
+            assert await policy.run(request, dispatcher) == ["slow"]
+        assert started == [0.05]
+        assert policy.hedges == 0
+    asyncio.run(run())
+
+
+def test_failed_first_response_waits_for_the_other_request():
+    async def run():
+        policy = warmed_up_policy()
+        request, _ = responses((0.1, ["5"]), (0.0, ["API request failed: server error"]))
+        assert await policy.run(request) == ["5"]
+        assert policy.hedge_wins == 0
+    asyncio.run(run())
+
+
+def test_hedged_completions_are_capped():
+    async def run():
+        policy = warmed_up_policy()
+        policy.max_hedge_rate = 0.05
+        request, started = responses((0.05, ["a"] * 10))
+        # 10 hedged completions would exceed 5% of the 110 completions asked
+        assert await policy.run(request, n=10) == ["a"] * 10
+        assert policy.hedges == 0
+    asyncio.run(run())
+
+
+def targets_config(**target):
+    return {
+        'api': {'model': 'gpt-4o-mini', 'url': 'https://api.example/v1', 'key': 'secret'},
+        'settings': {'semaphore_limit': 4},
+        'targets': [{'model': 'gpt-4o-mini', **target}]
+    }
+
+
+def test_request_profiles_are_opt_in():
+    assert resolve_request_profiles(None) == {}
+    assert resolve_request_profiles('structured') == STRUCTURED_REQUEST_PROFILES
+    profiles = resolve_request_profiles({'choice': 'structured', 'number': {'max_tokens': 8}})
+    assert profiles == {'choice': STRUCTURED_REQUEST_PROFILES['choice'], 'number': {'max_tokens': 8}}
+
+
+def test_shipped_config_bounds_every_answer():
+    assert set(REQUEST_PROFILES) == {'choice', 'number'}
+    assert all(profile['max_tokens'] <= 12 for profile in REQUEST_PROFILES.values())
+    assert REQUEST_PROFILES['number']['stop'] == ["\n"]
+
+
+def test_target_request_profiles_replace_the_top_level_ones():
+    config = targets_config(request_profiles=None)
+    config['request_profiles'] = 'structured'
+    assert load_targets(config)[0].request_profiles == {}
+    assert load_targets(targets_config())[0].request_profiles == {}
+
+
+def test_missing_key_env_names_the_target_and_variable(monkeypatch):
+    monkeypatch.delenv('TEST_TARGET_KEY', raising=False)
+    with pytest.raises(ValueError, match="mini.*TEST_TARGET_KEY"):
+        load_targets(targets_config(name='mini', key_env='TEST_TARGET_KEY'))
+    monkeypatch.setenv('TEST_TARGET_KEY', 'from-env')
+    assert load_targets(targets_config(name='mini', key_env='TEST_TARGET_KEY'))[0].key == 'from-env'
@@ -0,0 +1,24 @@
+import os
+
+import pandas as pd
+
+from scripts.benchmark_loader import load_benchmark
+
+
+def test_cache_is_built_once_and_rebuilt_when_the_file_changes(tmp_path):
+    stata_file = tmp_path / "individual.dta"
+    pd.DataFrame({'country': ['Chile', 'Kenya', 'Chile'], 'patience': [0.1, 0.2, 0.3], 'isocode': ['CHL', 'KEN', 'CHL']}).to_stata(stata_file, write_index=False)
+    cache_dir = tmp_path / "cache"
+
+    benchmark = load_benchmark(stata_file, columns=['country', 'patience', 'trust'], countries=['Chile'], cache_dir=cache_dir)
+    assert benchmark.to_dict('list') == {'country': ['Chile', 'Chile'], 'patience': [0.1, 0.3]}
+    caches = list(cache_dir.glob("*.feather"))
+    assert len(caches) == 1
+
+    modified = os.stat(caches[0]).st_mtime_ns
+    load_benchmark(stata_file, cache_dir=cache_dir)
+    assert os.stat(caches[0]).st_mtime_ns == modified
+
+    pd.DataFrame({'country': ['Peru'], 'patience': [1.0]}).to_stata(stata_file, write_index=False)
+    assert load_benchmark(stata_file, cache_dir=cache_dir)['country'].tolist() == ['Peru']
+    assert len(list(cache_dir.glob("*.feather"))) == 2
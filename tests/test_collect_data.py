@@ -0,0 +1,39 @@
+import pandas as pd
+import yaml
+
+from scripts.collect_data import RunCatalog
+
+
+def write_results(folder, participant_ids):
+    folder.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        'Participant ID': participant_ids, 'Question': 'Q?', 'Answer': 'A', 'Short Title': 'Risk 10',
+        'Age': 30, 'Gender': 'male', 'Country': 'Chile'
+    }).to_csv(folder / "results_Chile.csv", index=False)
+
+
+def test_catalog_indexes_runs_once_and_loads_them(tmp_path):
+    run = tmp_path / "gps_run_20260101_120000"
+    write_results(run / "gps", [1, 1, 2, 2])
+    write_results(run / "gps_proc", [1, 1])
+    (run / "run_config.yaml").write_text(yaml.safe_dump({'targets': [{'name': 'small', 'model': 'm1'}, {'model': 'm2'}]}))
+
+    catalog = RunCatalog(tmp_path)
+    try:
+        assert catalog.update() == 1
+        assert catalog.update() == 0
+        runs = catalog.list_runs(model='m2')
+        assert runs[['run_name', 'model', 'status', 'participants', 'answers']].values.tolist() == [
+            [run.name, 'small, m2', 'partial', 2, 4]
+        ]
+        assert catalog.list_runs(model='m1').empty
+        assert catalog.config_snapshot(run.name)['targets'][1]['model'] == 'm2'
+
+        data = catalog.load_runs(columns=['Participant ID', 'Country']).to_pandas()
+        assert data['Run'].unique().tolist() == [run.name] and len(data) == 2
+
+        write_results(run / "gps_proc", [1, 1, 2, 2])
+        assert catalog.update() == 1
+        assert catalog.list_runs(status='processed')['run_name'].tolist() == [run.name]
+    finally:
+        catalog.close()
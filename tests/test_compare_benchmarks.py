@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from scripts.compare_benchmarks import compare_distributions
+
+
+def test_distances_match_scipy():
+    rng = np.random.default_rng(9)
+    run = pd.DataFrame({
+        'country': ['AR'] * 40 + ['DE'] * 25,
+        'risktaking': np.r_[rng.integers(0, 5, 40), rng.normal(1, 2, 25)],
+        'patience': np.r_[rng.normal(size=40), [np.nan] * 25]
+    })
+    benchmark = pd.DataFrame({
+        'country': ['AR'] * 60 + ['DE'] * 30,
+        'risktaking': np.r_[rng.integers(0, 5, 60), rng.normal(0, 1, 30)],
+        'patience': rng.normal(0.5, 1, 90)
+    })
+    comparison = compare_distributions(run, benchmark, ['risktaking', 'patience']).set_index(['country', 'measure'])
+
+    for (country, measure), row in comparison.iterrows():
+        a = run.loc[run['country'] == country, measure].dropna()
+        b = benchmark.loc[benchmark['country'] == country, measure].dropna()
+        assert row['n_run'] == len(a) and row['n_benchmark'] == len(b)
+        if a.empty:
+            assert np.isnan(row['ks']) and np.isnan(row['wasserstein'])
+            continue
+        assert np.isclose(row['mean_run'], a.mean()) and np.isclose(row['sd_benchmark'], b.std())
+        assert np.isclose(row['ks'], stats.ks_2samp(a, b).statistic)
+        assert np.isclose(row['wasserstein'], stats.wasserstein_distance(a, b))
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from scripts.concat_and_clean import GPSDataConcatenator
+
+
+def results(rows):
+    return pd.DataFrame(rows, columns=['Participant ID', 'Short Title', 'Question', 'Answer'])
+
+
+def test_basic_cleaning_drops_exact_duplicates_only():
+    concatenator = GPSDataConcatenator(None, None)
+    df = results([
+        ('p1', 'Donate', 'How much?', 10.0),
+        ('p1', 'Donate', 'How much?', 10.0),
+        ('p1', 'Risk 10', 'Option?', 1.0),
+    ])
+    assert len(concatenator.basic_cleaning(df)) == 2
+
+
+def test_basic_cleaning_keeps_and_counts_answers_to_repeated_questions(caplog):
+    concatenator = GPSDataConcatenator(None, None)
+    df = results([
+        ('p1', 'Reciprocation 10', 'How much?', 5.0),
+        ('p1', 'Reciprocation 10', 'How much?', 8.0),
+        ('p2', 'Reciprocation 10', 'How much?', 5.0),
+    ])
+    cleaned = concatenator.basic_cleaning(df)
+    assert len(cleaned) == 3
+    assert [record.levelname for record in caplog.records if 'repeat' in record.message] == ['WARNING']
+    assert "2 rows repeat a participant's question" in caplog.text
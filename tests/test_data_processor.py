@@ -0,0 +1,21 @@
+import pandas as pd
+
+from scripts.data_processor import process_participant_results
+
+
+def raw_rows(participant_id, risk_answers, reciprocation):
+    rows = [{'Short Title': f"Risk {i}", 'Question': f"Lottery {i}?", 'Answer': answer} for i, answer in enumerate(risk_answers)]
+    rows.append({'Short Title': "Reciprocation 20", 'Question': "How much of your 20 euros do you give back?", 'Answer': reciprocation})
+    return pd.DataFrame(rows).assign(**{'Participant ID': participant_id})
+
+
+def test_processing_per_participant_matches_the_whole_file():
+    participants = [
+        raw_rows(1, ["Option 1", "Option 1", "Option 2"], "I give back 5"),
+        raw_rows(2, ["Option 2"], "10 euros"),
+    ]
+    whole = process_participant_results(pd.concat(participants, ignore_index=True))
+    one_by_one = pd.concat([process_participant_results(df) for df in participants], ignore_index=True)
+
+    pd.testing.assert_frame_equal(whole.reset_index(drop=True), one_by_one, check_dtype=False)
+    assert whole['Answer'].astype(float).tolist() == [2, 25.0, 0, 50.0]
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from scripts.data_saver import append_table_rows
+
+
+def test_append_table_rows_writes_header_once(tmp_path):
+    table_file = str(tmp_path / "participants.csv")
+    append_table_rows(pd.DataFrame({'A': [1], 'B': [2]}), table_file)
+    append_table_rows(pd.DataFrame({'A': [3], 'B': [4]}), table_file)
+    assert pd.read_csv(table_file).to_dict('list') == {'A': [1, 3], 'B': [2, 4]}
+
+
+def test_append_table_rows_aligns_rows_to_an_older_header(tmp_path, caplog):
+    table_file = tmp_path / "participants.csv"
+    table_file.write_text("A,B,C\n1,2,3\n")
+    append_table_rows(pd.DataFrame({'B': [5], 'A': [4], 'Model': ['m']}), str(table_file))
+    table = pd.read_csv(table_file)
+    assert list(table.columns) == ['A', 'B', 'C']
+    assert table.iloc[1].tolist()[:2] == [4, 5]
+    assert pd.isna(table.iloc[1]['C'])
+    assert "['Model']" in caplog.text
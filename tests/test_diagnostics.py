@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from statsmodels.stats.outliers_influence import variance_inflation_factor
+
+from scripts.diagnostics import variance_inflation_factors
+
+
+def test_vif_matches_statsmodels():
+    rng = np.random.default_rng(5)
+    a = rng.normal(size=200)
+    X = pd.DataFrame({'a': a, 'b': a + rng.normal(size=200) * 0.5, 'c': rng.normal(size=200)})
+    design = sm.add_constant(X).to_numpy()
+    reference = [variance_inflation_factor(design, i) for i in range(1, design.shape[1])]
+    assert np.allclose(variance_inflation_factors(X)['VIF'], reference)
+
+
+def test_constant_and_collinear_columns():
+    rng = np.random.default_rng(6)
+    a, b = rng.normal(size=(2, 100))
+    X = pd.DataFrame({'a': a, 'b': b, 'sum': a + b, 'constant': 1.0, 'free': rng.normal(size=100)})
+    vif = variance_inflation_factors(X).set_index('feature')['VIF']
+    assert np.isinf(vif[['a', 'b', 'sum']]).all()
+    assert np.isnan(vif['constant'])
+    assert np.isfinite(vif['free'])
@@ -0,0 +1,83 @@
+import asyncio
+
+from scripts.dispatcher import AdaptiveDispatcher, RequestDispatcher
+
+
+async def serve_order(dispatcher, requests):
+    """
+    Queue (name, country, progress) requests behind a held slot and return the order
+    in which they are served once it is released.
+    """
+    order = []
+
+    async def request(name, country, progress):
+        async with dispatcher.slot(country, progress):
+            order.append(name)
+
+    await dispatcher.acquire('held')
+    tasks = []
+    for name, country, progress in requests:
+        tasks.append(asyncio.create_task(request(name, country, progress)))
+        await asyncio.sleep(0)
+    assert dispatcher.waiting == len(requests)
+    dispatcher.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_furthest_along_participant_first_and_countries_take_turns():
+    requests = [('us-1', 'US', 1), ('us-9', 'US', 9), ('us-5', 'US', 5), ('de-2', 'DE', 2)]
+    order = asyncio.run(serve_order(RequestDispatcher(1), requests))
+    assert order == ['us-9', 'de-2', 'us-5', 'us-1']
+
+
+def test_starved_request_is_served_first():
+    requests = [('old', 'US', 0), ('new', 'US', 9)]
+    order = asyncio.run(serve_order(RequestDispatcher(1, starvation_timeout=0), requests))
+    assert order == ['old', 'new']
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        dispatcher = RequestDispatcher(1)
+        await dispatcher.acquire('US')
+        waiter = asyncio.create_task(dispatcher.acquire('US'))
+        await asyncio.sleep(0)
+        assert dispatcher.waiting == 1
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert dispatcher.waiting == 0
+        dispatcher.release()
+        assert dispatcher.active == 0
+        assert dispatcher.try_acquire()
+
+    asyncio.run(run())
+
+
+def test_limit_grows_only_while_requests_wait_and_halves_on_overload():
+    async def run():
+        dispatcher = AdaptiveDispatcher(2, max_limit=4)
+        started = asyncio.get_running_loop().time()
+        for _ in range(4):
+            dispatcher.record_response(started, 1.0)
+        assert dispatcher.limit == 2
+
+        for _ in range(2):
+            await dispatcher.acquire('US')
+        waiter = asyncio.create_task(dispatcher.acquire('US'))
+        await asyncio.sleep(0)
+        started = asyncio.get_running_loop().time()
+        dispatcher.record_response(started, 1.0)
+        dispatcher.record_response(started, 1.0)
+        await asyncio.sleep(0)
+        assert dispatcher.limit == 3
+        assert waiter.done() and dispatcher.active == 3
+
+        # Overload reported by requests sent before the last change is ignored
+        dispatcher.record_overload(started - 1, '429')
+        assert dispatcher.limit == 3
+        dispatcher.record_overload(asyncio.get_running_loop().time(), '429')
+        assert dispatcher.limit == 1
+        assert dispatcher.telemetry()['limit_decreases'] == {'429': 1}
+
+    asyncio.run(run())
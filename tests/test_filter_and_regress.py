@@ -0,0 +1,111 @@
+import re
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+import yaml
+
+from scripts.filter_and_regress import GPSDataRegressor, absorb_fixed_effects, fixed_effects_r_squared
+from scripts.inference import bootstrap_ols
+
+
+def panel(n=300, groups=6, seed=1):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, groups, n)
+    x = rng.normal(size=n) + codes * 0.3
+    y = 1.5 * x + codes * 2.0 + rng.normal(size=n)
+    return pd.Series(y, name='y'), pd.DataFrame({'x': x}), codes
+
+
+def dummy_regression(y, X, codes):
+    dummies = pd.get_dummies(codes, prefix='g', drop_first=True).astype(float)
+    return sm.OLS(y, sm.add_constant(pd.concat([X, dummies.set_index(X.index)], axis=1))).fit()
+
+
+def test_absorbed_fixed_effects_match_the_dummy_regression():
+    y, X, codes = panel()
+    y_within, X_within, absorbed_params = absorb_fixed_effects(y, X, [codes])
+    model = sm.OLS(y_within, X_within)
+    model.df_resid -= absorbed_params
+    fit = model.fit()
+    dummies = dummy_regression(y, X, codes)
+
+    assert np.isclose(fit.params['x'], dummies.params['x'])
+    assert np.isclose(fit.bse['x'], dummies.bse['x'])
+    r_squared = fixed_effects_r_squared(y, y_within, fit.resid, fit.df_resid)
+    assert np.isclose(r_squared['Overall R-squared'], dummies.rsquared)
+    assert np.isclose(r_squared['Adj. overall R-squared'], dummies.rsquared_adj)
+    within_fit = sm.OLS(y_within, X_within).fit()
+    assert np.isclose(r_squared['Within R-squared'], within_fit.rsquared)
+
+
+def test_bootstrap_absorbs_fixed_effects_in_each_replicate():
+    y, X, codes = panel()
+    replicates = bootstrap_ols(X, y, replicates=200, seed=3, fe_codes=[codes])
+    dummies = dummy_regression(y, X, codes)
+    # Replicates centre on the fixed-effects estimate with about its standard error
+    assert abs(replicates[:, 0].mean() - dummies.params['x']) < 0.5 * dummies.bse['x']
+    assert 0.7 < replicates[:, 0].std() / dummies.bse['x'] < 1.3
+
+
+def test_filter_battery_cache_follows_the_dataframe(tmp_path):
+    regressor = GPSDataRegressor(tmp_path / "in.csv", tmp_path / "none.yaml", tmp_path)
+    first = pd.DataFrame({'Short Title': ['Risk 10', 'Delay 103.0']})
+    second = pd.DataFrame({'Short Title': ['Risk 20', 'Risk 30']})
+    assert len(regressor.filter_battery(first, 'Risk')) == 1
+    assert len(regressor.filter_battery(second, 'Risk')) == 2
+
+
+def test_pooled_fits_match_in_process_fits(tmp_path):
+    rng = np.random.default_rng(8)
+    n = 400
+    pd.DataFrame({
+        'Participant ID': np.repeat(np.arange(n // 4), 4),
+        'Short Title': rng.choice(['Risk 1', 'Risk 2', 'Delay 1'], n),
+        'Answer': rng.integers(0, 5, n),
+        'Age': np.repeat(rng.integers(18, 80, n // 4), 4),
+        'Gender': np.repeat(rng.choice([' male', 'female '], n // 4), 4),
+        'Country': np.repeat(rng.choice(['Chile', 'Kenya', 'Peru'], n // 4), 4)
+    }).to_csv(tmp_path / "input.csv", index=False)
+    x = [{'name': 'Age', 'type': 'numeric'}, {'name': 'Gender', 'type': 'categorical'}]
+    (tmp_path / "regressions.yaml").write_text(yaml.safe_dump({'regressions': [
+        {'name': 'risk dummies', 'battery': 'Risk', 'y': 'Answer', 'x': x, 'include_country_dummies': True},
+        {'name': 'risk absorbed', 'battery': 'Risk', 'y': 'Answer', 'x': x, 'fixed_effects': ['Country'],
+         'cluster': 'Participant ID', 'bootstrap': {'replicates': 50, 'seed': 1}},
+        {'name': 'delay', 'battery': 'Delay', 'y': 'Answer', 'x': x}
+    ]}))
+
+    summaries = []
+    for workers in (1, 2):
+        results = tmp_path / f"results_{workers}"
+        results.mkdir()
+        GPSDataRegressor(tmp_path / "input.csv", tmp_path / "regressions.yaml", results, workers=workers).run()
+        # The statsmodels summary stamps the date and time of the fit
+        summaries.append({file.name: re.sub(r"(Date|Time):\s+[^\n]*?(\s{2,}|\n)", "", file.read_text())
+                          for file in sorted(results.glob("*_results.txt"))})
+    assert len(summaries[0]) == 3
+    assert summaries[0] == summaries[1]
+
+
+def test_reference_category_only_in_dropped_rows(tmp_path):
+    rng = np.random.default_rng(10)
+    n = 120
+    df = pd.DataFrame({
+        'Short Title': 'Risk 1',
+        'Answer': rng.normal(size=n),
+        'Age': rng.integers(18, 80, n).astype(float),
+        'Gender': rng.choice(['female', 'male'], n),
+        'Country': rng.choice(['Chile', 'Kenya', 'Peru'], n)
+    })
+    # 'Chile', the reference country of the battery, has no complete rows
+    df.loc[df['Country'] == 'Chile', 'Age'] = np.nan
+    regressor = GPSDataRegressor(tmp_path / "in.csv", tmp_path / "none.yaml", tmp_path)
+    setup = {'name': 'risk', 'y': 'Answer', 'x': [{'name': 'Age', 'type': 'numeric'}, {'name': 'Gender', 'type': 'categorical'}],
+             'include_country_dummies': True, 'save_processed_data': False}
+    job = regressor.prepare_regression(regressor.filter_battery(df, 'Risk'), 'Risk', setup)
+
+    assert list(job['X'].columns) == ['Age', 'Gender_male', 'Country_Peru']
+    complete = df.dropna()
+    reference = sm.OLS(complete['Answer'], sm.add_constant(pd.get_dummies(complete[['Age', 'Gender', 'Country']], drop_first=True, dtype=float))).fit()
+    fit = sm.OLS(job['y'], sm.add_constant(job['X'])).fit()
+    assert np.allclose(fit.params.to_numpy(), reference.params.to_numpy())
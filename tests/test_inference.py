@@ -0,0 +1,36 @@
+import numpy as np
+import statsmodels.api as sm
+
+from scripts.inference import BOOTSTRAP_BATCH_SIZE, bootstrap_ols, cluster_robust_covariance
+
+
+def clustered_data(n=240, clusters=30, seed=4):
+    rng = np.random.default_rng(seed)
+    groups = rng.integers(0, clusters, n)
+    X = sm.add_constant(rng.normal(size=(n, 2)) + rng.normal(size=(clusters, 1))[groups])
+    y = X @ np.array([1.0, 0.5, -0.3]) + rng.normal(size=clusters)[groups] + rng.normal(size=n)
+    return X, y, groups
+
+
+def test_cluster_robust_covariance_matches_statsmodels():
+    X, y, groups = clustered_data()
+    fit = sm.OLS(y, X).fit()
+    reference = sm.OLS(y, X).fit(cov_type='cluster', cov_kwds={'groups': groups})
+    assert np.allclose(cluster_robust_covariance(X, fit.resid, groups), reference.cov_params())
+
+
+def test_cluster_robust_covariance_accepts_string_labels():
+    X, y, groups = clustered_data()
+    residuals = sm.OLS(y, X).fit().resid
+    labels = np.array([f"participant-{group}" for group in groups], dtype=object)
+    assert np.allclose(cluster_robust_covariance(X, residuals, labels), cluster_robust_covariance(X, residuals, groups))
+
+
+def test_bootstrap_is_reproducible_across_workers():
+    X, y, groups = clustered_data()
+    # Several batches, so that two workers share them
+    replicates = 2 * BOOTSTRAP_BATCH_SIZE + 50
+    single = bootstrap_ols(X, y, groups, replicates=replicates, seed=7)
+    assert np.allclose(single, bootstrap_ols(X, y, groups, replicates=replicates, seed=7))
+    assert np.allclose(single, bootstrap_ols(X, y, groups, replicates=replicates, seed=7, workers=2))
+    assert not np.allclose(single, bootstrap_ols(X, y, groups, replicates=replicates, seed=8))
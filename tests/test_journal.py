@@ -0,0 +1,68 @@
+import json
+
+from scripts.journal import AnswerJournal
+
+
+def test_replay_returns_in_flight_participants_with_their_answers(tmp_path):
+    journal = AnswerJournal(tmp_path)
+    journal.start_participant("p1", "h1", {'country': 'Germany', 'gender': 'female', 'age': 30}, "model-a")
+    journal.record_answer("p1", "Q1", "5")
+    journal.start_participant("p2", "h2", {'country': 'Japan', 'gender': 'male', 'age': 40})
+    journal.record_answer("p2", "Q1", "7")
+    journal.complete_participant("p2")
+    journal.record_answer("p1", "Q2", "Option 1")
+    journal.close()
+
+    pending = AnswerJournal.replay(journal.journal_file)
+    assert list(pending) == ["p1"]
+    assert pending["p1"]['hash'] == "h1"
+    assert pending["p1"]['model'] == "model-a"
+    assert pending["p1"]['answers'] == [("Q1", "5"), ("Q2", "Option 1")]
+
+
+def test_participants_with_the_same_prompt_keep_their_own_answers(tmp_path):
+    journal = AnswerJournal(tmp_path)
+    fields = {'country': 'Germany', 'gender': 'female', 'age': 30}
+    journal.start_participant("p1", "same", fields)
+    journal.start_participant("p2", "same", fields)
+    journal.record_answer("p1", "Q1", "5")
+    journal.record_answer("p2", "Q1", "8")
+    journal.complete_participant("p1")
+    journal.close()
+
+    resumed = AnswerJournal(tmp_path)
+    assert list(resumed.pending) == ["p2"]
+    assert resumed.claim("p2")['answers'] == [("Q1", "8")]
+    # Each in-flight participant is resumed once
+    assert resumed.claim("p2") is None
+    resumed.close()
+    resumed.close()
+
+
+def test_replay_skips_failed_requests_and_a_cut_off_last_line(tmp_path):
+    journal = AnswerJournal(tmp_path)
+    journal.start_participant("p1", "h1", {'country': 'Germany', 'gender': 'female', 'age': 30})
+    journal.record_answer("p1", "Q1", "5")
+    # Written by journals before failed requests were left out
+    journal.record_answer("p1", "Q2", "API request failed: Internal server error")
+    journal.close()
+    with open(journal.journal_file, 'a', encoding='utf-8') as file:
+        file.write('{"event": "answer", "participant_id": "p1", "quest')
+
+    pending = AnswerJournal(tmp_path).pending
+    assert pending["p1"]['answers'] == [("Q1", "5")]
+
+
+def test_replay_reads_journals_keyed_by_hash(tmp_path):
+    events = [
+        {'event': 'start', 'hash': 'h1', 'participant_id': 'p1', 'participant': {'age': 30}, 'model': None},
+        {'event': 'answer', 'hash': 'h1', 'question': 'Q1', 'answer': '5'},
+        {'event': 'start', 'hash': 'h2', 'participant_id': 'p2', 'participant': {'age': 40}, 'model': None},
+        {'event': 'complete', 'hash': 'h2'},
+    ]
+    journal_file = tmp_path / "journal.jsonl"
+    journal_file.write_text("".join(json.dumps(event) + "\n" for event in events))
+
+    pending = AnswerJournal.replay(str(journal_file))
+    assert list(pending) == ["p1"]
+    assert pending["p1"]['answers'] == [("Q1", "5")]
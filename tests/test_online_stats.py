@@ -0,0 +1,31 @@
+import math
+
+import numpy as np
+from scipy import stats
+
+from scripts.online_stats import RunningMoments
+
+
+def test_stream_batches_and_merges_agree_with_numpy():
+    values = np.random.default_rng(11).normal(1e6, 3, 500)
+    one_by_one = RunningMoments()
+    for value in values:
+        one_by_one.add(value)
+    batched, other = RunningMoments(), RunningMoments()
+    batched.add_batch(values[:123])
+    other.add_batch(np.r_[values[123:], np.nan])
+    batched.merge(other)
+
+    for moments in (one_by_one, batched, RunningMoments.from_dict(batched.to_dict())):
+        assert moments.count == len(values)
+        assert math.isclose(moments.mean, values.mean())
+        assert math.isclose(moments.variance, values.var(ddof=1), rel_tol=1e-9)
+
+
+def test_ci_width():
+    values = np.arange(10.0)
+    moments = RunningMoments()
+    moments.add_batch(values)
+    low, high = stats.t.interval(0.95, len(values) - 1, loc=values.mean(), scale=stats.sem(values))
+    assert math.isclose(moments.ci_width(), high - low)
+    assert RunningMoments(1, 2.0).ci_width() == math.inf
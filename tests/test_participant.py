@@ -0,0 +1,20 @@
+from scripts.data_saver import wide_result_rows
+from scripts.participant import AnswerBuffer, Participant
+
+
+def test_participant_round_trips_its_fields():
+    participant = Participant('Chile', 'male', 34, {'region': 'north'}, model='m')
+    assert Participant.from_fields(participant.fields()).fields() == {'country': 'Chile', 'gender': 'male', 'age': 34, 'region': 'north'}
+
+
+def test_answer_buffer_becomes_one_row_per_answer():
+    participant = Participant('Chile', 'female', 51, model='m')
+    participant.participant_id, participant.participant_hash = 7, 'abc'
+    answers = AnswerBuffer()
+    answers.append(1, 'Q1?', 'Risk 10', 'A', 'A', 'ok')
+    answers.append(2, 'Q2?', 'Delay 103.0', 'about 50', 50.0, 'extracted')
+
+    rows = wide_result_rows(participant, answers)
+    assert len(answers) == len(rows) == 2
+    assert rows['Participant ID'].tolist() == [7, 7] and rows['Country'].tolist() == ['Chile', 'Chile']
+    assert rows[['Short Title', 'Value', 'Parse Status']].values.tolist() == [['Risk 10', 'A', 'ok'], ['Delay 103.0', 50.0, 'extracted']]
@@ -0,0 +1,21 @@
+import asyncio
+import time
+
+from scripts.profiler import LoopProfiler
+
+
+def test_profile_reports_a_blocking_callback(tmp_path):
+    async def run():
+        profiler = LoopProfiler(tmp_path, stack_interval=0.005, task_interval=0.05, lag_interval=0.02,
+                                slow_callback_duration=0.1)
+        profiler.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)
+        await asyncio.sleep(0.1)
+        await profiler.stop()
+
+    asyncio.run(run())
+    for file_name in ("loop_lag.csv", "loop_cpu.folded", "tasks_wall.folded", "slow_callbacks.log", "summary.txt"):
+        assert (tmp_path / file_name).exists()
+    assert "test_profile_reports_a_blocking_callback" in (tmp_path / "slow_callbacks.log").read_text()
+    assert max(float(line.split(',')[1]) for line in (tmp_path / "loop_lag.csv").read_text().splitlines()[1:]) > 200
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from scripts.prompt_generator import (design_cell_counts, generate_design, group_cell_counts, iter_participant_groups,
+                                      render_system_prompt)
+
+
+def test_design_fills_every_cell_in_chunks():
+    counts = design_cell_counts(['Chile', 'Kenya'], 3, quotas={'Kenya': {'female': 5}})
+    assert counts == {('Chile', 'male'): 3, ('Chile', 'female'): 3, ('Kenya', 'male'): 3, ('Kenya', 'female'): 5}
+    covariates = {'education': {'levels': ['primary', 'tertiary'], 'weights': [1, 0]}}
+    design = pd.concat(generate_design(counts, age_range=(30, 31), covariates=covariates, chunk_size=4, seed=1))
+
+    assert design.groupby(['country', 'gender'], observed=True).size().to_dict() == counts
+    assert design['age'].between(30, 31).all()
+    assert (design['education'] == 'primary').all()
+
+
+def test_same_seed_same_design():
+    counts = design_cell_counts(['Chile'], 20)
+    first = pd.concat(generate_design(counts, chunk_size=7, seed=3), ignore_index=True)
+    assert first.equals(pd.concat(generate_design(counts, chunk_size=7, seed=3), ignore_index=True))
+    assert not first.equals(pd.concat(generate_design(counts, chunk_size=7, seed=4), ignore_index=True))
+
+
+
+def test_groups_share_a_prompt_and_cover_the_cell():
+    counts = {('Chile', 'male'): 5}
+    groups = list(iter_participant_groups(generate_design(group_cell_counts(counts, 2), seed=0), counts, 2, model='m'))
+    assert [len(group) for group in groups] == [2, 2, 1]
+    assert all(len({render_system_prompt(p) for p in group}) == 1 for group in groups)
+    # Each completion gets its own participant record
+    assert len({id(p) for group in groups for p in group}) == 5
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.data_processor import process_participant_results
+from scripts.preference_data import build_run_preferences
+from scripts.run_monitor import RUN_STATS_FILE, RunStatistics, participant_measures
+
+
+
+def test_participant_measures():
+    measures, answers, failures = participant_measures(
+        ['Risk 10', 'Risk 20', 'Risk 30', 'Reciprocation 20', 'Willingness to take risk'],
+        [1, 1, 2, 5.0, float('nan')],
+        ['ok', 'ok', 'ok', 'extracted', 'invalid']
+    )
+    # Two "Option 1" answers before the switch; 5 of a stake of 20 is 25%
+    assert measures == {'risk_e': 2, 'recip_perc': 25.0}
+    assert answers == {'risk_e': 3, 'recip_perc': 1, 'risk_q': 1}
+    assert failures == {'risk_q': 1}
+
+
+
+def test_switch_points_match_the_processed_measures():
+    titles = ['Risk 10', 'Risk 20', 'Risk 30', 'Delay 100.0', 'Delay 103.0', 'Delay 106.0']
+    participants = {
+        'switches': [1, 1, 2, 1, 2, 2],
+        'never_switches': [1, 1, 1, 1, 1, 1],
+        'risk_only': [2, 1, 1, 1, 1, 1],
+        'unparsed': [1, np.nan, 2, 2, 1, np.nan],
+    }
+    rows = pd.concat([
+        pd.DataFrame({'Participant ID': participant_id, 'Short Title': titles, 'Question': 'Q?', 'Answer': 'raw',
+                      'Value': values, 'Parse Status': 'ok', 'Age': 30, 'Gender': 'male', 'Country': 'Chile'})
+        for participant_id, values in participants.items()
+    ], ignore_index=True)
+    processed = build_run_preferences(process_participant_results(rows.copy())).set_index('participant id')
+
+    for participant_id, values in participants.items():
+        measures, _, _ = participant_measures(titles, values, ['ok'] * len(titles))
+        for item in ('risk_e', 'patience_e'):
+            expected = processed[item].get(participant_id, np.nan)
+            assert measures.get(item, np.nan) == pytest.approx(expected, nan_ok=True), (participant_id, item)
+
+
+def test_snapshot_holds_running_statistics(tmp_path):
+    statistics = RunStatistics(tmp_path)
+    for value in (4, 6, 8):
+        statistics.add('m', 'Chile', ['Willingness to take risk'], [value], ['ok'])
+    statistics.add('m', 'Chile', ['Willingness to take risk'], [None], ['ambiguous'])
+    statistics.snapshot()
+
+    snapshot = json.loads((tmp_path / RUN_STATS_FILE).read_text())
+    row, = snapshot['statistics']
+    assert snapshot['participants'] == row['participants'] == 4
+    assert (row['measure'], row['n'], row['mean'], row['sd']) == ('risk_q', 3, 6.0, pytest.approx(2.0))
+    assert row['parse_failure_rate'] == 0.25
@@ -0,0 +1,40 @@
+import pytest
+
+from scripts.online_stats import RunningMoments
+from scripts.participant import Participant
+from scripts.sequential_sampling import STOPPED_CAP, STOPPED_NO_PARTICIPANTS, STOPPED_PRECISION, SequentialSampler
+
+CELL = ('m', 'Chile', 'male')
+
+
+def sampler_with(participants, variance, **kwargs):
+    sampler = SequentialSampler({'risktaking': 1.0}, **kwargs)
+    sampler.participants[CELL] = participants
+    sampler.cell_moments(CELL)['risktaking'] = RunningMoments(participants, 0.0, variance * (participants - 1))
+    return sampler
+
+
+def test_precise_cell_stops_only_after_the_minimum():
+    assert sampler_with(10, 0.01, wave_size=10, min_participants=20).next_wave_size(CELL) == 10
+    sampler = sampler_with(20, 0.01, min_participants=20)
+    assert sampler.next_wave_size(CELL) == 0
+    assert sampler.stopped[CELL] == STOPPED_PRECISION
+
+
+def test_imprecise_cell_stops_at_the_cap():
+    assert sampler_with(195, 100.0, wave_size=10, max_participants=200).next_wave_size(CELL) == 5
+    sampler = sampler_with(200, 100.0, max_participants=200)
+    assert sampler.next_wave_size(CELL) == 0
+    assert sampler.report().query("Measure == 'risktaking'")['Stopped'].item() == STOPPED_CAP
+
+
+def test_cell_without_new_participants_stops():
+    sampler = sampler_with(30, 100.0, max_participants=200)
+    sampler.add_wave(CELL, [Participant('Chile', 'male', 30, model='m')] * 2, [None, None])
+    assert sampler.next_wave_size(CELL) == 0
+    assert sampler.stopped[CELL] == STOPPED_NO_PARTICIPANTS
+
+
+def test_unknown_measures_are_rejected():
+    with pytest.raises(ValueError, match="risk"):
+        SequentialSampler({'risk': 1.0})
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from scripts.streaming_ols import streaming_ols
+
+
+def survey(n=400, seed=2):
+    rng = np.random.default_rng(seed)
+    age = rng.normal(40, 10, n)
+    # Sorted so that later chunks bring levels the earlier ones have not seen
+    country = np.sort(rng.choice(['AR', 'BR', 'CL', 'DE'], n))
+    value = 0.05 * age + pd.Series(country).map({'AR': 0, 'BR': 1, 'CL': -1, 'DE': 2}).to_numpy() + rng.normal(size=n) * (1 + age / 40)
+    return pd.DataFrame({'Short Title': 'Risk 10', 'Value': value, 'Age': age, 'Country': country})
+
+
+def test_chunked_fit_matches_statsmodels():
+    data = survey()
+    setup = {'name': 'risk', 'battery': 'Risk', 'y': 'Value', 'x': [{'name': 'Age', 'type': 'numeric'}],
+             'fixed_effects': ['Country']}
+    fit, = streaming_ols(lambda: (data.iloc[start:start + 70] for start in range(0, len(data), 70)), [setup])
+
+    X = sm.add_constant(pd.concat([data[['Age']], pd.get_dummies(data['Country'], prefix='Country', drop_first=True, dtype=float)], axis=1))
+    reference = sm.OLS(data['Value'], X).fit(cov_type='HC1')
+    params = pd.Series(fit['params'], index=fit['columns'])[X.columns]
+    robust_se = pd.Series(np.sqrt(np.diag(fit['robust_cov'])), index=fit['columns'])[X.columns]
+
+    assert np.allclose(params, reference.params)
+    assert np.allclose(robust_se, reference.bse)
+    assert np.isclose(fit['rsquared'], reference.rsquared)
+    assert np.isclose(fit['rsquared_adj'], reference.rsquared_adj)